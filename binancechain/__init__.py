@@ -1,7 +1,12 @@
 from .enums import Ordertype, Side, Votes, Timeinforce
 from .httpclient import HTTPClient
 from .noderpc import NodeRPC
+from .rpccache import RPCCache
+from .orderbook import OrderBook, OrderBookManager
+from .account import AccountState
+from .orders import Order, OrderIndex
 from .transaction import Transaction
 from .wallet import Wallet
 from .websocket import WebSocket
+from .sharding import ShardedWebSocket
 from .exceptions import BinanceChainException
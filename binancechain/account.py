@@ -0,0 +1,214 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+A local mirror of an account's balances, bootstrapped from `get_account` and
+kept up to date with the `accounts` WebSocket stream, so that balance checks
+don't cost a rate-limited request.
+
+Balances are fixed-point integers with 8 decimals, like in
+`binancechain.orderbook`.
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set
+
+from .httpclient import HTTPClient
+from .orderbook import to_fixed
+from .websocket import WebSocket
+
+log = logging.getLogger(__name__)
+
+
+class Balance(NamedTuple):
+    free: int
+    frozen: int
+    locked: int
+
+    @property
+    def total(self) -> int:
+        return self.free + self.frozen + self.locked
+
+
+ZERO = Balance(0, 0, 0)
+
+
+class AccountState:
+    """The balances of a single address.
+
+        account = AccountState(client, dex, address)
+        dex.start(on_open=account.start)
+
+        if account.free("BNB") >= fee:
+            ...
+
+    The `accounts` stream pushes the full balance of every asset that
+    changed, so updates are applied as they arrive, even while a snapshot is
+    being fetched. Those received during a fetch are replayed on top of the
+    snapshot, since it may predate them.
+
+    The account is refetched every `reconcile_interval` seconds, and after
+    the WebSocket reports a `gap`. Balances found to differ from the snapshot
+    are logged and counted in `drift`.
+    """
+
+    def __init__(
+        self,
+        client: HTTPClient,
+        websocket: WebSocket,
+        address: str,
+        reconcile_interval: Optional[float] = 60.0,
+        on_update: Optional[Callable[[str, Balance], None]] = None,
+        retry_delay: float = 1.0,
+    ):
+        """
+        :param client: The HTTP client used to fetch the account
+        :param websocket: The WebSocket to subscribe to `accounts` with
+        :param address: The address of the account
+        :param reconcile_interval: Seconds between refetches of the account,
+            or None to only fetch it on start and after gaps
+        :param on_update: Called with the asset and balance of every change
+        :param retry_delay: Seconds to wait before retrying a failed fetch
+        """
+        self.client = client
+        self.websocket = websocket
+        self.address = address
+        self.reconcile_interval = reconcile_interval
+        self.on_update = on_update
+        self.retry_delay = retry_delay
+        self.balances: Dict[str, Balance] = {}
+        self.account_number: Optional[int] = None
+        self.sequence: Optional[int] = None
+        self.synced = False
+        self.resyncs = 0
+        self.drift = 0
+        self._buffer: Optional[List[dict]] = None
+        self._syncing: Optional[asyncio.Future] = None
+        self._reconciler: Optional[asyncio.Future] = None
+
+    def __getitem__(self, asset: str) -> Balance:
+        return self.balances.get(asset, ZERO)
+
+    def __contains__(self, asset: str) -> bool:
+        return asset in self.balances
+
+    def free(self, asset: str) -> int:
+        return self.balances.get(asset, ZERO).free
+
+    def frozen(self, asset: str) -> int:
+        return self.balances.get(asset, ZERO).frozen
+
+    def locked(self, asset: str) -> int:
+        return self.balances.get(asset, ZERO).locked
+
+    def start(self) -> asyncio.Future:
+        """Subscribe to `accounts` and fetch the account.
+
+        This should be called once the WebSocket is open. The returned future
+        completes once the account has been fetched.
+        """
+        self.websocket.on("gap", self._on_gap)
+        self.websocket.subscribe_user_accounts(self._on_account, address=self.address)
+        if self.reconcile_interval and self._reconciler is None:
+            self._reconciler = asyncio.ensure_future(self._reconcile())
+        return self.resync()
+
+    def resync(self) -> asyncio.Future:
+        """Schedule a fresh fetch of the account"""
+        if self._syncing is None:
+            self._syncing = asyncio.ensure_future(self._resync())
+        return self._syncing
+
+    async def _resync(self) -> None:
+        self._buffer = []
+        try:
+            account = await self.client.get_account(self.address)
+            buffer, self._buffer = self._buffer, None
+            self.apply_snapshot(account, buffer)
+            self.resyncs += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception(f"Unable to fetch account {self.address}")
+            self._buffer = None
+            await asyncio.sleep(self.retry_delay)
+        finally:
+            self._syncing = None
+        if not self.synced:
+            self.resync()
+
+    async def _reconcile(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            await self.resync()
+
+    def apply_snapshot(self, account: dict, updates: Sequence[dict] = ()) -> None:
+        """Replace the balances with a `HTTPClient.get_account` response,
+        then replay the `accounts` stream `updates` received since it was
+        requested"""
+        balances = {}
+        for balance in account.get("balances", ()):
+            value = Balance(
+                to_fixed(balance["free"]),
+                to_fixed(balance["frozen"]),
+                to_fixed(balance["locked"]),
+            )
+            if value != ZERO:
+                balances[balance["symbol"]] = value
+        updated: Set[str] = {
+            balance["a"] for data in updates for balance in data.get("B", ())
+        }
+        changed = set(balances) | set(self.balances)
+        changed = {
+            asset for asset in changed if self[asset] != balances.get(asset, ZERO)
+        }
+        if self.synced:
+            for asset in changed - updated:
+                log.warning(
+                    f"{self.address} {asset} balance drifted from {self[asset]} "
+                    f"to {balances.get(asset, ZERO)}"
+                )
+                self.drift += 1
+        self.balances = balances
+        self.account_number = account.get("account_number")
+        self.sequence = account.get("sequence")
+        self.synced = True
+        for data in updates:
+            self.apply_update(data, notify=False)
+        if self.on_update:
+            for asset in sorted(changed | updated):
+                self.on_update(asset, self[asset])
+
+    def apply_update(self, data: dict, notify: bool = True) -> None:
+        """Apply the `data` of an `accounts` stream message"""
+        for balance in data.get("B", ()):
+            asset = balance["a"]
+            value = Balance(
+                to_fixed(balance["f"]), to_fixed(balance["r"]), to_fixed(balance["l"])
+            )
+            if value == ZERO:
+                self.balances.pop(asset, None)
+            else:
+                self.balances[asset] = value
+            if notify and self.on_update:
+                self.on_update(asset, value)
+
+    def _on_account(self, msg: dict) -> None:
+        data = msg["data"]
+        if self._buffer is not None:
+            self._buffer.append(data)
+        self.apply_update(data)
+
+    def _on_gap(self, gap: dict) -> None:
+        self.resync()
+
+    def close(self) -> None:
+        """Stop reconciling and unsubscribe from `accounts`"""
+        for future in (self._reconciler, self._syncing):
+            if future is not None:
+                future.cancel()
+        self._reconciler = self._syncing = None
+        self.websocket.remove_listener("gap", self._on_gap)
+        self.websocket.unsubscribe(
+            "accounts", callback=self._on_account, address=self.address
+        )
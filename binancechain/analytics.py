@@ -0,0 +1,231 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Rolling trade analytics, like VWAP, buy and sell volume and trade counts,
+maintained incrementally over several time windows per symbol.
+
+Times are in milliseconds, and prices and volumes are fixed-point integers
+with 8 decimals, like in `binancechain.orderbook`.
+"""
+import logging
+from array import array
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from .klines import to_millis
+from .orderbook import SCALE, to_fixed
+from .websocket import WebSocket
+
+log = logging.getLogger(__name__)
+
+# The `tt` (ticker type) of trades whose taker was buying, or selling
+BUY_TICKER_TYPES = (2, 3)
+SELL_TICKER_TYPES = (1, 4)
+
+BUY, SELL, NEUTRAL = 1, -1, 0
+
+
+class WindowStats(NamedTuple):
+    trades: int
+    volume: int
+    quote_volume: int
+    buy_volume: int
+    sell_volume: int
+    vwap: Optional[int]
+
+
+class RollingTrades:
+    """The trades of a single symbol, in a ring buffer shared by all windows.
+
+    Each window keeps running sums and the position of its oldest trade.
+    Adding a trade adds it to every sum, and expiring a trade subtracts it,
+    so updates and queries are O(1) amortized. The buffer grows if it fills
+    up with trades that are still within the longest window.
+    """
+
+    __slots__ = (
+        "windows",
+        "times",
+        "quantities",
+        "quotes",
+        "sides",
+        "head",
+        "tails",
+        "sums",
+        "last_time",
+    )
+
+    def __init__(self, windows: List[int], capacity: int = 1024):
+        self.windows = windows
+        self.times = array("q", bytes(8 * capacity))
+        self.quantities = array("q", bytes(8 * capacity))
+        self.quotes = array("q", bytes(8 * capacity))
+        self.sides = array("b", bytes(capacity))
+        # The number of trades ever added, and the oldest trade of each window
+        self.head = 0
+        self.tails = [0] * len(windows)
+        # trades, volume, quote volume, buy volume, sell volume per window
+        self.sums = [[0, 0, 0, 0, 0] for _ in windows]
+        self.last_time = 0
+
+    def add(self, time: int, price: int, quantity: int, side: int) -> None:
+        """Add a trade at `time` milliseconds"""
+        capacity = len(self.times)
+        if self.head - min(self.tails) >= capacity:
+            self._grow()
+            capacity = len(self.times)
+        slot = self.head % capacity
+        quote = price * quantity // SCALE
+        self.times[slot] = time
+        self.quantities[slot] = quantity
+        self.quotes[slot] = quote
+        self.sides[slot] = side
+        self.head += 1
+        if time > self.last_time:
+            self.last_time = time
+        for sums in self.sums:
+            sums[0] += 1
+            sums[1] += quantity
+            sums[2] += quote
+            if side == BUY:
+                sums[3] += quantity
+            elif side == SELL:
+                sums[4] += quantity
+        self.expire(self.last_time)
+
+    def expire(self, now: int) -> None:
+        """Remove the trades that have fallen out of each window"""
+        capacity = len(self.times)
+        times = self.times
+        for i, window in enumerate(self.windows):
+            cutoff = now - window
+            tail = self.tails[i]
+            if tail == self.head or times[tail % capacity] > cutoff:
+                continue
+            sums = self.sums[i]
+            while tail < self.head and times[tail % capacity] <= cutoff:
+                slot = tail % capacity
+                quantity = self.quantities[slot]
+                sums[0] -= 1
+                sums[1] -= quantity
+                sums[2] -= self.quotes[slot]
+                if self.sides[slot] == BUY:
+                    sums[3] -= quantity
+                elif self.sides[slot] == SELL:
+                    sums[4] -= quantity
+                tail += 1
+            self.tails[i] = tail
+
+    def stats(self, i: int) -> WindowStats:
+        trades, volume, quote, buy, sell = self.sums[i]
+        vwap = quote * SCALE // volume if volume else None
+        return WindowStats(trades, volume, quote, buy, sell, vwap)
+
+    def _grow(self) -> None:
+        capacity = len(self.times)
+        start = min(self.tails)
+        for name in ("times", "quantities", "quotes", "sides"):
+            old = getattr(self, name)
+            new = array(old.typecode, bytes(old.itemsize * capacity * 2))
+            for n in range(start, self.head):
+                new[n % (capacity * 2)] = old[n % capacity]
+            setattr(self, name, new)
+
+
+class TradeAnalytics:
+    """Rolling VWAP, volume and trade counts of the `trades` stream.
+
+        analytics = TradeAnalytics(windows=(60, 300, 3600))
+        analytics.attach(ws, symbols)
+        vwap = analytics.stats("NNB-0AD_BNB", 300).vwap
+
+    Windows are in seconds, and are measured back from the latest trade of
+    a symbol unless a query passes `now`.
+    """
+
+    def __init__(self, windows: Iterable[int] = (60, 300, 900)) -> None:
+        """
+        :param windows: The lengths of the windows to maintain, in seconds
+        """
+        self.windows = list(windows)
+        self._windows_ms = [window * 1000 for window in self.windows]
+        self.symbols: Dict[str, RollingTrades] = {}
+
+    def attach(self, websocket: WebSocket, symbols: List[str]) -> None:
+        """Subscribe to the trades of `symbols`"""
+        websocket.subscribe_trades(symbols, callback=self.on_trades)
+
+    def on_trades(self, msg: dict) -> None:
+        """Handle a `trades` stream message"""
+        for trade in msg["data"]:
+            ticker_type = trade.get("tt")
+            if ticker_type in BUY_TICKER_TYPES:
+                side = BUY
+            elif ticker_type in SELL_TICKER_TYPES:
+                side = SELL
+            else:
+                side = NEUTRAL
+            self.add(
+                trade["s"],
+                to_millis(trade["T"]),
+                to_fixed(trade["p"]),
+                to_fixed(trade["q"]),
+                side,
+            )
+
+    def add(
+        self, symbol: str, time: int, price: int, quantity: int, side: int = NEUTRAL
+    ) -> None:
+        """Add a trade of `symbol` at `time` milliseconds.
+
+        :param side: `BUY` or `SELL` if the taker was buying or selling
+        """
+        rolling = self.symbols.get(symbol)
+        if rolling is None:
+            rolling = self.symbols[symbol] = RollingTrades(self._windows_ms)
+        rolling.add(time, price, quantity, side)
+
+    def stats(
+        self, symbol: str, window: int, now: Optional[int] = None
+    ) -> Optional[WindowStats]:
+        """The stats of a symbol over one of our windows.
+
+        :param window: The length of the window, in seconds
+        :param now: Measure the window back from this time in milliseconds,
+            rather than from the latest trade
+        """
+        rolling = self.symbols.get(symbol)
+        if rolling is None:
+            return None
+        if now is not None:
+            rolling.expire(now)
+        return rolling.stats(self.windows.index(window))
+
+    def batch(self, window: int, now: Optional[int] = None) -> Dict[str, Any]:
+        """The stats of every symbol over a window, as NumPy arrays.
+
+        Volumes and VWAPs are converted to floats, and symbols without
+        trades in the window have a VWAP of NaN. This requires NumPy.
+        """
+        import numpy as np
+
+        i = self.windows.index(window)
+        symbols = list(self.symbols)
+        if now is not None:
+            for rolling in self.symbols.values():
+                rolling.expire(now)
+        sums = np.array(
+            [self.symbols[symbol].sums[i] for symbol in symbols], dtype=np.float64
+        ).reshape(-1, 5)
+        volume = sums[:, 1] / SCALE
+        quote = sums[:, 2] / SCALE
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vwap = np.where(volume > 0, quote / volume, np.nan)
+        return {
+            "symbols": symbols,
+            "trades": sums[:, 0].astype(np.int64),
+            "volume": volume,
+            "quote_volume": quote,
+            "buy_volume": sums[:, 3] / SCALE,
+            "sell_volume": sums[:, 4] / SCALE,
+            "vwap": vwap,
+        }
@@ -0,0 +1,216 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Topic-indexed dispatch of WebSocket stream messages.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Any]
+
+
+def symbol_of(msg: dict) -> Optional[str]:
+    """The symbol a stream message is about, if any"""
+    data = msg.get("data")
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        return data.get("s") or data.get("symbol")
+    return None
+
+
+class Route:
+    """The handlers of a single stream.
+
+    Handlers are indexed by address, and by symbol unless they want every
+    symbol of the stream.
+    """
+
+    __slots__ = ("any", "symbols")
+
+    def __init__(self):
+        self.any: Dict[Optional[str], List[Handler]] = {}
+        self.symbols: Dict[str, Dict[Optional[str], List[Handler]]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.any or self.symbols)
+
+
+class DispatchTable:
+    """Routes stream messages to the handlers of their (stream, symbol, address).
+
+    Handlers registered without symbols (or with `$all`) receive every message
+    of their stream, while the others only receive the messages about their
+    symbols. Messages with a list of payloads about several symbols, like
+    `trades`, are split up so that each handler only sees its own symbols.
+    Handlers registered without an address receive the messages of every
+    address. Messages dispatched without an address, like those of a socket
+    that isn't tied to one, can't be told apart and go to every handler.
+
+    Coroutine handlers are scheduled as tasks, and exceptions raised by any
+    handler are passed to `on_error`. If `on_timing` is set, it is called
+    with the stream, the handler and the seconds it took, until completion
+    for coroutine handlers.
+    """
+
+    def __init__(
+        self,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        on_timing: Optional[Callable[[str, Handler, float], None]] = None,
+    ):
+        self._routes: Dict[str, Route] = {}
+        self._on_error = on_error
+        self.on_timing = on_timing
+
+    def __contains__(self, stream: str) -> bool:
+        return stream in self._routes
+
+    def route(self, stream: str) -> Optional[Route]:
+        """The handlers of a stream, if it has any"""
+        return self._routes.get(stream)
+
+    def add(
+        self,
+        stream: str,
+        handler: Handler,
+        symbols: Optional[Iterable[str]] = None,
+        address: Optional[str] = None,
+    ) -> None:
+        route = self._routes.get(stream)
+        if route is None:
+            route = self._routes[stream] = Route()
+        wanted = [symbol for symbol in symbols or () if symbol != "$all"]
+        if not wanted:
+            route.any.setdefault(address, []).append(handler)
+        for symbol in wanted:
+            route.symbols.setdefault(symbol, {}).setdefault(address, []).append(handler)
+
+    def remove(
+        self,
+        stream: str,
+        symbols: Optional[Iterable[str]] = None,
+        handler: Optional[Handler] = None,
+        address: Optional[str] = None,
+    ) -> None:
+        """Remove the handlers of a stream.
+
+        :param symbols: Only remove the handlers of these symbols
+        :param handler: Only remove this handler
+        :param address: Only remove the handlers of this address
+        """
+        route = self._routes.get(stream)
+        if route is None:
+            return
+        wanted = [symbol for symbol in symbols or () if symbol != "$all"]
+        if wanted:
+            indexes = [route.symbols[s] for s in wanted if s in route.symbols]
+        else:
+            indexes = [route.any, *route.symbols.values()]
+        for index in indexes:
+            for key in list(index):
+                if address is not None and key != address:
+                    continue
+                if handler is None:
+                    del index[key]
+                    continue
+                index[key] = [h for h in index[key] if h != handler]
+                if not index[key]:
+                    del index[key]
+        for symbol in [s for s, index in route.symbols.items() if not index]:
+            del route.symbols[symbol]
+        if not route:
+            del self._routes[stream]
+
+    def dispatch(self, msg: dict, address: Optional[str] = None) -> None:
+        """Call the handlers interested in `msg`"""
+        route = self._routes.get(msg["stream"])
+        if route is None:
+            return
+        if route.any:
+            self._deliver(route.any, msg, address)
+        if not route.symbols:
+            return
+        data = msg["data"]
+        if isinstance(data, list) and len(data) > 1:
+            groups: Dict[Optional[str], list] = {}
+            for payload in data:
+                symbol = payload.get("s") if isinstance(payload, dict) else None
+                groups.setdefault(symbol, []).append(payload)
+            if len(groups) > 1:
+                for symbol, payloads in groups.items():
+                    index = route.symbols.get(symbol)  # type: ignore
+                    if index:
+                        self._deliver(index, dict(msg, data=payloads), address)
+                return
+        index = route.symbols.get(symbol_of(msg))  # type: ignore
+        if index:
+            self._deliver(index, msg, address)
+
+    def _deliver(
+        self,
+        index: Dict[Optional[str], List[Handler]],
+        msg: dict,
+        address: Optional[str],
+    ) -> None:
+        """Call the handlers of `address`, and those of every address"""
+        if address is None:
+            for handlers in tuple(index.values()):
+                self._call(handlers, msg)
+            return
+        self._call(index.get(None), msg)
+        self._call(index.get(address), msg)
+
+    def _call(self, handlers: Optional[List[Handler]], msg: dict) -> None:
+        if not handlers:
+            return
+        if self.on_timing:
+            self._call_timed(handlers, msg, self.on_timing)
+            return
+        for handler in tuple(handlers):
+            try:
+                result = handler(msg)
+            except Exception as e:
+                self._error(e)
+                continue
+            if asyncio.iscoroutine(result):
+                asyncio.ensure_future(result).add_done_callback(self._done)
+
+    def _call_timed(
+        self,
+        handlers: List[Handler],
+        msg: dict,
+        on_timing: Callable[[str, Handler, float], None],
+    ) -> None:
+        stream = msg["stream"]
+        for handler in tuple(handlers):
+            start = time.perf_counter()
+            try:
+                result = handler(msg)
+            except Exception as e:
+                on_timing(stream, handler, time.perf_counter() - start)
+                self._error(e)
+                continue
+            if asyncio.iscoroutine(result):
+                task = asyncio.ensure_future(result)
+                task.add_done_callback(self._done)
+                task.add_done_callback(
+                    lambda _, handler=handler, start=start: on_timing(
+                        stream, handler, time.perf_counter() - start
+                    )
+                )
+            else:
+                on_timing(stream, handler, time.perf_counter() - start)
+
+    def _done(self, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception():
+            self._error(task.exception())
+
+    def _error(self, error: Exception) -> None:
+        if self._on_error:
+            self._on_error(error)
+        else:
+            log.error(f"Unhandled error in handler: {error!r}")
@@ -23,3 +23,20 @@ class Side(Enum):
 class Timeinforce(Enum):
     GTE = 1
     IOC = 3
+
+
+class Overflow(Enum):
+    """What a bounded WebSocket stream does when its consumer falls behind"""
+
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+
+
+class Execution(Enum):
+    """How a WebSocket handler is run"""
+
+    INLINE = "inline"
+    CONCURRENT = "concurrent"
+    SHARDED = "sharded"
+    THREAD = "thread"
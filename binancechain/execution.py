@@ -0,0 +1,246 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Ways of running WebSocket handlers other than inline in the read loop, so that
+slow handlers don't hold up the others.
+
+Each wraps a handler in a callable that queues messages for workers, and
+measures how deep its queues get and how long messages wait in them.
+"""
+import asyncio
+import logging
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, List, Optional, Tuple, Union
+
+from .dispatch import symbol_of
+from .enums import Execution, Overflow
+from .metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Any]
+
+
+class QueuedHandler:
+    """Runs a handler in workers fed by queues.
+
+    Queues are unbounded unless `maxsize` is set, in which case the
+    `overflow` policy decides whether the oldest or newest message is
+    dropped once one is full. Handlers can't block the read loop, so
+    `Overflow.BLOCK` isn't supported.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        queues: int = 1,
+        workers: int = 1,
+        maxsize: int = 0,
+        overflow: Union[Overflow, str] = Overflow.DROP_OLDEST,
+    ) -> None:
+        overflow = Overflow(overflow)
+        if overflow is Overflow.BLOCK:
+            raise ValueError("Queued handlers can only drop messages on overflow")
+        self.handler = handler
+        # Called with the exceptions raised by the handler
+        self.on_error: Optional[Callable[[Exception], None]] = None
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        # Seconds spent in the queue, and running the handler
+        self.wait = Histogram()
+        self.run = Histogram()
+        self._queues: List[Deque[Tuple[float, dict]]] = [deque() for _ in range(queues)]
+        self._ready: List[Optional[asyncio.Event]] = [None] * queues
+        self._workers_per_queue = workers
+        self._workers: List[asyncio.Future] = []
+        self.in_flight = 0
+
+    def __repr__(self) -> str:
+        name = getattr(self.handler, "__qualname__", None) or repr(self.handler)
+        return f"<{self.__class__.__name__} {name}>"
+
+    @property
+    def depth(self) -> int:
+        """The number of messages waiting to be handled"""
+        return sum(len(queue) for queue in self._queues)
+
+    def __call__(self, msg: dict) -> None:
+        if not self._workers:
+            self._start()
+        self._put(0, msg)
+
+    def _put(self, index: int, msg: dict) -> None:
+        queue = self._queues[index]
+        if self.maxsize and len(queue) >= self.maxsize:
+            self.dropped += 1
+            if self.overflow is Overflow.DROP_NEWEST:
+                return
+            queue.popleft()
+        queue.append((time.perf_counter(), msg))
+        depth = self.depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+        self._ready[index].set()  # type: ignore
+
+    def _start(self) -> None:
+        for index in range(len(self._queues)):
+            self._ready[index] = asyncio.Event()
+            for _ in range(self._workers_per_queue):
+                self._workers.append(asyncio.ensure_future(self._work(index)))
+
+    async def _work(self, index: int) -> None:
+        queue, ready = self._queues[index], self._ready[index]
+        assert ready is not None
+        while True:
+            while not queue:
+                ready.clear()
+                await ready.wait()
+            queued, msg = queue.popleft()
+            start = time.perf_counter()
+            self.wait.observe(start - queued)
+            self.in_flight += 1
+            try:
+                await self._run(msg)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                if self.on_error:
+                    self.on_error(e)
+                else:
+                    log.error(f"Error in {self!r}: {e!r}")
+            finally:
+                self.in_flight -= 1
+                self.processed += 1
+                self.run.observe(time.perf_counter() - start)
+
+    async def _run(self, msg: dict) -> None:
+        result = self.handler(msg)
+        if asyncio.iscoroutine(result):
+            await result
+
+    def snapshot(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "wait": self.wait.snapshot(),
+            "run": self.run.snapshot(),
+        }
+
+    def close(self) -> None:
+        """Stop the workers, discarding the messages still queued"""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        for queue in self._queues:
+            queue.clear()
+
+
+class ConcurrentHandler(QueuedHandler):
+    """Runs a coroutine handler with at most `limit` messages at a time, in
+    no particular order"""
+
+    def __init__(
+        self,
+        handler: Handler,
+        limit: int = 10,
+        maxsize: int = 0,
+        overflow: Union[Overflow, str] = Overflow.DROP_OLDEST,
+    ) -> None:
+        super().__init__(handler, 1, limit, maxsize, overflow)
+
+
+class ShardedHandler(QueuedHandler):
+    """Runs a handler in `workers` ordered workers, one per group of symbols.
+
+    The messages of a symbol are always handled by the same worker, in
+    order, while different symbols are handled in parallel. Messages with
+    payloads about several symbols, like `trades`, are split up by symbol.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        workers: int = 4,
+        maxsize: int = 0,
+        overflow: Union[Overflow, str] = Overflow.DROP_OLDEST,
+    ) -> None:
+        super().__init__(handler, workers, 1, maxsize, overflow)
+
+    def shard_for(self, symbol: Optional[str]) -> int:
+        return zlib.crc32((symbol or "").encode()) % len(self._queues)
+
+    def __call__(self, msg: dict) -> None:
+        if not self._workers:
+            self._start()
+        data = msg["data"]
+        if isinstance(data, list) and len(data) > 1:
+            groups: dict = {}
+            for payload in data:
+                symbol = payload.get("s") if isinstance(payload, dict) else None
+                groups.setdefault(symbol, []).append(payload)
+            if len(groups) > 1:
+                for symbol, payloads in groups.items():
+                    self._put(self.shard_for(symbol), dict(msg, data=payloads))
+                return
+        self._put(self.shard_for(symbol_of(msg)), msg)
+
+
+class ThreadedHandler(QueuedHandler):
+    """Runs a blocking handler in a thread pool.
+
+    Messages are handled in order if there is a single worker.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        workers: int = 1,
+        executor: Optional[Executor] = None,
+        maxsize: int = 0,
+        overflow: Union[Overflow, str] = Overflow.DROP_OLDEST,
+    ) -> None:
+        """
+        :param workers: The number of messages to handle at a time
+        :param executor: The pool to run the handler in. Defaults to a
+            `ThreadPoolExecutor` of `workers` threads of our own.
+        """
+        super().__init__(handler, 1, workers, maxsize, overflow)
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(workers)
+
+    async def _run(self, msg: dict) -> None:
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, self.handler, msg)
+
+    def close(self) -> None:
+        super().close()
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+
+MODES = {
+    Execution.CONCURRENT: ConcurrentHandler,
+    Execution.SHARDED: ShardedHandler,
+    Execution.THREAD: ThreadedHandler,
+}
+
+
+def execute(handler: Handler, mode: Union[Execution, str], **options) -> Handler:
+    """Wrap `handler` to run it in the given mode, with `options` for the
+    wrapper, like `limit` or `workers`. Inline handlers are left as is."""
+    mode = Execution(mode)
+    if mode is Execution.INLINE:
+        return handler
+    return MODES[mode](handler, **options)
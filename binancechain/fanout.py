@@ -0,0 +1,325 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Share the messages of a single WebSocket with many processes on one host,
+through a ring buffer in a memory-mapped file, like one in `/dev/shm`.
+
+The publisher decodes each frame once, splits it up by symbol, and appends
+the payload of each symbol to the ring with its stream and symbol in a small
+header. Subscribers filter on the header without touching the payload, and
+get a zero-copy view of the payloads they want. There are no locks: each
+subscriber tracks its own position, and detects when the publisher has
+lapped it.
+
+Payloads are stored as JSON rather than in a binary format of our own:
+orjson parses them faster than Python could unpack any other encoding, so
+`messages` decodes the payloads a subscriber wants with it, and only those.
+Decoding the whole frame, including the symbols nobody in the process is
+interested in, still happens once, in the publisher. Subscribers that only
+need a few fields can scan the raw payloads returned by `read` instead.
+
+Buffer layout::
+
+    HEADER (magic, capacity, write position, next sequence number, slots)
+    slots * SLOT (pid, read position) of each subscriber
+    data: records of RECORD (size, sequence number, stream and symbol
+          lengths) + stream + symbol + payload
+"""
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"BCFANOUT"
+HEADER = struct.Struct("<8sQQQQ")
+POSITION = struct.Struct("<QQ")
+POSITION_OFFSET = 16
+SLOT = struct.Struct("<QQ")
+SLOTS_OFFSET = 64
+RECORD = struct.Struct("<IQBB")
+WRAP = 0xFFFFFFFF
+
+
+def _data_offset(slots: int) -> int:
+    return SLOTS_OFFSET + slots * SLOT.size
+
+
+class FanoutPublisher:
+    """Publishes WebSocket messages into a shared ring buffer.
+
+    `publish` is a regular stream handler:
+
+        publisher = FanoutPublisher("/dev/shm/binancechain")
+        ws.subscribe_trades(symbols, callback=publisher.publish)
+    """
+
+    def __init__(
+        self, path: str, capacity: int = 64 * 1024 * 1024, slots: int = 64
+    ) -> None:
+        """
+        :param path: The file to map, ideally on a tmpfs like `/dev/shm`
+        :param capacity: The size of the ring, in bytes
+        :param slots: The maximum number of subscribers
+        """
+        self.path = path
+        self.capacity = capacity
+        self.slots = slots
+        # Records must be small enough that subscribers can tell when one they
+        # are reading is being overwritten
+        self.max_record = capacity // 16
+        self.published = 0
+        self._file = open(path, "w+b")
+        self._file.truncate(_data_offset(slots) + capacity)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        HEADER.pack_into(self._mm, 0, MAGIC, capacity, 0, 0, slots)
+        self._data = _data_offset(slots)
+        self._position = 0
+        self._seq = 0
+
+    def publish(self, msg: dict) -> None:
+        """Publish a decoded stream message, split up by symbol"""
+        stream = msg["stream"].encode()
+        data = msg["data"]
+        if isinstance(data, list):
+            groups: Dict[str, list] = {}
+            for payload in data:
+                symbol = payload.get("s", "") if isinstance(payload, dict) else ""
+                groups.setdefault(symbol, []).append(payload)
+            for symbol, payloads in groups.items():
+                self.write(stream, symbol.encode(), orjson.dumps(payloads))
+        else:
+            symbol = ""
+            if isinstance(data, dict):
+                symbol = data.get("s") or data.get("symbol") or ""
+            self.write(stream, symbol.encode(), orjson.dumps(data))
+
+    def write(self, stream: bytes, symbol: bytes, payload: bytes) -> None:
+        """Append a record to the ring"""
+        size = RECORD.size + len(stream) + len(symbol) + len(payload)
+        if size > self.max_record:
+            log.error(f"Dropping {size} byte {stream!r} record")
+            return
+        position = self._position
+        offset = position % self.capacity
+        if offset + size > self.capacity:
+            if self.capacity - offset >= 4:
+                struct.pack_into("<I", self._mm, self._data + offset, WRAP)
+            position += self.capacity - offset
+            offset = 0
+        start = self._data + offset
+        RECORD.pack_into(self._mm, start, size, self._seq, len(stream), len(symbol))
+        start += RECORD.size
+        end = start + len(stream) + len(symbol) + len(payload)
+        self._mm[start:end] = stream + symbol + payload
+        self._position = position + size
+        self._seq += 1
+        # Publish the record only once it is complete
+        POSITION.pack_into(self._mm, POSITION_OFFSET, self._position, self._seq)
+        self.published += 1
+
+    def readers(self, slow: float = 0.5) -> List[dict]:
+        """The subscribers attached to the ring, and how far behind they are.
+
+        Subscribers more than `slow` of the ring behind are flagged as slow,
+        and those more than the whole ring behind have lost messages. The
+        slots of subscribers whose process has died are freed.
+        """
+        readers = []
+        for slot in range(self.slots):
+            offset = SLOTS_OFFSET + slot * SLOT.size
+            pid, position = SLOT.unpack_from(self._mm, offset)
+            if not pid:
+                continue
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                SLOT.pack_into(self._mm, offset, 0, 0)
+                continue
+            except PermissionError:
+                pass
+            lag = self._position - position
+            readers.append(
+                {
+                    "slot": slot,
+                    "pid": pid,
+                    "lag": lag,
+                    "slow": lag > self.capacity * slow,
+                    "lapped": lag > self.capacity,
+                }
+            )
+        return readers
+
+    def slow_readers(self, slow: float = 0.5) -> List[dict]:
+        """The subscribers more than `slow` of the ring behind"""
+        readers = [reader for reader in self.readers(slow) if reader["slow"]]
+        for reader in readers:
+            log.warning(f"Slow fanout subscriber: {reader}")
+        return readers
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+class FanoutSubscriber:
+    """Reads the messages published by a `FanoutPublisher`.
+
+        subscriber = FanoutSubscriber("/dev/shm/binancechain", streams=["trades"])
+        async for msg in subscriber:
+            ...
+
+    Reading starts with the next message to be published. If the publisher
+    laps us, the messages we missed are counted in `lost`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        streams: Optional[Iterable[str]] = None,
+        symbols: Optional[Iterable[str]] = None,
+        interval: float = 0.001,
+    ) -> None:
+        """
+        :param path: The file the publisher maps
+        :param streams: Only read messages of these streams
+        :param symbols: Only read messages about these symbols
+        :param interval: How often to poll for messages when iterating
+        """
+        self.streams = {stream.encode() for stream in streams} if streams else None
+        self.symbols = {symbol.encode() for symbol in symbols} if symbols else None
+        self.interval = interval
+        self._pending: Deque[dict] = deque()
+        self.lost = 0
+        self.overruns = 0
+        self._file = open(path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._view = memoryview(self._mm)
+        magic, capacity, position, seq, slots = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a fanout buffer")
+        self.capacity = capacity
+        self._max_record = capacity // 16
+        self._data = _data_offset(slots)
+        self.position = position
+        self._seq = seq
+        self._slot = self._claim_slot(slots)
+
+    def _claim_slot(self, slots: int) -> int:
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            for slot in range(slots):
+                offset = SLOTS_OFFSET + slot * SLOT.size
+                pid, _ = SLOT.unpack_from(self._mm, offset)
+                if pid:
+                    try:
+                        os.kill(pid, 0)
+                        continue
+                    except ProcessLookupError:
+                        pass
+                    except PermissionError:
+                        continue
+                SLOT.pack_into(self._mm, offset, os.getpid(), self.position)
+                return slot
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        raise RuntimeError("No free fanout subscriber slots")
+
+    @property
+    def lag(self) -> int:
+        """How many bytes we are behind the publisher"""
+        return POSITION.unpack_from(self._mm, POSITION_OFFSET)[0] - self.position
+
+    def read(self) -> Iterator[Tuple[str, str, memoryview]]:
+        """The (stream, symbol, payload) of the messages published since the
+        last read that pass our filters.
+
+        Payloads are views into the ring, valid until the publisher laps us,
+        so decode or copy them before reading on.
+        """
+        mm, view, data, capacity = self._mm, self._view, self._data, self.capacity
+        write_position, seq = POSITION.unpack_from(mm, POSITION_OFFSET)
+        if write_position - self.position > capacity:
+            self._overrun(write_position, seq)
+        try:
+            while self.position < write_position:
+                offset = self.position % capacity
+                if capacity - offset < RECORD.size or (
+                    struct.unpack_from("<I", mm, data + offset)[0] == WRAP
+                ):
+                    self.position += capacity - offset
+                    continue
+                start = data + offset
+                size, record_seq, stream_size, symbol_size = RECORD.unpack_from(
+                    mm, start
+                )
+                start += RECORD.size
+                stream = mm[start : start + stream_size]
+                start += stream_size
+                symbol = mm[start : start + symbol_size]
+                start += symbol_size
+                # Make sure the publisher hasn't started overwriting the record
+                write_position, seq = POSITION.unpack_from(mm, POSITION_OFFSET)
+                if write_position + self._max_record - self.position > capacity:
+                    self._overrun(write_position, seq)
+                    continue
+                if record_seq > self._seq:
+                    self.lost += record_seq - self._seq
+                self._seq = record_seq + 1
+                self.position += size
+                if self.streams is not None and stream not in self.streams:
+                    continue
+                if self.symbols is not None and symbol not in self.symbols:
+                    continue
+                end = data + offset + size
+                # Let the publisher see how far we got, even if we stop here
+                self._report()
+                yield stream.decode(), symbol.decode(), view[start:end]
+        finally:
+            self._report()
+
+    def _report(self) -> None:
+        """Record our position in our slot, for `FanoutPublisher.readers`"""
+        SLOT.pack_into(
+            self._mm, SLOTS_OFFSET + self._slot * SLOT.size, os.getpid(), self.position
+        )
+
+    def _overrun(self, write_position: int, seq: int) -> None:
+        """Skip to the newest message after being lapped by the publisher"""
+        self.overruns += 1
+        self.lost += seq - self._seq
+        log.warning(f"Fanout subscriber lapped, lost {seq - self._seq} messages")
+        self.position = write_position
+        self._seq = seq
+
+    def messages(self) -> Iterator[dict]:
+        """The decoded messages published since the last read"""
+        for stream, _, payload in self.read():
+            yield {"stream": stream, "data": orjson.loads(payload)}
+
+    def __aiter__(self) -> "FanoutSubscriber":
+        return self
+
+    async def __anext__(self) -> dict:
+        while not self._pending:
+            self._pending.extend(self.messages())
+            if not self._pending:
+                await asyncio.sleep(self.interval)
+        return self._pending.popleft()
+
+    def close(self) -> None:
+        """Detach from the ring, freeing our slot"""
+        SLOT.pack_into(self._mm, SLOTS_OFFSET + self._slot * SLOT.size, 0, 0)
+        self._view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            log.warning("Payload views are still held, leaving the ring mapped")
+        self._file.close()
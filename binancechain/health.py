@@ -0,0 +1,147 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Liveness of a WebSocket connection: ping/pong round trips, and whether the
+streams that push on a fixed cadence are still pushing.
+"""
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from .metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+# How often streams push updates, in seconds. Streams that push whenever
+# something happens, like `trades` or `orders`, have no cadence.
+CADENCES = {
+    "ticker": 1.0,
+    "allTickers": 1.0,
+    "miniTicker": 1.0,
+    "allMiniTickers": 1.0,
+    "marketDepth": 1.0,
+    "blockheight": 1.0,
+    "kline_": 1.0,
+}
+
+# Unanswered pings after which the connection is considered dead
+MAX_MISSED_PONGS = 2
+
+
+class ConnectionHealth:
+    """Tracks the round trip time of a connection and the freshness of its
+    streams, and scores its health between 0 and 1.
+
+    A stream is stale once it has been silent for `tolerance` times its
+    cadence. The score is the fraction of cadenced streams that are fresh,
+    scaled down when the round trip time exceeds `max_rtt`, and is 0 once
+    `MAX_MISSED_PONGS` pings in a row went unanswered.
+    """
+
+    def __init__(
+        self,
+        tolerance: float = 3.0,
+        max_rtt: float = 1.0,
+        cadences: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        :param tolerance: The number of missed pushes before a stream is stale
+        :param max_rtt: The round trip time above which the score drops
+        :param cadences: Extra or overridden stream cadences, see `CADENCES`
+        """
+        self.tolerance = tolerance
+        self.max_rtt = max_rtt
+        self.cadences = dict(CADENCES, **(cadences or {}))
+        self.rtt: Optional[float] = None
+        self.rtts = Histogram()
+        self.missed_pongs = 0
+        self.last_seen: Dict[str, float] = {}
+        self.stale: Set[str] = set()
+        self.stale_events = 0
+        self._since = time.monotonic()
+        self._ping_sent: Optional[float] = None
+
+    def cadence(self, stream: str) -> Optional[float]:
+        """How often `stream` pushes updates, if it does so regularly"""
+        cadence = self.cadences.get(stream)
+        if cadence is None:
+            prefix, _, _ = stream.partition("_")
+            cadence = self.cadences.get(prefix + "_")
+        return cadence
+
+    def reset(self) -> None:
+        """Start afresh on a new connection"""
+        self._since = time.monotonic()
+        self._ping_sent = None
+        self.missed_pongs = 0
+        self.last_seen.clear()
+        self.stale.clear()
+
+    def seen(self, stream: str) -> None:
+        """Record a message from `stream`"""
+        self.last_seen[stream] = time.monotonic()
+
+    def ping(self) -> None:
+        """Record that a ping was sent, counting the previous one as missed if
+        it is still unanswered"""
+        if self._ping_sent is not None:
+            self.missed_pongs += 1
+        self._ping_sent = time.monotonic()
+
+    def pong(self) -> None:
+        """Record that a pong was received"""
+        if self._ping_sent is None:
+            return
+        self.rtt = time.monotonic() - self._ping_sent
+        self.rtts.observe(self.rtt)
+        self._ping_sent = None
+        self.missed_pongs = 0
+
+    @property
+    def dead(self) -> bool:
+        return self.missed_pongs >= MAX_MISSED_PONGS
+
+    def silence(self, stream: str) -> float:
+        """Seconds since the last message of `stream`, or since we connected"""
+        return time.monotonic() - self.last_seen.get(stream, self._since)
+
+    def check(self, streams: Iterable[str]) -> List[dict]:
+        """Find the streams that just went stale, out of `streams`"""
+        events = []
+        for stream in streams:
+            cadence = self.cadence(stream)
+            if cadence is None:
+                continue
+            silence = self.silence(stream)
+            if silence < cadence * self.tolerance:
+                self.stale.discard(stream)
+            elif stream not in self.stale:
+                self.stale.add(stream)
+                self.stale_events += 1
+                events.append(
+                    {"stream": stream, "silence": silence, "expected": cadence}
+                )
+        return events
+
+    def score(self, streams: Iterable[str]) -> float:
+        """The health of the connection, from 0 (dead) to 1"""
+        if self.dead:
+            return 0.0
+        cadenced = [stream for stream in streams if self.cadence(stream)]
+        score = 1.0
+        if cadenced:
+            fresh = [stream for stream in cadenced if stream not in self.stale]
+            score = len(fresh) / len(cadenced)
+        if self.rtt and self.rtt > self.max_rtt:
+            score *= self.max_rtt / self.rtt
+        return score
+
+    def snapshot(self, streams: Iterable[str]) -> dict:
+        streams = list(streams)
+        return {
+            "score": self.score(streams),
+            "rtt": self.rtt,
+            "missed_pongs": self.missed_pongs,
+            "stale": sorted(self.stale),
+            "silence": {stream: self.silence(stream) for stream in streams},
+        }
@@ -21,6 +21,17 @@ MAINNET_URL = "https://dex.binance.org"
 TESTNET_URL = "https://testnet-dex.binance.org"
 
 
+def is_rate_limited(status: int, data: Any) -> bool:
+    """Does this response indicate that we are being rate-limited?"""
+    if status == 429:
+        return True
+    if isinstance(data, dict):
+        message = data.get("message")
+        if isinstance(message, str) and "rate limit" in message.lower():
+            return True
+    return False
+
+
 class HTTPClient:
     """ Binance Chain HTTP API Client """
 
@@ -30,12 +41,16 @@ class HTTPClient:
         api_version: str = "v1",
         url=None,
         rate_limit: bool = False,
+        adaptive_rate_limit: bool = False,
     ):
         """
         :param testnet: Use testnet instead of mainnet
         :param api_version: The API version to use
         :param session: An optional HTTP session to use
         :param rate_limit: Enable automatic rate-limiting
+        :param adaptive_rate_limit: Enable rate-limiting that backs off when
+            the server reports we are being limited, and probes back up to the
+            documented limits while requests succeed.
         """
         if not url:
             url = TESTNET_URL if testnet else MAINNET_URL
@@ -43,9 +58,16 @@ class HTTPClient:
         self._session: Optional[aiohttp.ClientSession] = None
         self._testnet = testnet
         self._rate_limiter: Optional[RateLimiter] = None
-        if rate_limit:
+        if adaptive_rate_limit:
+            self._rate_limiter = RateLimiter(adaptive=True)
+        elif rate_limit:
             self._rate_limiter = RateLimiter()
 
+    @property
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        """The rate limiter in use, if any"""
+        return self._rate_limiter
+
     def __del__(self):
         if self._session:  # pragma: nocover
             warnings.warn(f"{repr(self)}.close() was never awaited")
@@ -68,15 +90,23 @@ class HTTPClient:
         """
         if not self._session:
             self._session = aiohttp.ClientSession()
+        namespace = path.split("/")[0]
         if self._rate_limiter:
-            await self._rate_limiter.limit(path.split("/")[0], rps)
+            await self._rate_limiter.limit(namespace, rps)
         try:
             resp = None
             async with getattr(self._session, method)(
                 self._server + path, **kwargs
             ) as resp:
-                return await resp.json(loads=orjson.loads)
+                data = await resp.json(loads=orjson.loads)
+                if self._rate_limiter:
+                    self._rate_limiter.feedback(
+                        namespace, is_rate_limited(resp.status, data)
+                    )
+                return data
         except Exception as e:
+            if self._rate_limiter and resp is not None and resp.status == 429:
+                self._rate_limiter.feedback(namespace, True)
             log.exception(f"Request error: {method} {path} {kwargs}")
             raise BinanceChainException(resp) from e
 
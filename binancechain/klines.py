@@ -0,0 +1,295 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Build klines of every interval locally, from the `trades` stream or from
+`kline_1m`, instead of subscribing to one kline stream per interval.
+
+Times are in milliseconds, and prices and volumes are fixed-point integers
+with 8 decimals, like in `binancechain.orderbook`.
+"""
+import logging
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .orderbook import SCALE, to_fixed
+from .websocket import WebSocket
+
+log = logging.getLogger(__name__)
+
+MINUTE = 60 * 1000
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# The length of each interval, with months handled separately
+INTERVALS = {
+    "1m": MINUTE,
+    "3m": 3 * MINUTE,
+    "5m": 5 * MINUTE,
+    "15m": 15 * MINUTE,
+    "30m": 30 * MINUTE,
+    "1h": HOUR,
+    "2h": 2 * HOUR,
+    "4h": 4 * HOUR,
+    "6h": 6 * HOUR,
+    "8h": 8 * HOUR,
+    "12h": 12 * HOUR,
+    "1d": DAY,
+    "3d": 3 * DAY,
+    "1w": 7 * DAY,
+    "1M": 0,
+}
+
+# Weeks start on Monday, and the epoch was a Thursday
+WEEK_OFFSET = 4 * DAY
+
+# The fields of a bar in the per-symbol arrays, followed by the time of its
+# latest update. Prices on Binance Chain are 64-bit integers, so these fit in
+# signed 64-bit array slots.
+OPEN_TIME, CLOSE_TIME, OPEN, HIGH, LOW, CLOSE, TRADES = range(7)
+LAST_TIME = 7
+FIELDS = 8
+
+# The volumes of a bar, in per-symbol lists. Their sums, and quote volumes in
+# particular, can outgrow 64 bits, so these are kept as Python integers.
+VOLUME, QUOTE_VOLUME = range(2)
+VOLUMES = 2
+
+
+class Kline(NamedTuple):
+    symbol: str
+    interval: str
+    open_time: int
+    close_time: int
+    open: int
+    high: int
+    low: int
+    close: int
+    volume: int
+    quote_volume: int
+    trades: int
+    closed: bool
+
+
+def to_millis(timestamp: int) -> int:
+    """Normalize a timestamp in seconds, milliseconds, microseconds or
+    nanoseconds to milliseconds"""
+    if timestamp > 10 ** 17:
+        return timestamp // 1000000
+    if timestamp > 10 ** 14:
+        return timestamp // 1000
+    if timestamp > 10 ** 11:
+        return timestamp
+    return timestamp * 1000
+
+
+def bucket(interval: str, timestamp: int) -> Tuple[int, int]:
+    """The (open time, close time) of the bar of `interval` containing
+    `timestamp`, in milliseconds. The close time is the last millisecond of
+    the bar, as in the klines returned by Binance."""
+    if interval == "1M":
+        date = datetime.fromtimestamp(timestamp / 1000, timezone.utc)
+        start = datetime(date.year, date.month, 1, tzinfo=timezone.utc)
+        if date.month == 12:
+            end = datetime(date.year + 1, 1, 1, tzinfo=timezone.utc)
+        else:
+            end = datetime(date.year, date.month + 1, 1, tzinfo=timezone.utc)
+        return int(start.timestamp()) * 1000, int(end.timestamp()) * 1000 - 1
+    length = INTERVALS[interval]
+    offset = WEEK_OFFSET if interval == "1w" else 0
+    start = (timestamp - offset) // length * length + offset
+    return start, start + length - 1
+
+
+class KlineAggregator:
+    """Builds klines of several intervals from trades or 1 minute klines.
+
+    The bar in progress of every interval of a symbol lives in a single
+    `array`, with its volumes in a list, and is folded into with each trade.
+    A bar is closed, and passed to `on_close`, by the first update that
+    belongs to a later bar, or by `close_expired` once its close time has
+    passed.
+
+        klines = KlineAggregator(["1m", "5m", "1h"], on_close=on_bar)
+        klines.attach(ws, symbols)
+    """
+
+    def __init__(
+        self,
+        intervals: Iterable[str] = tuple(INTERVALS),
+        on_close: Optional[Callable[[Kline], None]] = None,
+        on_update: Optional[Callable[[Kline], None]] = None,
+    ) -> None:
+        """
+        :param intervals: The intervals to build, like `1m` or `1M`
+        :param on_close: Called with each bar once it is closed
+        :param on_update: Called with each bar in progress after an update
+        """
+        self.intervals = list(intervals)
+        for interval in self.intervals:
+            if interval not in INTERVALS:
+                raise ValueError(f"Unknown kline interval {interval}")
+        self.on_close = on_close
+        self.on_update = on_update
+        self.bars: Dict[str, array] = {}
+        self.volumes: Dict[str, List[int]] = {}
+        # Updates older than the bar in progress, which are ignored
+        self.late = 0
+        # The latest unclosed `kline_1m` of each symbol
+        self._partial: Dict[str, dict] = {}
+
+    def attach(
+        self, websocket: WebSocket, symbols: List[str], source: str = "trades"
+    ) -> None:
+        """Subscribe to `source`, either `trades` or `kline_1m`"""
+        if source == "trades":
+            websocket.subscribe_trades(symbols, callback=self.on_trades)
+        elif source == "kline_1m":
+            websocket.subscribe_kline("1m", symbols, callback=self.on_kline)
+        else:
+            raise ValueError(f"Cannot build klines from {source}")
+
+    def on_trades(self, msg: dict) -> None:
+        """Handle a `trades` stream message"""
+        for trade in msg["data"]:
+            price = to_fixed(trade["p"])
+            quantity = to_fixed(trade["q"])
+            self.add(
+                trade["s"],
+                to_millis(trade["T"]),
+                price,
+                price,
+                price,
+                price,
+                quantity,
+                price * quantity // SCALE,
+                1,
+            )
+
+    def on_kline(self, msg: dict) -> None:
+        """Handle a `kline_1m` stream message.
+
+        Only closed 1 minute bars are folded into the other intervals, so a
+        bar is added once its `x` flag is set, or once the next one starts.
+        """
+        kline = msg["data"]["k"]
+        symbol = kline["s"]
+        partial = self._partial.get(symbol)
+        if partial and partial["t"] != kline["t"]:
+            self._add_kline(partial)
+        if kline["x"]:
+            self._partial.pop(symbol, None)
+            self._add_kline(kline)
+        else:
+            self._partial[symbol] = kline
+
+    def _add_kline(self, kline: dict) -> None:
+        self.add(
+            kline["s"],
+            kline["t"],
+            to_fixed(kline["o"]),
+            to_fixed(kline["h"]),
+            to_fixed(kline["l"]),
+            to_fixed(kline["c"]),
+            to_fixed(kline["v"]),
+            to_fixed(kline["q"]),
+            int(kline["n"]),
+        )
+
+    def add(
+        self,
+        symbol: str,
+        timestamp: int,
+        open: int,
+        high: int,
+        low: int,
+        close: int,
+        volume: int,
+        quote_volume: int,
+        trades: int,
+    ) -> None:
+        """Fold a trade, or a smaller bar starting at `timestamp`, into the
+        bars of every interval"""
+        bars = self.bars.get(symbol)
+        if bars is None:
+            bars = self.bars[symbol] = array("q", [-1] * FIELDS * len(self.intervals))
+            self.volumes[symbol] = [0] * VOLUMES * len(self.intervals)
+        volumes = self.volumes[symbol]
+        late = False
+        for i, interval in enumerate(self.intervals):
+            base = i * FIELDS
+            offset = i * VOLUMES
+            if timestamp > bars[base + CLOSE_TIME]:
+                if bars[base + OPEN_TIME] != -1:
+                    self._close(symbol, i)
+                start, end = bucket(interval, timestamp)
+                bars[base + OPEN_TIME] = start
+                bars[base + CLOSE_TIME] = end
+                bars[base + OPEN] = open
+                bars[base + HIGH] = high
+                bars[base + LOW] = low
+                bars[base + CLOSE] = close
+                volumes[offset + VOLUME] = volume
+                volumes[offset + QUOTE_VOLUME] = quote_volume
+                bars[base + TRADES] = trades
+                bars[base + LAST_TIME] = timestamp
+            elif timestamp < bars[base + OPEN_TIME] or bars[base + OPEN_TIME] == -1:
+                late = True
+                continue
+            else:
+                if high > bars[base + HIGH]:
+                    bars[base + HIGH] = high
+                if low < bars[base + LOW]:
+                    bars[base + LOW] = low
+                if timestamp >= bars[base + LAST_TIME]:
+                    bars[base + CLOSE] = close
+                    bars[base + LAST_TIME] = timestamp
+                volumes[offset + VOLUME] += volume
+                volumes[offset + QUOTE_VOLUME] += quote_volume
+                bars[base + TRADES] += trades
+            if self.on_update:
+                self.on_update(self._kline(symbol, i, False))
+        if late:
+            self.late += 1
+
+    def bar(self, symbol: str, interval: str) -> Optional[Kline]:
+        """The bar in progress of a symbol and interval"""
+        bars = self.bars.get(symbol)
+        i = self.intervals.index(interval)
+        if bars is None or bars[i * FIELDS + OPEN_TIME] == -1:
+            return None
+        return self._kline(symbol, i, False)
+
+    def close_expired(self, now: int) -> List[Kline]:
+        """Close the bars whose close time is before `now` milliseconds.
+
+        Call this periodically to close bars of quiet markets without waiting
+        for their next trade.
+        """
+        closed = []
+        for symbol, bars in self.bars.items():
+            for i in range(len(self.intervals)):
+                base = i * FIELDS
+                if bars[base + OPEN_TIME] != -1 and bars[base + CLOSE_TIME] < now:
+                    closed.append(self._close(symbol, i))
+                    bars[base + OPEN_TIME] = -1
+        return closed
+
+    def _close(self, symbol: str, i: int) -> Kline:
+        kline = self._kline(symbol, i, True)
+        if self.on_close:
+            self.on_close(kline)
+        return kline
+
+    def _kline(self, symbol: str, i: int, closed: bool) -> Kline:
+        bars, volumes = self.bars[symbol], self.volumes[symbol]
+        base, offset = i * FIELDS, i * VOLUMES
+        return Kline(
+            symbol,
+            self.intervals[i],
+            *bars[base : base + CLOSE + 1],
+            volumes[offset + VOLUME],
+            volumes[offset + QUOTE_VOLUME],
+            bars[base + TRADES],
+            closed,
+        )
@@ -0,0 +1,172 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+End-to-end latency of WebSocket streams: how late messages arrive relative to
+their exchange timestamps, and how long we take to process them.
+"""
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .httpclient import HTTPClient
+from .metrics import Histogram, Rate, render_prometheus
+from .websocket import WebSocket
+
+log = logging.getLogger(__name__)
+
+# Exchange timestamps further than this from our clock aren't times, like the
+# block height in the `E` field of trades
+MAX_LAG = 24 * 60 * 60
+
+
+def parse_time(value: str) -> float:
+    """Parse an ISO 8601 time like `2019-06-05T13:47:12.123456789Z`"""
+    value = value.rstrip("Z")
+    whole, _, frac = value.partition(".")
+    date = datetime.strptime(whole, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    return date.timestamp() + (float(f"0.{frac}") if frac else 0.0)
+
+
+def event_time(msg: dict) -> Optional[float]:
+    """The exchange timestamp of a stream message, in seconds, if it has one"""
+    data = msg.get("data")
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if not isinstance(data, dict):
+        return None
+    for key in ("T", "E"):
+        value = data.get(key)
+        if isinstance(value, int):
+            # Normalize seconds, milliseconds, microseconds or nanoseconds
+            for scale in (1e9, 1e6, 1e3, 1.0):
+                if value > 1e8 * scale:
+                    return value / scale
+    return None
+
+
+class StreamLatency:
+    """The latency and throughput of a single stream"""
+
+    __slots__ = ("messages", "rate", "lag", "processing")
+
+    def __init__(self):
+        self.messages = 0
+        self.rate = Rate()
+        # Exchange timestamp to receipt, adjusted by our clock offset
+        self.lag = Histogram()
+        # Receipt to completion of the handlers
+        self.processing = Histogram()
+
+    def snapshot(self) -> dict:
+        return {
+            "messages": self.messages,
+            "rate": self.rate.value,
+            "lag": self.lag.snapshot(),
+            "processing": self.processing.snapshot(),
+        }
+
+
+class LatencyMonitor:
+    """Measures the latency of the messages and handlers of a `WebSocket`.
+
+        monitor = LatencyMonitor()
+        monitor.attach(ws)
+        await monitor.sync_clock(client)
+        print(monitor.snapshot(), monitor.slowest_handlers())
+
+    The lag of a message is measured from its exchange timestamp (`T` or `E`)
+    to when its frame was received, corrected by the offset between our clock
+    and the exchange's, as estimated by `sync_clock`. Its processing time runs
+    from receipt, through decoding, to the return of its handlers.
+    """
+
+    def __init__(self) -> None:
+        self.streams: Dict[str, StreamLatency] = {}
+        self.handlers: Dict[Tuple[str, str], Histogram] = {}
+        # Seconds to add to our clock to get the exchange's
+        self.offset = 0.0
+        # The round trip time of the request the offset was estimated from
+        self.offset_rtt: Optional[float] = None
+
+    def attach(self, websocket: WebSocket) -> None:
+        """Start measuring the messages and handlers of `websocket`"""
+        websocket.instrument(self)
+
+    def observe(self, msg: dict, received: Optional[float], processing: float):
+        """Record a message received at `received` and processed in
+        `processing` seconds"""
+        stream = msg["stream"]
+        stats = self.streams.get(stream)
+        if stats is None:
+            stats = self.streams[stream] = StreamLatency()
+        stats.messages += 1
+        stats.rate.record(time.monotonic())
+        stats.processing.observe(processing)
+        if received is not None:
+            sent = event_time(msg)
+            if sent is not None:
+                lag = received + self.offset - sent
+                if abs(lag) < MAX_LAG:
+                    stats.lag.observe(max(lag, 0.0))
+
+    def observe_handler(self, stream: str, handler: Callable, seconds: float):
+        """Record how long a handler of `stream` took"""
+        name = getattr(handler, "__qualname__", None) or repr(handler)
+        histogram = self.handlers.get((stream, name))
+        if histogram is None:
+            histogram = self.handlers[(stream, name)] = Histogram()
+        histogram.observe(seconds)
+
+    async def sync_clock(self, client: HTTPClient, samples: int = 3) -> float:
+        """Estimate the offset of our clock from `HTTPClient.get_time`.
+
+        The sample with the shortest round trip is used, assuming the server
+        read its clock halfway through it.
+        """
+        best: Optional[float] = None
+        for _ in range(samples):
+            start = time.time()
+            response = await client.get_time()
+            end = time.time()
+            rtt = end - start
+            if best is None or rtt < best:
+                best = rtt
+                server = parse_time(response["ap_time"])
+                self.offset = server - (start + end) / 2
+                self.offset_rtt = rtt
+        log.debug(f"Clock offset {self.offset:.6f}s (rtt {self.offset_rtt:.6f}s)")
+        return self.offset
+
+    def slowest_handlers(self, n: int = 10) -> List[dict]:
+        """The `n` handlers with the highest p99 time, slowest first"""
+        ranked = sorted(
+            self.handlers.items(),
+            key=lambda item: (item[1].quantile(0.99), item[1].max),
+            reverse=True,
+        )
+        return [
+            {"stream": stream, "handler": name, **histogram.snapshot()}
+            for (stream, name), histogram in ranked[:n]
+        ]
+
+    def snapshot(self) -> Dict[str, dict]:
+        """The latency and throughput of every stream"""
+        return {stream: stats.snapshot() for stream, stats in self.streams.items()}
+
+    def export(self) -> str:
+        """Our stream metrics in the Prometheus text format"""
+        return render_prometheus(
+            "binancechain_ws",
+            "stream",
+            {
+                stream: {
+                    "messages": stats.messages,
+                    "rate": stats.rate.value,
+                    "lag_seconds": stats.lag,
+                    "processing_seconds": stats.processing,
+                }
+                for stream, stats in self.streams.items()
+            },
+            counters=("messages",),
+        )
@@ -0,0 +1,136 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Lightweight metrics primitives, exportable as plain dicts or in the
+Prometheus text exposition format.
+"""
+import bisect
+import math
+import time
+from typing import Collection, Dict, List, Sequence, Union
+
+# Seconds, from 100µs to ~100s
+DEFAULT_BOUNDS = tuple(10 ** (e / 2) for e in range(-8, 5))
+
+
+class Histogram:
+    """A fixed-bucket histogram with O(log n) observations"""
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimate the `q` quantile as the upper bound of its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            buckets[bound] = cumulative
+        buckets[math.inf] = self.count
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class Rate:
+    """Events per second, counted over the last complete second"""
+
+    __slots__ = ("_rate", "_window_start", "_window_count")
+
+    def __init__(self):
+        self._rate = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def record(self, now: float) -> None:
+        """Count an event at `now`, in `time.monotonic` seconds"""
+        elapsed = now - self._window_start
+        if elapsed >= 1:
+            self._rate = self._window_count if elapsed < 2 else 0
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+
+    @property
+    def value(self) -> int:
+        if time.monotonic() - self._window_start >= 2:
+            return 0
+        return self._rate
+
+
+Sample = Union[int, float, Histogram]
+
+
+def render_prometheus(
+    prefix: str,
+    label: str,
+    samples: Dict[str, Dict[str, Sample]],
+    counters: Collection[str] = (),
+) -> str:
+    """Render `{label_value: {metric: value}}` in the Prometheus text format.
+
+    The metrics named in `counters` only ever increase, and are exported as
+    counters with a `_total` suffix. Other numbers are exported as gauges.
+    """
+    lines: List[str] = []
+    names: Dict[str, Sample] = {}
+    for metrics in samples.values():
+        for name, value in metrics.items():
+            names.setdefault(name, value)
+    for name, example in names.items():
+        metric = f"{prefix}_{name}"
+        if isinstance(example, Histogram):
+            kind = "histogram"
+        elif name in counters:
+            kind = "counter"
+            metric += "_total"
+        else:
+            kind = "gauge"
+        lines.append(f"# TYPE {metric} {kind}")
+        for key, metrics in samples.items():
+            if name not in metrics:
+                continue
+            value = metrics[name]
+            labels = f'{label}="{key}"'
+            if isinstance(value, Histogram):
+                for bound, count in value.snapshot()["buckets"].items():
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"{metric}_sum{{{labels}}} {value.sum}")
+                lines.append(f"{metric}_count{{{labels}}} {value.count}")
+            else:
+                lines.append(f"{metric}{{{labels}}} {value}")
+    return "\n".join(lines) + "\n"
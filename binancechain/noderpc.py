@@ -14,13 +14,25 @@ Endpoints that require arguments:
 import itertools
 import warnings
 import logging
-from typing import Any, Optional, Callable
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Callable,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import asyncio
 import aiohttp
 import orjson
 
 from .exceptions import BinanceChainException
+from .rpccache import RPCCache
 
 log = logging.getLogger(__name__)
 
@@ -28,21 +40,56 @@ MAINNET_URL = "https://seed1.longevito.io:443/"
 TESTNET_URL = "https://seed-pre-s3.binance.org/"
 
 
+class BlockData(NamedTuple):
+    height: int
+    block: dict
+    # The `block_results` of the block, if requested
+    results: Optional[dict]
+
+
 class NodeRPC:
     """ Binance Chain Node RPC HTTP API Client """
 
-    def __init__(self, url: str = None, testnet: bool = True):
+    def __init__(
+        self,
+        url: str = None,
+        testnet: bool = True,
+        batch_size: Optional[int] = None,
+        batch_interval: Optional[float] = 0.0,
+        cache: Optional[RPCCache] = None,
+        confirmations: int = 1,
+    ):
         """
         :param: url: binance chain node URL
         :param testnet: A boolean to enable testnet
-        :param session: An optional HTTP session to use
+        :param batch_size: Send JSON-RPC calls in batches of up to this many,
+            rather than one per request
+        :param batch_interval: How long to wait for more calls before sending
+            a partial batch, in seconds. The default of 0 sends the calls made
+            in the same iteration of the event loop together. With None,
+            partial batches are only sent by `flush`.
+        :param cache: Where to keep the blocks, block results, commits and
+            validator sets of final heights, rather than refetching them
+        :param confirmations: The number of blocks on top of a height before
+            its responses are cached
         """
         if not url:
             self.url = TESTNET_URL if testnet else MAINNET_URL
+        else:
+            self.url = url
         self._id = itertools.count()
         self._session: Optional[aiohttp.ClientSession] = None
         self._testnet = testnet
         self._keepalive_task: Optional[asyncio.Future] = None
+        self._batch_size = batch_size
+        self._batch_interval = batch_interval
+        self._batch: List[Tuple[dict, asyncio.Future]] = []
+        self._batch_timer: Optional[asyncio.TimerHandle] = None
+        self.cache = cache
+        self.confirmations = confirmations
+        # The latest height known to the node, and the request updating it
+        self._latest_height = 0
+        self._status: Optional[asyncio.Future] = None
 
     def __del__(self):
         if self._session and not self._session.closed:
@@ -75,6 +122,8 @@ class NodeRPC:
             "jsonrpc": "2.0",
             "id": str(next(self._id)),
         }
+        if self._batch_size:
+            return await self._queue(payload)
         if not self._session:
             self._session = aiohttp.ClientSession()
         try:
@@ -83,6 +132,131 @@ class NodeRPC:
         except Exception as e:
             raise BinanceChainException(resp) from e
 
+    def _queue(self, payload: dict) -> asyncio.Future:
+        """Add a call to the next batch"""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._batch.append((payload, future))
+        if len(self._batch) >= self._batch_size:  # type: ignore
+            self._send_pending()
+        elif self._batch_timer is None and self._batch_interval is not None:
+            self._batch_timer = loop.call_later(
+                self._batch_interval, self._send_pending
+            )
+        return future
+
+    def _send_pending(self) -> None:
+        if self._batch_timer:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch, self._batch = self._batch, []
+        if batch:
+            asyncio.ensure_future(self._post_batch(batch))
+
+    async def flush(self) -> None:
+        """Send the calls queued for the next batch now"""
+        if self._batch_timer:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch, self._batch = self._batch, []
+        if batch:
+            await self._post_batch(batch)
+
+    async def _post_batch(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        """Send a batch of calls as a JSON-RPC array, resolving the future of
+        each call with the response of the same id.
+
+        Errors that concern the whole batch, like a failed request or a
+        response without an id, are raised to every caller still waiting.
+        """
+        futures: Dict[str, asyncio.Future] = {
+            payload["id"]: future for payload, future in batch
+        }
+        if not self._session:
+            self._session = aiohttp.ClientSession()
+        resp = None
+        try:
+            async with self._session.post(
+                self.url,
+                data=orjson.dumps([payload for payload, _ in batch]),
+                headers={"Content-Type": "application/json"},
+            ) as resp:
+                responses = await resp.json(loads=orjson.loads)
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    error = BinanceChainException(resp)
+                    error.__cause__ = e
+                    future.set_exception(error)
+            return
+        if isinstance(responses, dict):
+            responses = [responses]
+        for response in responses:
+            future = futures.pop(str(response.get("id")), None)
+            if future is None:
+                # An error about the whole batch, like a parse error
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(BinanceChainException(response))
+                return
+            if not future.done():
+                future.set_result(response)
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(BinanceChainException(resp))
+
+    async def _cached_request(
+        self, method: str, height: Optional[Union[int, str]]
+    ) -> dict:
+        """Call a method that takes a height, through the cache.
+
+        Responses are only cached for heights with `confirmations` blocks on
+        top of them, never for the latest block.
+        """
+        if self.cache is None or height is None:
+            return await self.post_request(method, height)
+        response = self.cache.get(method, height)
+        if response is not None:
+            return response
+        response = await self.post_request(method, height)
+        if self._cacheable(method, response) and await self._final(int(height)):
+            self.cache.put(method, height, response)
+        return response
+
+    @staticmethod
+    def _cacheable(method: str, response: dict) -> bool:
+        result = response.get("result")
+        if "error" in response or not result:
+            return False
+        if method == "commit":
+            # The commit of the latest block isn't canonical yet
+            return bool(result.get("canonical"))
+        if method in ("block", "block_by_hash"):
+            return result.get("block") is not None
+        return True
+
+    async def _final(self, height: int) -> bool:
+        if height > self._latest_height - self.confirmations:
+            if self._status is None:
+                self._status = asyncio.ensure_future(self._update_latest_height())
+            try:
+                await asyncio.shield(self._status)
+            except BinanceChainException as e:
+                log.warning(f"Unable to fetch the latest height: {e!r}")
+                return False
+        return height <= self._latest_height - self.confirmations
+
+    async def _update_latest_height(self) -> None:
+        try:
+            status = await self.get_status()
+            try:
+                latest = int(status["result"]["sync_info"]["latest_block_height"])
+            except (KeyError, TypeError, ValueError) as e:
+                raise BinanceChainException(status) from e
+            self._latest_height = max(self._latest_height, latest)
+        finally:
+            self._status = None
+
     async def get_abci_info(self) -> dict:
         """Get some info about the application."""
         return await self.get_request("abci_info")
@@ -144,17 +318,127 @@ class NodeRPC:
 
         :param height: height of blockchain
         """
-        return await self.post_request("block", height)
+        return await self._cached_request("block", height)
+
+    async def iter_blocks(
+        self,
+        start: int,
+        end: int,
+        concurrency: int = 8,
+        block_results: bool = False,
+        nodes: Optional[Sequence["NodeRPC"]] = None,
+        retries: int = 3,
+        retry_delay: float = 1.0,
+        window: Optional[int] = None,
+    ) -> AsyncIterator[BlockData]:
+        """Fetch the blocks from `start` to `end` inclusive, many at a time,
+        yielding them in height order.
+
+            async for height, block, results in noderpc.iter_blocks(1, 10 ** 6):
+                ...
+
+        Blocks fetched ahead of the next one to yield wait in a reorder
+        buffer, and no block more than `window` heights ahead is fetched, so
+        memory stays bounded however slow the consumer is.
+
+        :param concurrency: The number of blocks to fetch at a time
+        :param block_results: Fetch the `block_results` of each block too
+        :param nodes: The clients of the nodes to spread requests across.
+            Defaults to this one.
+        :param retries: The number of times to retry a failed height, on the
+            next node each time, before giving up
+        :param retry_delay: The base delay of the exponential retry backoff
+        :param window: How far ahead of the consumer to fetch. Defaults to 4
+            times the concurrency.
+        """
+        clients = list(nodes or [self])
+        window = max(window or concurrency * 4, concurrency)
+        buffer: Dict[int, BlockData] = {}
+        condition = asyncio.Condition()
+        # The next height to yield, and the next one to fetch
+        position = start
+        claimed = start
+        failure: Optional[BaseException] = None
+
+        async def fetch(height: int) -> BlockData:
+            attempt = 0
+            while True:
+                node = clients[(height + attempt) % len(clients)]
+                try:
+                    if block_results:
+                        block, results = await asyncio.gather(
+                            node.block(height), node.block_results(height)
+                        )
+                    else:
+                        block, results = await node.block(height), None
+                    for response in (block, results):
+                        if response is not None and "error" in response:
+                            raise BinanceChainException(response)
+                    return BlockData(height, block, results)
+                except BinanceChainException as e:
+                    if attempt >= retries:
+                        raise
+                    log.warning(f"Unable to fetch block {height}: {e!r}, retrying")
+                    await asyncio.sleep(retry_delay * 2 ** attempt)
+                    attempt += 1
+
+        async def worker() -> None:
+            nonlocal claimed, failure
+            while True:
+                async with condition:
+                    await condition.wait_for(
+                        lambda: claimed > end or claimed < position + window
+                    )
+                    if claimed > end:
+                        return
+                    height = claimed
+                    claimed += 1
+                try:
+                    data = await fetch(height)
+                except Exception as e:
+                    async with condition:
+                        failure = e
+                        condition.notify_all()
+                    return
+                async with condition:
+                    buffer[height] = data
+                    condition.notify_all()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            while position <= end:
+                async with condition:
+                    await condition.wait_for(
+                        lambda: position in buffer or failure is not None
+                    )
+                    if position not in buffer:
+                        raise failure  # type: ignore
+                    data = buffer.pop(position)
+                    position += 1
+                    condition.notify_all()
+                yield data
+        finally:
+            for task in workers:
+                task.cancel()
 
     async def block_by_hash(self, hash: str) -> dict:
         """Query a block by it's hash.
         :param hash: the block hash
         """
-        return await self.post_request("block_by_hash", hash)
+        if self.cache is None:
+            return await self.post_request("block_by_hash", hash)
+        response = self.cache.get("block_by_hash", hash)
+        if response is None:
+            response = await self.post_request("block_by_hash", hash)
+            if self._cacheable("block_by_hash", response):
+                header = response["result"]["block"]["header"]
+                if await self._final(int(header["height"])):
+                    self.cache.put("block_by_hash", hash, response)
+        return response
 
     async def block_results(self, height: Optional[str] = None) -> dict:
         """Gets ABCIResults at a given height."""
-        return await self.post_request("block_results", height)
+        return await self._cached_request("block_results", height)
 
     async def blockchain(self, min_height: str, max_height: str) -> dict:
         """Get block headers for minHeight <= height <= maxHeight.
@@ -189,7 +473,7 @@ class NodeRPC:
         """Get block commit at a given height.
         If no height is provided, it will fetch the commit for the latest block.
         """
-        return await self.post_request("commit", height)
+        return await self._cached_request("commit", height)
 
     async def consensus_params(self, height: Optional[str] = None) -> dict:
         """Get consensus params at a given height."""
@@ -216,7 +500,7 @@ class NodeRPC:
 
     async def validators(self, height: str = None) -> dict:
         """Get information on the validators"""
-        return await self.post_request("validators", height)
+        return await self._cached_request("validators", height)
 
     def subscribe(
         self, query: str, callback: Optional[Callable[[dict], None]] = None
@@ -0,0 +1,300 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Locally maintained order books, bootstrapped from a `get_depth` snapshot and
+kept up to date with the `marketDiff` WebSocket stream.
+
+Prices and quantities are stored as fixed-point integers with 8 decimals,
+which is the precision used by Binance Chain.
+"""
+import asyncio
+import heapq
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .httpclient import HTTPClient
+from .websocket import WebSocket
+
+log = logging.getLogger(__name__)
+
+DECIMALS = 8
+SCALE = 10 ** DECIMALS
+
+
+def to_fixed(value: str) -> int:
+    """Convert a decimal string like "0.00012345" to a fixed-point integer"""
+    value = value.strip()
+    negative = value.startswith("-")
+    if negative:
+        value = value[1:]
+    whole, _, frac = value.partition(".")
+    frac = frac.rstrip("0")
+    if len(frac) > DECIMALS:
+        raise ValueError(f"{value} has more than {DECIMALS} decimals")
+    fixed = int(whole or "0") * SCALE + int(frac.ljust(DECIMALS, "0"))
+    return -fixed if negative else fixed
+
+
+def from_fixed(value: int) -> str:
+    """Convert a fixed-point integer back to a decimal string"""
+    sign = "-" if value < 0 else ""
+    whole, frac = divmod(abs(value), SCALE)
+    return f"{sign}{whole}.{frac:0{DECIMALS}d}"
+
+
+class BookSide:
+    """One side of an order book.
+
+    Price levels live in a dict for O(1) lookups, alongside a heap of their
+    keys for O(log n) inserts. Keys are ordered so that the best price is
+    always at the top of the heap. Removed levels are left in the heap until
+    they reach the top, or until they make up most of it, which keeps
+    removals O(1) and reading the best level amortized O(1).
+    """
+
+    __slots__ = ("levels", "heap", "queued", "sign")
+
+    def __init__(self, descending: bool):
+        self.levels: Dict[int, int] = {}
+        self.heap: List[int] = []
+        # The keys in the heap, including those of removed levels
+        self.queued: Set[int] = set()
+        # Bids are best at their highest price, asks at their lowest
+        self.sign = -1 if descending else 1
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def clear(self):
+        self.levels.clear()
+        self.heap.clear()
+        self.queued.clear()
+
+    def update(self, price: int, quantity: int):
+        """Set the quantity at a price level, removing it if zero"""
+        if quantity:
+            if price not in self.levels:
+                key = price * self.sign
+                if key not in self.queued:
+                    heapq.heappush(self.heap, key)
+                    self.queued.add(key)
+            self.levels[price] = quantity
+        elif price in self.levels:
+            del self.levels[price]
+            if len(self.heap) > 2 * len(self.levels) + 64:
+                self._compact()
+
+    def _compact(self):
+        """Drop the keys of removed levels from the heap"""
+        self.heap = [price * self.sign for price in self.levels]
+        heapq.heapify(self.heap)
+        self.queued = set(self.heap)
+
+    def best(self) -> Optional[Tuple[int, int]]:
+        """The best (price, quantity), or None if this side is empty"""
+        heap, levels = self.heap, self.levels
+        while heap:
+            price = heap[0] * self.sign
+            quantity = levels.get(price)
+            if quantity is not None:
+                return price, quantity
+            self.queued.discard(heapq.heappop(heap))
+        return None
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        """The best `n` levels, best first"""
+        if n <= 0:
+            return []
+        # Enough keys to make up for those of removed levels
+        stale = len(self.heap) - len(self.levels)
+        levels = []
+        for key in heapq.nsmallest(n + stale, self.heap):
+            price = key * self.sign
+            if price in self.levels:
+                levels.append((price, self.levels[price]))
+                if len(levels) == n:
+                    break
+        return levels
+
+
+class OrderBook:
+    """The order book of a single market"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.last_update_id: Optional[int] = None
+        self.last_event_time: Optional[int] = None
+        self.synced = False
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.symbol}>"
+
+    @property
+    def best_bid(self) -> Optional[Tuple[int, int]]:
+        return self.bids.best()
+
+    @property
+    def best_ask(self) -> Optional[Tuple[int, int]]:
+        return self.asks.best()
+
+    @property
+    def crossed(self) -> bool:
+        bid, ask = self.bids.best(), self.asks.best()
+        return bool(bid and ask and bid[0] >= ask[0])
+
+    def apply_snapshot(self, depth: dict):
+        """Replace the book with a `HTTPClient.get_depth` response"""
+        self.bids.clear()
+        self.asks.clear()
+        self._apply_levels(self.bids, depth.get("bids", ()))
+        self._apply_levels(self.asks, depth.get("asks", ()))
+        self.last_update_id = depth.get("height", depth.get("lastUpdateId"))
+        self.last_event_time = None
+        self.synced = True
+
+    def apply_diff(self, data: dict) -> bool:
+        """Apply the `data` of a `marketDiff` message.
+
+        Returns False if the update does not follow on from the previous one
+        or leaves the book crossed, in which case the book needs to be
+        resynced from a snapshot.
+        """
+        first, last = data.get("U"), data.get("u")
+        if first is not None and last is not None and self.last_update_id is not None:
+            if last <= self.last_update_id:
+                return True  # Already part of our snapshot
+            if first > self.last_update_id + 1:
+                return False
+            self.last_update_id = last
+        event_time = data.get("E")
+        if event_time is not None:
+            if self.last_event_time is not None and event_time < self.last_event_time:
+                return False
+            self.last_event_time = event_time
+        self._apply_levels(self.bids, data.get("b", ()))
+        self._apply_levels(self.asks, data.get("a", ()))
+        return not self.crossed
+
+    def _apply_levels(self, side: BookSide, levels: Iterable[Sequence[str]]):
+        for price, quantity, *_ in levels:
+            side.update(to_fixed(price), to_fixed(quantity))
+
+    def depth(self, n: int = 20) -> Dict[str, List[Tuple[int, int]]]:
+        """The best `n` levels on each side"""
+        return {"bids": self.bids.top(n), "asks": self.asks.top(n)}
+
+
+class OrderBookManager:
+    """Maintains local order books for a set of markets.
+
+    Books are bootstrapped from `HTTPClient.get_depth` and kept up to date
+    with the `marketDiff` stream. Diffs received while a snapshot is being
+    fetched are buffered and replayed on top of it. A book is resynced
+    whenever an update doesn't follow on from the last one, leaves the book
+    crossed, or the WebSocket reports a `gap` after reconnecting.
+    """
+
+    def __init__(
+        self,
+        client: HTTPClient,
+        websocket: WebSocket,
+        symbols: List[str],
+        limit: int = 1000,
+        on_update: Optional[Callable[[OrderBook], None]] = None,
+        retry_delay: float = 1.0,
+        max_buffer: int = 1000,
+    ):
+        """
+        :param client: The HTTP client used to fetch snapshots
+        :param websocket: The WebSocket to subscribe to `marketDiff` with
+        :param symbols: The markets to maintain books for
+        :param limit: The depth of the snapshots, see `HTTPClient.get_depth`
+        :param on_update: Called with the book after every applied update
+        :param retry_delay: Seconds to wait before retrying a failed snapshot
+        :param max_buffer: The number of diffs to buffer per book while it
+            resyncs, past which they are dropped and the resync starts over
+        """
+        self.client = client
+        self.websocket = websocket
+        self.symbols = symbols
+        self.limit = limit
+        self.on_update = on_update
+        self.retry_delay = retry_delay
+        self.max_buffer = max_buffer
+        self.books: Dict[str, OrderBook] = {s: OrderBook(s) for s in symbols}
+        self._buffers: Dict[str, List[dict]] = {s: [] for s in symbols}
+        self._syncing: Dict[str, asyncio.Future] = {}
+        self.resyncs = 0
+
+    def __getitem__(self, symbol: str) -> OrderBook:
+        return self.books[symbol]
+
+    def start(self) -> None:
+        """Subscribe to `marketDiff` and fetch the initial snapshots.
+
+        This should be called once the WebSocket is open.
+        """
+        self.websocket.on("gap", self._on_gap)
+        self.websocket.subscribe_market_diff(self.symbols, self._on_diff)
+        for symbol in self.symbols:
+            self.resync(symbol)
+
+    def resync(self, symbol: str) -> asyncio.Future:
+        """Schedule a fresh snapshot of a book"""
+        if symbol not in self._syncing:
+            book = self.books[symbol]
+            book.synced = False
+            self._syncing[symbol] = asyncio.ensure_future(self._resync(book))
+        return self._syncing[symbol]
+
+    async def _resync(self, book: OrderBook) -> None:
+        try:
+            depth = await self.client.get_depth(book.symbol, limit=self.limit)
+            book.apply_snapshot(depth)
+            self.resyncs += 1
+            buffer, self._buffers[book.symbol] = self._buffers[book.symbol], []
+            for data in buffer:
+                if not book.apply_diff(data):
+                    log.warning(f"Out of sync replaying {book.symbol} diffs")
+                    book.synced = False
+                    break
+        except Exception:
+            log.exception(f"Unable to fetch {book.symbol} depth snapshot")
+            book.synced = False
+            await asyncio.sleep(self.retry_delay)
+        finally:
+            del self._syncing[book.symbol]
+        if book.synced and self.on_update:
+            self.on_update(book)
+        elif not book.synced:
+            self.resync(book.symbol)
+
+    def _on_diff(self, msg: dict) -> None:
+        data = msg["data"]
+        book = self.books.get(data.get("s"))
+        if not book:
+            return
+        if not book.synced:
+            self._buffer(book, data)
+        elif book.apply_diff(data):
+            if self.on_update:
+                self.on_update(book)
+        else:
+            log.warning(f"Gap in {book.symbol} marketDiff, resyncing")
+            self._buffer(book, data)
+            self.resync(book.symbol)
+
+    def _buffer(self, book: OrderBook, data: dict) -> None:
+        buffer = self._buffers[book.symbol]
+        buffer.append(data)
+        if len(buffer) > self.max_buffer:
+            # A snapshot fetched from here on only needs the diffs after it
+            log.warning(f"Dropping {len(buffer)} buffered {book.symbol} diffs")
+            buffer.clear()
+            self.resync(book.symbol)
+
+    def _on_gap(self, gap: dict) -> None:
+        for symbol in self.symbols:
+            self.resync(symbol)
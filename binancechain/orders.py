@@ -0,0 +1,391 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+A local index of an account's open orders, bootstrapped from `get_open_orders`
+and kept up to date with the `orders` WebSocket stream, so that tracking our
+working orders doesn't mean polling.
+
+Prices and quantities are fixed-point integers with 8 decimals, like in
+`binancechain.orderbook`.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .httpclient import HTTPClient
+from .orderbook import to_fixed
+from .websocket import WebSocket
+
+log = logging.getLogger(__name__)
+
+# The statuses after which an order receives no more updates
+TERMINAL_STATUSES = frozenset(
+    (
+        "FullyFill",
+        "Canceled",
+        "Expired",
+        "IocNoFill",
+        "IocExpire",
+        "FailedBlocking",
+        "FailedMatching",
+    )
+)
+
+
+class Order:
+    """The latest known state of an order"""
+
+    __slots__ = (
+        "id",
+        "symbol",
+        "side",
+        "price",
+        "quantity",
+        "filled",
+        "status",
+        "last_price",
+        "last_quantity",
+        "height",
+    )
+
+    def __init__(
+        self, id: str, symbol: str, side: int, price: int, quantity: int
+    ) -> None:
+        self.id = id
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        # The cumulative quantity filled
+        self.filled = 0
+        self.status = "Ack"
+        self.last_price = 0
+        self.last_quantity = 0
+        # The block height of the latest update
+        self.height: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.id} {self.symbol} {self.status}>"
+
+    @property
+    def remaining(self) -> int:
+        return self.quantity - self.filled
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    @classmethod
+    def from_rest(cls, order: dict) -> "Order":
+        """Create an order from a `get_open_orders` or `get_order` entry"""
+        self = cls(
+            order["orderId"],
+            order["symbol"],
+            order["side"],
+            to_fixed(order["price"]),
+            to_fixed(order["quantity"]),
+        )
+        self.filled = to_fixed(order.get("cumulateQuantity") or "0")
+        self.status = order.get("status", self.status)
+        self.last_price = to_fixed(order.get("lastExecutedPrice") or "0")
+        self.last_quantity = to_fixed(order.get("lastExecutedQuantity") or "0")
+        return self
+
+    @classmethod
+    def from_report(cls, report: dict) -> "Order":
+        """Create an order from an `orders` stream execution report"""
+        return cls(
+            report["i"],
+            report["s"],
+            report["S"],
+            to_fixed(report["p"]),
+            to_fixed(report["q"]),
+        )
+
+    def apply_report(self, report: dict) -> bool:
+        """Apply an execution report, returning False if it is older than our
+        state"""
+        filled = to_fixed(report["z"])
+        if self.terminal or filled < self.filled:
+            return False
+        self.filled = filled
+        self.status = report["X"]
+        self.last_price = to_fixed(report["L"])
+        self.last_quantity = to_fixed(report["l"])
+        self.height = report.get("E", self.height)
+        return True
+
+
+class OrderIndex:
+    """The open orders of a single address, indexed by id, symbol and side.
+
+        orders = OrderIndex(client, dex, address)
+        dex.start(on_open=orders.start)
+
+        bids = orders.open_orders("NNB-0AD_BNB", side=Side.BUY.value)
+        order = await orders.wait(order_id)  # until it is filled or cancelled
+
+    Orders leave the index once they reach a terminal status, and the last
+    `max_closed` of them are kept so that late waiters still find them.
+
+    Like `AccountState`, updates received while the open orders are being
+    fetched are replayed on top of the snapshot. Open orders missing from a
+    snapshot, which closed while we weren't listening, are looked up with
+    `get_order` to learn how.
+    """
+
+    def __init__(
+        self,
+        client: HTTPClient,
+        websocket: WebSocket,
+        address: str,
+        reconcile_interval: Optional[float] = 300.0,
+        on_update: Optional[Callable[[Order], None]] = None,
+        retry_delay: float = 1.0,
+        max_closed: int = 1000,
+        page_size: int = 1000,
+    ):
+        """
+        :param client: The HTTP client used to fetch the open orders
+        :param websocket: The WebSocket to subscribe to `orders` with
+        :param address: The address of the account
+        :param reconcile_interval: Seconds between refetches of the open
+            orders, or None to only fetch them on start and after gaps
+        :param on_update: Called with every order that changed
+        :param retry_delay: Seconds to wait before retrying a failed fetch
+        :param max_closed: The number of terminal orders to remember
+        :param page_size: The number of open orders to fetch per request
+        """
+        self.client = client
+        self.websocket = websocket
+        self.address = address
+        self.reconcile_interval = reconcile_interval
+        self.on_update = on_update
+        self.retry_delay = retry_delay
+        self.max_closed = max_closed
+        self.page_size = page_size
+        self.orders: Dict[str, Order] = {}
+        self.closed: "OrderedDict[str, Order]" = OrderedDict()
+        self._index: Dict[Tuple[str, int], Dict[str, Order]] = {}
+        self._waiters: Dict[str, List[Tuple[Set[str], asyncio.Future]]] = {}
+        self.synced = False
+        self.resyncs = 0
+        self._buffer: Optional[List[dict]] = None
+        self._syncing: Optional[asyncio.Future] = None
+        self._reconciler: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self.orders
+
+    def get(self, order_id: str) -> Optional[Order]:
+        """An open or recently closed order"""
+        return self.orders.get(order_id) or self.closed.get(order_id)
+
+    def open_orders(
+        self, symbol: Optional[str] = None, side: Optional[int] = None
+    ) -> List[Order]:
+        """The open orders, optionally of a single symbol and side"""
+        if symbol is not None and side is not None:
+            return list(self._index.get((symbol, side), {}).values())
+        return [
+            order
+            for (order_symbol, order_side), orders in self._index.items()
+            if symbol in (None, order_symbol) and side in (None, order_side)
+            for order in orders.values()
+        ]
+
+    def start(self) -> asyncio.Future:
+        """Subscribe to `orders` and fetch the open orders.
+
+        This should be called once the WebSocket is open. The returned future
+        completes once the open orders have been fetched.
+        """
+        self.websocket.on("gap", self._on_gap)
+        self.websocket.subscribe_user_orders(self._on_orders, address=self.address)
+        if self.reconcile_interval and self._reconciler is None:
+            self._reconciler = asyncio.ensure_future(self._reconcile())
+        return self.resync()
+
+    def resync(self) -> asyncio.Future:
+        """Schedule a fresh fetch of the open orders"""
+        if self._syncing is None:
+            self._syncing = asyncio.ensure_future(self._resync())
+        return self._syncing
+
+    async def _resync(self) -> None:
+        self._buffer = []
+        try:
+            orders = await self._fetch_open_orders()
+            buffer, self._buffer = self._buffer, None
+            missing = self.apply_snapshot(orders, buffer)
+            self.resyncs += 1
+            for order_id in missing:
+                order = await self.client.get_order(order_id)
+                self.apply_order(Order.from_rest(order))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception(f"Unable to fetch the open orders of {self.address}")
+            self._buffer = None
+            await asyncio.sleep(self.retry_delay)
+        finally:
+            self._syncing = None
+        if not self.synced:
+            self.resync()
+
+    async def _fetch_open_orders(self) -> List[dict]:
+        orders: List[dict] = []
+        while True:
+            page = await self.client.get_open_orders(
+                self.address, limit=self.page_size, offset=len(orders), total=1
+            )
+            orders.extend(page.get("order", ()))
+            if len(page.get("order", ())) < self.page_size:
+                return orders
+            if len(orders) >= page.get("total", -1) >= 0:
+                return orders
+
+    async def _reconcile(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            await self.resync()
+
+    def apply_snapshot(
+        self, orders: Iterable[dict], updates: Sequence[List[dict]] = ()
+    ) -> List[str]:
+        """Replace the open orders with `get_open_orders` entries, then replay
+        the `orders` stream `updates` received since they were requested.
+
+        Returns the ids of the orders we had open that are missing from the
+        snapshot without having been closed by an update.
+        """
+        snapshot = {}
+        for entry in orders:
+            order = Order.from_rest(entry)
+            if order.id not in self.closed:
+                snapshot[order.id] = order
+        updated = {report["i"] for reports in updates for report in reports}
+        missing = [
+            order_id
+            for order_id in self.orders
+            if order_id not in snapshot and order_id not in updated
+        ]
+        previous = self.orders
+        self.orders = {}
+        self._index.clear()
+        for order in snapshot.values():
+            self._add(order)
+        # Keep the orders that vanished until we know how they closed
+        for order_id in missing:
+            self._add(previous[order_id])
+        self.synced = True
+        for reports in updates:
+            self.apply_update(reports, notify=False)
+        if self.on_update:
+            for order in snapshot.values():
+                old = previous.get(order.id)
+                if old is None or (old.status, old.filled) != (
+                    order.status,
+                    order.filled,
+                ):
+                    self.on_update(order)
+        return missing
+
+    def apply_update(self, reports: List[dict], notify: bool = True) -> None:
+        """Apply the `data` of an `orders` stream message"""
+        for report in reports:
+            order = self.orders.get(report["i"])
+            if order is None:
+                if report["i"] in self.closed:
+                    continue
+                order = Order.from_report(report)
+                self._add(order)
+            if order.apply_report(report):
+                self._updated(order, notify)
+
+    def apply_order(self, order: Order) -> None:
+        """Replace an open order with its latest state"""
+        current = self.orders.get(order.id)
+        if current is not None:
+            self._remove(current)
+        self._add(order)
+        self._updated(order)
+
+    def _add(self, order: Order) -> None:
+        self.orders[order.id] = order
+        self._index.setdefault((order.symbol, order.side), {})[order.id] = order
+
+    def _remove(self, order: Order) -> None:
+        del self.orders[order.id]
+        key = (order.symbol, order.side)
+        orders = self._index[key]
+        del orders[order.id]
+        if not orders:
+            del self._index[key]
+
+    def _updated(self, order: Order, notify: bool = True) -> None:
+        if order.terminal:
+            self._remove(order)
+            self.closed[order.id] = order
+            while len(self.closed) > self.max_closed:
+                self.closed.popitem(last=False)
+        waiters = self._waiters.get(order.id)
+        if waiters:
+            for statuses, future in list(waiters):
+                if future.done():
+                    # Cancelled, like by a timeout
+                    waiters.remove((statuses, future))
+                elif order.status in statuses or order.terminal:
+                    waiters.remove((statuses, future))
+                    future.set_result(order)
+            if not waiters:
+                del self._waiters[order.id]
+        if notify and self.on_update:
+            self.on_update(order)
+
+    def wait(
+        self, order_id: str, statuses: Iterable[str] = TERMINAL_STATUSES
+    ) -> asyncio.Future:
+        """A future of the order once it reaches one of `statuses`, or any
+        terminal status.
+
+            order = await asyncio.wait_for(orders.wait(order_id), timeout=10)
+            if order.status == "FullyFill":
+                ...
+        """
+        statuses = set(statuses)
+        future = asyncio.get_event_loop().create_future()
+        order = self.get(order_id)
+        if order is not None and (order.status in statuses or order.terminal):
+            future.set_result(order)
+        else:
+            self._waiters.setdefault(order_id, []).append((statuses, future))
+        return future
+
+    def _on_orders(self, msg: dict) -> None:
+        reports = msg["data"]
+        if self._buffer is not None:
+            self._buffer.append(reports)
+        self.apply_update(reports)
+
+    def _on_gap(self, gap: dict) -> None:
+        self.resync()
+
+    def close(self) -> None:
+        """Stop reconciling, cancel the waiters and unsubscribe from `orders`"""
+        for future in (self._reconciler, self._syncing):
+            if future is not None:
+                future.cancel()
+        self._reconciler = self._syncing = None
+        self.websocket.remove_listener("gap", self._on_gap)
+        for waiters in self._waiters.values():
+            for _, future in waiters:
+                future.cancel()
+        self._waiters.clear()
+        self.websocket.unsubscribe(
+            "orders", callback=self._on_orders, address=self.address
+        )
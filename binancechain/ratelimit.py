@@ -2,45 +2,200 @@
 # SPDX-License-Identifier: MIT
 
 import asyncio
+import math
+import time
+from collections import deque
 
-from typing import Dict, Tuple, Optional
+from typing import Deque, Dict, NamedTuple, Optional
+
+from .metrics import Histogram, render_prometheus
+
+# The metrics of a bucket that only ever increase
+COUNTERS = ("tokens_granted", "tokens_wasted", "backoffs")
+
+
+class Backoff(NamedTuple):
+    """A multiplicative decrease of a namespace's rate"""
+
+    time: float
+    namespace: str
+    old_rate: float
+    new_rate: float
+
+
+class Bucket:
+    """The token bucket and AIMD state of a single namespace"""
+
+    def __init__(self, num: int, capacity: int):
+        self.queue: asyncio.Queue = asyncio.Queue(capacity)
+        self.num = num
+        self.capacity = capacity
+        self.rate = float(num)
+        self.credit = 0.0
+        self.last_backoff = 0.0
+        self.granted = 0
+        self.waiters = 0
+        self.wasted = 0
+        self.backoffs = 0
+        self.wait_time = Histogram()
+
+    def metrics(self) -> dict:
+        return {
+            "rate": self.rate,
+            "tokens_available": self.queue.qsize(),
+            "tokens_granted": self.granted,
+            "tokens_wasted": self.wasted,
+            "backoffs": self.backoffs,
+            "waiters": self.waiters,
+            "wait_seconds": self.wait_time,
+        }
 
 
 class RateLimiter:
-    """A rate-limiter that manages a token bucket for each namespace"""
+    """A rate-limiter that manages a token bucket for each namespace
 
-    def __init__(self, period: int = 1):
+    In adaptive mode each bucket starts at its nominal rate and follows an
+    AIMD (additive-increase, multiplicative-decrease) controller driven by
+    `feedback`: every rate-limited response scales the rate down by
+    `decrease`, while successful responses probe upwards by roughly
+    `increase` requests per second each second. The rate is kept between
+    `min_scale` and `max_scale` times the nominal rate.
+    """
+
+    def __init__(
+        self,
+        period: int = 1,
+        adaptive: bool = False,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        min_scale: float = 0.1,
+        max_scale: float = 1.0,
+    ):
         """
         :param period: How often this rate limiter will wake up to fill
         the token buckets. Defaults to once a second.
+        :param adaptive: Adjust each bucket's rate from server feedback
+        :param increase: Requests per second added per second of success
+        :param decrease: Factor applied to the rate when rate-limited
+        :param min_scale: Lower bound of the rate, relative to nominal
+        :param max_scale: Upper bound of the rate, relative to nominal
         """
-        self.buckets: Dict[str, Tuple[asyncio.Queue, int]] = {}
+        self.buckets: Dict[str, Bucket] = {}
         self.period = period
         self.task: Optional[asyncio.Future] = None
+        self.adaptive = adaptive
+        self.increase = increase
+        self.decrease = decrease
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.backoffs: Deque[Backoff] = deque(maxlen=100)
 
     def close(self):
         if self.task:
             self.task.cancel()
 
+    def rate(self, namespace: str) -> Optional[float]:
+        """The current effective requests per second for a `namespace`"""
+        bucket = self.buckets.get(namespace)
+        return bucket.rate if bucket else None
+
+    @property
+    def rates(self) -> Dict[str, float]:
+        """The current effective requests per second of every namespace"""
+        return {namespace: bucket.rate for namespace, bucket in self.buckets.items()}
+
+    def metrics(self) -> Dict[str, dict]:
+        """Per-namespace counters and wait-time histograms.
+
+        `tokens_wasted` counts refill tokens that were discarded because the
+        bucket was already full, i.e. capacity that went unused.
+        """
+        return {
+            namespace: bucket.metrics() for namespace, bucket in self.buckets.items()
+        }
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Like `metrics`, with histograms rendered as plain dicts"""
+        return {
+            namespace: {
+                name: value.snapshot() if isinstance(value, Histogram) else value
+                for name, value in metrics.items()
+            }
+            for namespace, metrics in self.metrics().items()
+        }
+
+    def export(self) -> str:
+        """Export our metrics in the Prometheus text format"""
+        return render_prometheus(
+            "binancechain_ratelimit", "namespace", self.metrics(), COUNTERS
+        )
+
+    def feedback(self, namespace: str, limited: bool):
+        """Report the outcome of a request made in `namespace`.
+
+        This is a no-op unless the rate limiter is adaptive.
+        """
+        bucket = self.buckets.get(namespace)
+        if not self.adaptive or not bucket:
+            return
+        now = time.monotonic()
+        if limited:
+            # Requests already in flight at the old rate will likely be
+            # limited too, so only back off once per period.
+            if now - bucket.last_backoff < self.period:
+                return
+            old_rate = bucket.rate
+            bucket.rate = max(bucket.num * self.min_scale, old_rate * self.decrease)
+            bucket.last_backoff = now
+            bucket.backoffs += 1
+            # Throw away the tokens that were granted at the old rate
+            while not bucket.queue.empty():
+                bucket.queue.get_nowait()
+            bucket.credit = 0.0
+            self.backoffs.append(Backoff(time.time(), namespace, old_rate, bucket.rate))
+        else:
+            bucket.rate = min(
+                bucket.num * self.max_scale,
+                bucket.rate + self.increase * self.period / bucket.rate,
+            )
+
+    def _refill(self, bucket: Bucket):
+        bucket.credit += bucket.rate * self.period
+        tokens = int(bucket.credit)
+        bucket.credit -= tokens
+        added = min(tokens, bucket.capacity - bucket.queue.qsize())
+        for i in range(added):
+            bucket.queue.put_nowait(1)
+        bucket.wasted += tokens - added
+
     async def token_manager(self):
         """Fills each of the token buckets at `self.period` intervals."""
         while True:
             await asyncio.sleep(self.period)
-            for queue, num in self.buckets.values():
-                for i in range(num - queue.qsize()):
-                    queue.put_nowait(1)
+            for bucket in self.buckets.values():
+                self._refill(bucket)
 
     async def limit(self, namespace: str, num: int):
         """Blocks for a given `namespace`, rate-limiting appropriately"""
         if namespace not in self.buckets:
-            queue: asyncio.Queue = asyncio.Queue(num)
-            self.buckets[namespace] = (queue, num)
+            capacity = num
+            if self.adaptive:
+                capacity = max(num, math.ceil(num * self.max_scale * self.period))
+            bucket = Bucket(num, capacity)
+            self.buckets[namespace] = bucket
             for _ in range(num):
-                queue.put_nowait(1)
+                bucket.queue.put_nowait(1)
             if not self.task:
                 self.task = asyncio.ensure_future(self.token_manager())
                 # Let the manager begin it's sleep cycle
                 await asyncio.sleep(0.001)
         else:
-            queue = self.buckets[namespace][0]
-        await queue.get()
+            bucket = self.buckets[namespace]
+        start = time.monotonic()
+        bucket.waiters += 1
+        try:
+            await bucket.queue.get()
+        finally:
+            bucket.waiters -= 1
+        bucket.wait_time.observe(time.monotonic() - start)
+        bucket.granted += 1
@@ -0,0 +1,235 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+A compact, append-only recorder of market data.
+
+Records are buffered into chunks, which are compressed with zlib and appended
+to segment files. Each segment has a sidecar index of the time range and
+offset of every chunk, so readers can seek by time without decompressing
+the whole segment. Segments are rotated by size or by age.
+
+Segment layout::
+
+    MAGIC
+    chunk header (CHUNK: first ns, last ns, record count, compressed size)
+    zlib(records), where each record is RECORD + kind + payload
+    ...
+"""
+import glob
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import IO, Iterator, List, NamedTuple, Optional
+
+import orjson
+
+from .httpclient import HTTPClient
+from .websocket import WebSocket
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"BCSEG\x01\n"
+CHUNK = struct.Struct("<4sqqII")
+CHUNK_TAG = b"CHNK"
+RECORD = struct.Struct("<qBI")
+INDEX = struct.Struct("<qqIQ")
+
+
+class Record(NamedTuple):
+    time: int  # nanoseconds since the epoch
+    kind: str
+    payload: bytes
+
+
+class ChunkIndex(NamedTuple):
+    first: int
+    last: int
+    count: int
+    offset: int
+
+
+class Recorder:
+    """Records WebSocket frames and HTTP snapshots into segment files.
+
+        recorder = Recorder("data/")
+        recorder.attach(ws)
+        await recorder.record_depth(client, "NNB-0AD_BNB")
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "market",
+        chunk_size: int = 256 * 1024,
+        chunk_seconds: float = 5.0,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_seconds: float = 3600.0,
+        level: int = 1,
+    ) -> None:
+        """
+        :param directory: Where to write the segments
+        :param prefix: The file name prefix of the segments
+        :param chunk_size: Compress and write a chunk after this many bytes
+        :param chunk_seconds: ... or once its first record is this old
+        :param max_bytes: Start a new segment after this many bytes
+        :param max_seconds: ... or once the segment is this old
+        :param level: The zlib compression level
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.chunk_seconds = chunk_seconds
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.level = level
+        self.records = 0
+        self.bytes_written = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._first = 0
+        self._last = 0
+        self._chunk_start = 0.0
+        self._segment: Optional[IO[bytes]] = None
+        self._index: Optional[IO[bytes]] = None
+        self._segment_start = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def attach(self, websocket: WebSocket) -> None:
+        """Record every frame received by a WebSocket"""
+        websocket.add_frame_listener(self.record_frame)
+
+    def record_frame(self, raw: str, received: Optional[float] = None) -> None:
+        """Record a raw WebSocket frame"""
+        self.record("ws", raw.encode(), received)
+
+    async def record_depth(
+        self, client: HTTPClient, symbol: str, limit: int = 100
+    ) -> dict:
+        """Fetch and record a `get_depth` snapshot"""
+        depth = await client.get_depth(symbol, limit=limit)
+        self.record(f"depth:{symbol}", orjson.dumps(depth))
+        return depth
+
+    def record(self, kind: str, payload: bytes, received: Optional[float] = None):
+        """Append a record of any `kind`, received at `received` seconds"""
+        now = time.time()
+        ns = int((received or now) * 1e9)
+        encoded = kind.encode()
+        if not self._buffer:
+            self._first = ns
+            self._chunk_start = now
+        self._last = ns
+        self._buffer.append(RECORD.pack(ns, len(encoded), len(payload)))
+        self._buffer.append(encoded)
+        self._buffer.append(payload)
+        self._buffered += RECORD.size + len(encoded) + len(payload)
+        self.records += 1
+        if (
+            self._buffered >= self.chunk_size
+            or now - self._chunk_start >= self.chunk_seconds
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Compress and write out the records buffered so far"""
+        if not self._buffer:
+            return
+        now = time.time()
+        if self._segment and (
+            self._segment.tell() >= self.max_bytes
+            or now - self._segment_start >= self.max_seconds
+        ):
+            self._rotate()
+        if not self._segment:
+            self._open(now)
+        assert self._segment and self._index
+        data = zlib.compress(b"".join(self._buffer), self.level)
+        count = len(self._buffer) // 3
+        offset = self._segment.tell()
+        self._segment.write(
+            CHUNK.pack(CHUNK_TAG, self._first, self._last, count, len(data))
+        )
+        self._segment.write(data)
+        self._segment.flush()
+        self._index.write(INDEX.pack(self._first, self._last, count, offset))
+        self._index.flush()
+        self.bytes_written += CHUNK.size + len(data)
+        self._buffer = []
+        self._buffered = 0
+
+    def _open(self, now: float) -> None:
+        # Segments are named by their start time, in milliseconds
+        ms = int(now * 1e3)
+        while True:
+            path = os.path.join(self.directory, f"{self.prefix}-{ms:013d}.seg")
+            if not os.path.exists(path):
+                break
+            ms += 1
+        self._segment = open(path, "wb")
+        self._index = open(path + ".idx", "wb")
+        self._segment.write(MAGIC)
+        self._segment_start = now
+
+    def _rotate(self) -> None:
+        if self._segment and self._index:
+            self._segment.close()
+            self._index.close()
+        self._segment = self._index = None
+
+    def close(self) -> None:
+        """Flush any buffered records and close the current segment"""
+        self.flush()
+        self._rotate()
+
+
+def segments(directory: str, prefix: str = "market") -> List[str]:
+    """The segment files of a recording, oldest first"""
+    return sorted(glob.glob(os.path.join(directory, f"{prefix}-*.seg")))
+
+
+def read_index(path: str) -> List[ChunkIndex]:
+    """The chunk index of a segment, rebuilt from the segment if missing"""
+    try:
+        with open(path + ".idx", "rb") as f:
+            return [ChunkIndex(*entry) for entry in INDEX.iter_unpack(f.read())]
+    except FileNotFoundError:
+        pass
+    index = []
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a segment")
+        while True:
+            offset = f.tell()
+            header = f.read(CHUNK.size)
+            if len(header) < CHUNK.size:
+                break
+            tag, first, last, count, size = CHUNK.unpack(header)
+            if tag != CHUNK_TAG:
+                raise ValueError(f"Corrupt chunk at {path}:{offset}")
+            index.append(ChunkIndex(first, last, count, offset))
+            f.seek(size, os.SEEK_CUR)
+    return index
+
+
+def decode_chunk(data: bytes) -> Iterator[Record]:
+    """The records of a decompressed chunk"""
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        ns, kind_size, size = RECORD.unpack_from(view, offset)
+        offset += RECORD.size
+        kind = bytes(view[offset : offset + kind_size]).decode()
+        offset += kind_size
+        yield Record(ns, kind, bytes(view[offset : offset + size]))
+        offset += size
+
+
+def read_segment(path: str) -> Iterator[Record]:
+    """All of the records of a segment, in the order they were written"""
+    with open(path, "rb") as f:
+        for entry in read_index(path):
+            f.seek(entry.offset)
+            tag, first, last, count, size = CHUNK.unpack(f.read(CHUNK.size))
+            yield from decode_chunk(zlib.decompress(f.read(size)))
@@ -0,0 +1,172 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Replay market data captured by `binancechain.recorder.Recorder` through the
+same handlers, streams and subscriptions as a live `WebSocket`.
+"""
+import asyncio
+import bisect
+import logging
+import mmap
+import time
+import zlib
+from typing import Callable, Dict, Iterator, Optional
+
+import orjson
+
+from .recorder import CHUNK, Record, decode_chunk, read_index, segments
+from .websocket import WebSocket
+
+log = logging.getLogger(__name__)
+
+# The number of frames to dispatch before letting other tasks run, when
+# replaying as fast as possible
+YIELD_EVERY = 100
+
+
+def read_records(
+    path: str, start: Optional[int] = None, end: Optional[int] = None
+) -> Iterator[Record]:
+    """The records of a segment between `start` and `end` nanoseconds.
+
+    The segment is memory-mapped, and its time index is used to skip
+    straight to the first chunk that may contain `start`.
+    """
+    index = read_index(path)
+    first = 0
+    if start is not None:
+        first = bisect.bisect_left([entry.last for entry in index], start)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        view = memoryview(m)
+        try:
+            for entry in index[first:]:
+                if end is not None and entry.first > end:
+                    return
+                size = CHUNK.unpack_from(view, entry.offset)[4]
+                offset = entry.offset + CHUNK.size
+                data = zlib.decompress(view[offset : offset + size])
+                for record in decode_chunk(data):
+                    if start is not None and record.time < start:
+                        continue
+                    if end is not None and record.time > end:
+                        return
+                    yield record
+        finally:
+            view.release()
+
+
+def replay_records(
+    directory: str,
+    prefix: str = "market",
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Iterator[Record]:
+    """The records of a recording between `start` and `end` seconds"""
+    start_ns = int(start * 1e9) if start is not None else None
+    end_ns = int(end * 1e9) if end is not None else None
+    for path in segments(directory, prefix):
+        index = read_index(path)
+        if not index:
+            continue
+        if start_ns is not None and index[-1].last < start_ns:
+            continue
+        if end_ns is not None and index[0].first > end_ns:
+            break
+        yield from read_records(path, start_ns, end_ns)
+
+
+class ReplayWebSocket(WebSocket):
+    """A drop-in replacement for `WebSocket` that replays a recording.
+
+    Handlers registered with `on` or `subscribe`, `stream` and `conflate`
+    iterators, and frame listeners all see the recorded frames exactly as
+    they would see live ones, including selective and off-loop decoding.
+    Subscribing only filters the recording, and nothing is ever sent.
+
+        ws = ReplayWebSocket("data/", speed=60)
+        ws.subscribe_trades(symbols, callback=on_trade)
+        ws.start()
+
+    Depth snapshots recorded with `Recorder.record_depth` are kept in
+    `snapshots`, as of the replay time in `time`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "market",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        speed: Optional[float] = None,
+        address: str = None,
+        loop: asyncio.AbstractEventLoop = None,
+        **kwargs,
+    ) -> None:
+        """
+        :param directory: The directory of the recording
+        :param prefix: The file name prefix of the recording's segments
+        :param start: Replay from this time, in seconds since the epoch
+        :param end: Replay until this time, in seconds since the epoch
+        :param speed: Replay at this multiple of the recorded pace, or as fast
+            as possible if None
+        :param address: The address that user streams were recorded for
+        :param kwargs: Other `WebSocket` options, like `decoder`
+        """
+        super().__init__(address=address, keepalive=False, loop=loop, **kwargs)
+        self.directory = directory
+        self.prefix = prefix
+        self.start_time = start
+        self.end_time = end
+        self.speed = speed
+        self.time: Optional[float] = None
+        self.replayed = 0
+        self.snapshots: Dict[str, dict] = {}
+
+    async def start_async(
+        self,
+        on_open: Optional[Callable[[], None]] = None,
+        on_error: Optional[Callable[[dict], None]] = None,
+    ) -> None:
+        """Replay the recording, returning once it ends or `close` is called."""
+        self._open = True
+        self._events.emit("open")
+        if on_open:
+            on_open()
+
+        records = replay_records(
+            self.directory, self.prefix, self.start_time, self.end_time
+        )
+        origin: Optional[int] = None
+        started = time.monotonic()
+        for record in records:
+            if self._closing:
+                break
+            if self.speed:
+                if origin is None:
+                    origin = record.time
+                due = started + (record.time - origin) / 1e9 / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif self.replayed % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            self.time = record.time / 1e9
+            if record.kind == "ws":
+                self.replayed += 1
+                await self._receive(record.payload.decode(), self.time, on_error)
+            elif record.kind.startswith("depth:"):
+                self.snapshots[record.kind[6:]] = orjson.loads(record.payload)
+
+        await self._stop_decoders()
+        for streams in list(self._streams.values()):
+            for stream in list(streams):
+                stream._finish()
+        if self._session:
+            await self._session.close()
+
+    async def send(self, data: dict) -> None:
+        log.debug(f"Not sending {data} while replaying")
+
+    def close(self) -> None:
+        """Stop replaying"""
+        self._closing = True
@@ -0,0 +1,147 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+A persistent cache of the NodeRPC responses that never change, like the blocks,
+block results, commits and validator sets of finalized heights.
+
+Responses are compressed with zlib and appended to a single file, behind an
+in-memory LRU of the most recently used ones, kept encoded. Every hit decodes
+a fresh copy, so callers are free to modify the responses they get. The
+offset of every response is indexed in memory when the file is opened.
+
+File layout::
+
+    MAGIC
+    record header (RECORD: key size, compressed size)
+    key, like `block:1000` or `block_by_hash:6D5B...`
+    zlib(response)
+    ...
+"""
+import logging
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import orjson
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"BCRPC\x01\n"
+RECORD = struct.Struct("<HI")
+
+# The methods that take a hash rather than a height
+HASH_METHODS = frozenset(("block_by_hash",))
+
+Key = Union[int, str]
+
+
+def cache_key(method: str, key: Key) -> str:
+    """The key of the response of `method` at a height or for a hash"""
+    if method in HASH_METHODS:
+        return f"{method}:{str(key).upper()}"
+    return f"{method}:{int(key)}"
+
+
+class RPCCache:
+    """Stores NodeRPC responses by method and height or hash.
+
+        cache = RPCCache("blocks.cache")
+        noderpc = NodeRPC(url, cache=cache)
+
+    Only responses passed to `put` are stored, and NodeRPC only does so for
+    heights that are final. A record cut short by a crash while it was being
+    written is dropped when the file is next opened.
+    """
+
+    def __init__(self, path: str, memory: int = 1024, level: int = 6) -> None:
+        """
+        :param path: The file to store the responses in
+        :param memory: The number of responses to keep in memory
+        :param level: The zlib compression level
+        """
+        self.path = path
+        self.memory = memory
+        self.level = level
+        self.hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, bytes]" = OrderedDict()
+        # The offset and compressed size of every response in the file
+        self._index: Dict[str, Tuple[int, int]] = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a+b")
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def _load(self) -> None:
+        self._file.seek(0)
+        if self._file.read(len(MAGIC)) != MAGIC:
+            if self._file.tell():
+                raise ValueError(f"{self.path} is not an RPC cache")
+            self._file.write(MAGIC)
+            self._file.flush()
+            return
+        offset = len(MAGIC)
+        end = os.fstat(self._file.fileno()).st_size
+        while offset + RECORD.size <= end:
+            self._file.seek(offset)
+            key_size, size = RECORD.unpack(self._file.read(RECORD.size))
+            start = offset + RECORD.size + key_size
+            if start + size > end:
+                break
+            key = self._file.read(key_size).decode()
+            self._index[key] = (start, size)
+            offset = start + size
+        if offset < end:
+            log.warning(f"Dropping a truncated record at the end of {self.path}")
+            self._file.truncate(offset)
+
+    def get(self, method: str, key: Key) -> Optional[dict]:
+        """The response of `method` at a height or for a hash, if cached"""
+        name = cache_key(method, key)
+        encoded = self._lru.get(name)
+        if encoded is not None:
+            self._lru.move_to_end(name)
+        else:
+            location = self._index.get(name)
+            if location is None:
+                self.misses += 1
+                return None
+            offset, size = location
+            self._file.seek(offset)
+            encoded = zlib.decompress(self._file.read(size))
+            self._remember(name, encoded)
+        self.hits += 1
+        return orjson.loads(encoded)
+
+    def put(self, method: str, key: Key, response: dict) -> None:
+        """Store the response of `method` at a height or for a hash"""
+        name = cache_key(method, key)
+        if name in self._index:
+            return
+        key_bytes = name.encode()
+        encoded = orjson.dumps(response)
+        data = zlib.compress(encoded, self.level)
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(RECORD.pack(len(key_bytes), len(data)) + key_bytes + data)
+        self._file.flush()
+        self._index[name] = (offset + RECORD.size + len(key_bytes), len(data))
+        self._remember(name, encoded)
+
+    def _remember(self, name: str, encoded: bytes) -> None:
+        self._lru[name] = encoded
+        self._lru.move_to_end(name)
+        while len(self._lru) > self.memory:
+            self._lru.popitem(last=False)
+
+    def close(self) -> None:
+        self._file.close()
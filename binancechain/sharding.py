@@ -0,0 +1,291 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Spread WebSocket subscriptions for large sets of symbols across several
+connections, while dispatching all of their messages through one interface.
+"""
+import asyncio
+import logging
+import time
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from pyee import AsyncIOEventEmitter
+
+from .dispatch import DispatchTable
+from .metrics import Rate
+from .websocket import LIFECYCLE_EVENTS, WebSocket
+
+log = logging.getLogger(__name__)
+
+
+class ShardStats:
+    """Health and throughput of a single shard"""
+
+    __slots__ = ("connected", "messages", "last_message", "reconnects", "rate")
+
+    def __init__(self):
+        self.connected = False
+        self.messages = 0
+        self.last_message: Optional[float] = None
+        self.reconnects = 0
+        self.rate = Rate()
+
+    def record(self):
+        now = time.monotonic()
+        self.messages += 1
+        self.last_message = now
+        self.rate.record(now)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            "connected": self.connected,
+            "messages": self.messages,
+            "rate": self.rate.value,
+            "idle": now - self.last_message if self.last_message else None,
+            "reconnects": self.reconnects,
+        }
+
+
+class ShardedWebSocket:
+    """Spreads symbols across `shards` WebSocket connections.
+
+    Each symbol is assigned to a shard by a stable hash, so a symbol always
+    lives on the same connection, and streams that aren't symbol-specific
+    (such as `$all` tickers) are hashed by their stream name. Messages from
+    every shard are re-emitted on a single event emitter, so handlers can be
+    registered with `on` or `subscribe` just like with `WebSocket`.
+    """
+
+    def __init__(
+        self,
+        shards: int = 4,
+        testnet: bool = False,
+        keepalive: bool = True,
+        loop: asyncio.AbstractEventLoop = None,
+        url: str = None,
+        reconnect: bool = True,
+    ) -> None:
+        """
+        :param shards: The number of WebSocket connections to use
+        :param testnet: Use testnet instead of mainnet
+        :param keepalive: Send a `keepAlive` message every 30 minutes
+        :param loop: The event loop to use
+        :param url: An optional WebSocket URL to connect to
+        :param reconnect: Automatically reconnect each shard
+        """
+        self._loop = loop or asyncio.get_event_loop()
+        self.shards = [
+            WebSocket(
+                testnet=testnet,
+                keepalive=keepalive,
+                loop=self._loop,
+                url=url,
+                reconnect=reconnect,
+            )
+            for _ in range(shards)
+        ]
+        self.stats = [ShardStats() for _ in range(shards)]
+        self._events = AsyncIOEventEmitter(loop=self._loop)
+        self._handlers = DispatchTable(on_error=self._on_handler_error)
+        self._pending: Dict[int, List[Tuple[str, List[str]]]] = defaultdict(list)
+        self._forwarding: Set[Tuple[int, str]] = set()
+        for index, shard in enumerate(self.shards):
+            shard.on("open", self._on_open(index))
+            shard.on("disconnect", self._on_disconnect(index))
+            shard.on("reconnect", self._on_reconnect(index))
+            shard.on("gap", self._on_gap(index))
+            shard.on("error", self._on_error(index))
+
+    def shard_for(self, key: str) -> int:
+        """The index of the shard that `key` (a symbol) is assigned to"""
+        return zlib.crc32(key.encode()) % len(self.shards)
+
+    def health(self) -> List[dict]:
+        """The health and message rate of each shard"""
+        return [stats.snapshot() for stats in self.stats]
+
+    def on(self, event: str, func: Optional[Callable] = None):
+        """Register a handler for events or messages from all shards.
+
+        This can be used as a decorator or as a normal method.
+        """
+        if event in LIFECYCLE_EVENTS:
+            if func:
+                self._events.on(event, func)
+                return None
+            return self._events.on(event)
+
+        def register(func: Callable) -> Callable:
+            self._handlers.add(event, func)
+            return func
+
+        if func:
+            register(func)
+            return None
+        return register
+
+    def subscribe(
+        self,
+        stream: str,
+        symbols: List[str],
+        callback: Optional[Callable[[dict], None]] = None,
+    ) -> None:
+        """Subscribe to a stream, spreading `symbols` across our shards."""
+        if callback:
+            self._handlers.add(stream, callback, symbols)
+        groups: Dict[int, List[str]] = defaultdict(list)
+        for symbol in symbols:
+            key = stream if symbol == "$all" else symbol
+            groups[self.shard_for(key)].append(symbol)
+        for index, group in groups.items():
+            if self.stats[index].connected:
+                self._subscribe(index, stream, group)
+            else:
+                self._pending[index].append((stream, group))
+
+    def _subscribe(self, index: int, stream: str, symbols: List[str]) -> None:
+        if (index, stream) not in self._forwarding:
+            self._forwarding.add((index, stream))
+            self.shards[index].on(stream, self._forward(index))
+        self.shards[index].subscribe(stream, symbols=symbols)
+
+    def unsubscribe(
+        self,
+        stream: str,
+        symbols: Optional[List[str]] = None,
+        callback: Optional[Callable[[dict], None]] = None,
+    ) -> None:
+        """Unsubscribe from a stream, and remove its handlers."""
+        self._handlers.remove(stream, symbols, callback)
+        if not symbols:
+            for index, shard in enumerate(self.shards):
+                shard.unsubscribe(stream)
+                self._forwarding.discard((index, stream))
+            return
+        groups: Dict[int, List[str]] = defaultdict(list)
+        for symbol in symbols:
+            key = stream if symbol == "$all" else symbol
+            groups[self.shard_for(key)].append(symbol)
+        for index, group in groups.items():
+            self.shards[index].unsubscribe(stream, symbols=group)
+
+    def _flush(self, index: int) -> None:
+        """Send the subscriptions made while a shard was disconnected"""
+        for stream, symbols in self._pending.pop(index, ()):
+            self._subscribe(index, stream, symbols)
+
+    def _forward(self, index: int) -> Callable[[dict], None]:
+        stats = self.stats[index]
+        dispatch = self._handlers.dispatch
+
+        def forward(msg: dict) -> None:
+            stats.record()
+            dispatch(msg)
+
+        return forward
+
+    def _on_open(self, index: int) -> Callable[[], None]:
+        def on_open() -> None:
+            self.stats[index].connected = True
+            self._flush(index)
+            if all(stats.connected for stats in self.stats):
+                self._events.emit("open")
+
+        return on_open
+
+    def _on_disconnect(self, index: int) -> Callable[[dict], None]:
+        def on_disconnect(event: dict) -> None:
+            self.stats[index].connected = False
+            self._events.emit("disconnect", dict(event, shard=index))
+
+        return on_disconnect
+
+    def _on_reconnect(self, index: int) -> Callable[[dict], None]:
+        def on_reconnect(event: dict) -> None:
+            self.stats[index].connected = True
+            self.stats[index].reconnects += 1
+            self._flush(index)
+            self._events.emit("reconnect", dict(event, shard=index))
+
+        return on_reconnect
+
+    def _on_gap(self, index: int) -> Callable[[dict], None]:
+        def on_gap(event: dict) -> None:
+            self._events.emit("gap", dict(event, shard=index))
+
+        return on_gap
+
+    def _on_handler_error(self, error: Exception) -> None:
+        log.error(f"Error in handler: {error!r}")
+        if self._events.listeners("error"):
+            self._events.emit("error", error)
+
+    def _on_error(self, index: int) -> Callable[[dict], None]:
+        def on_error(error) -> None:
+            log.error(f"Shard {index} error: {error}")
+            if self._events.listeners("error"):
+                self._events.emit("error", error)
+
+        return on_error
+
+    def subscribe_trades(
+        self, symbols: List[str], callback: Callable[[dict], None]
+    ) -> None:
+        """Subscribe to individual trade updates."""
+        self.subscribe("trades", symbols=symbols, callback=callback)
+
+    def subscribe_market_diff(
+        self, symbols: List[str], callback: Callable[[dict], None]
+    ) -> None:
+        """Order book price and quantity depth updates."""
+        self.subscribe("marketDiff", symbols=symbols, callback=callback)
+
+    def subscribe_market_depth(
+        self, symbols: List[str], callback: Callable[[dict], None]
+    ) -> None:
+        """Top 20 levels of bids and asks."""
+        self.subscribe("marketDepth", symbols=symbols, callback=callback)
+
+    def subscribe_kline(
+        self, interval: str, symbols: List[str], callback: Callable[[dict], None]
+    ) -> None:
+        """The kline/candlestick stream of an interval."""
+        self.subscribe(f"kline_{interval}", symbols=symbols, callback=callback)
+
+    def subscribe_ticker(
+        self, symbols: List[str], callback: Callable[[dict], None]
+    ) -> None:
+        """24hr Ticker statistics for a single symbol are pushed every second."""
+        self.subscribe("ticker", symbols=symbols, callback=callback)
+
+    def subscribe_mini_ticker(
+        self, symbols: List[str], callback: Callable[[dict], None]
+    ) -> None:
+        """A ticker for a single symbol is pushed every second."""
+        self.subscribe("miniTicker", symbols=symbols, callback=callback)
+
+    def start(
+        self,
+        on_open: Optional[Callable[[], None]] = None,
+        loop: asyncio.AbstractEventLoop = None,
+    ) -> None:
+        """The main blocking call to start all of the WebSocket connections."""
+        loop = loop or asyncio.get_event_loop()
+        return loop.run_until_complete(self.start_async(on_open))
+
+    async def start_async(self, on_open: Optional[Callable[[], None]] = None) -> None:
+        """Process the messages of every shard.
+
+        :param on_open: Called once every shard is connected
+        """
+        if on_open:
+            self._events.once("open", on_open)
+        await asyncio.gather(*(shard.start_async() for shard in self.shards))
+
+    def close(self) -> None:
+        """Close every shard"""
+        for shard in self.shards:
+            shard.close()
@@ -0,0 +1,110 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Reference counted WebSocket subscriptions.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# The symbol of subscriptions to streams without symbols, like user streams
+NO_SYMBOL = ""
+# The symbol of subscriptions to every symbol of a stream, like `allTickers`
+ALL_SYMBOLS = "$all"
+
+Key = Tuple[str, Optional[str]]
+
+
+class SubscriptionRegistry:
+    """Counts the users of every (topic, address, symbol) subscription.
+
+    Only symbols that gain their first user need subscribing to, and only
+    those that lose their last user need unsubscribing from. New symbols are
+    collected until `pending` is called, so that subscriptions made together
+    can be sent as a single message per topic.
+    """
+
+    def __init__(self) -> None:
+        self._refs: Dict[Key, Dict[str, int]] = {}
+        self._pending: Dict[Key, Set[str]] = {}
+
+    def __iter__(self) -> Iterator[Key]:
+        return iter(self._refs)
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._refs
+
+    def refcount(
+        self, topic: str, symbol: str = NO_SYMBOL, address: Optional[str] = None
+    ) -> int:
+        return self._refs.get((topic, address), {}).get(symbol, 0)
+
+    def add(
+        self,
+        topic: str,
+        symbols: Optional[Iterable[str]] = None,
+        address: Optional[str] = None,
+    ) -> List[str]:
+        """Add a user to each of `symbols`, returning the newly added ones"""
+        key = (topic, address)
+        refs = self._refs.setdefault(key, {})
+        added = []
+        for symbol in symbols or (NO_SYMBOL,):
+            count = refs.get(symbol, 0)
+            refs[symbol] = count + 1
+            if not count:
+                added.append(symbol)
+        if added:
+            self._pending.setdefault(key, set()).update(added)
+        return added
+
+    def remove(
+        self,
+        topic: str,
+        symbols: Optional[Iterable[str]] = None,
+        address: Optional[str] = None,
+    ) -> List[str]:
+        """Remove a user from each of `symbols`, returning the ones that lost
+        their last user and had already been subscribed to.
+
+        Without `symbols`, this removes a user of the subscription without
+        symbols or to `$all` if there is one, or else drops every symbol of
+        the topic.
+        """
+        key = (topic, address)
+        refs = self._refs.get(key)
+        if refs is None:
+            return []
+        pending = self._pending.get(key, set())
+        if symbols:
+            released = []
+            for symbol in symbols:
+                count = refs.get(symbol, 0)
+                if count > 1:
+                    refs[symbol] = count - 1
+                elif count:
+                    del refs[symbol]
+                    released.append(symbol)
+        else:
+            shared = next((s for s in (NO_SYMBOL, ALL_SYMBOLS) if s in refs), None)
+            if shared is not None and refs[shared] > 1:
+                refs[shared] -= 1
+                released = []
+            else:
+                released = [shared] if shared is not None else list(refs)
+                for symbol in released:
+                    del refs[symbol]
+        if not refs:
+            del self._refs[key]
+        sent = [symbol for symbol in released if symbol not in pending]
+        pending.difference_update(released)
+        if not pending:
+            self._pending.pop(key, None)
+        return sent
+
+    def pending(self) -> Dict[Key, List[str]]:
+        """Take the symbols added since the last call, per (topic, address)"""
+        pending, self._pending = self._pending, {}
+        return {key: sorted(symbols) for key, symbols in pending.items()}
+
+    def active(self) -> Dict[Key, List[str]]:
+        """Every subscribed symbol, per (topic, address)"""
+        return {key: sorted(refs) for key, refs in self._refs.items()}
@@ -0,0 +1,262 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Follow the user streams of many addresses over a few WebSocket connections.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+
+from .crypto import address_decode
+from .dispatch import DispatchTable
+from .websocket import MAINNET_URL, TESTNET_URL, WebSocket
+
+log = logging.getLogger(__name__)
+
+# The user streams that name the addresses they concern, and can be shared
+SHARED_TOPICS = ("orders", "transfers")
+USER_TOPICS = ("orders", "accounts", "transfers")
+
+
+def order_prefix(address: str) -> str:
+    """The prefix of the ids of the orders of an address"""
+    return address_decode(address).hex().upper()
+
+
+class UserDataManager:
+    """Routes the `orders`, `accounts` and `transfers` streams of many
+    addresses to their handlers.
+
+        users = UserDataManager(addresses, per_connection=100)
+        users.subscribe_user_orders(on_order)  # every address
+        users.subscribe_user_transfers(on_transfer, address=address)
+        await users.start_async()
+
+    Addresses are packed onto connections of up to `per_connection`
+    addresses each, all sharing one aiohttp session. The `orders` and
+    `transfers` streams of a shared connection are routed by the owner of
+    each order, and the sender and receivers of each transfer. Account
+    updates don't name their address though, so following `accounts` takes
+    a dedicated connection per address.
+
+    Messages are delivered once per address they concern, with the address
+    in `msg["address"]`, to the handlers of that address and to those
+    registered without an address.
+    """
+
+    def __init__(
+        self,
+        addresses: Iterable[str] = (),
+        per_connection: int = 100,
+        topics: Iterable[str] = SHARED_TOPICS,
+        testnet: bool = False,
+        keepalive: bool = True,
+        loop: asyncio.AbstractEventLoop = None,
+        url: str = None,
+        reconnect: bool = True,
+    ) -> None:
+        """
+        :param addresses: The addresses to follow
+        :param per_connection: The maximum number of addresses per connection
+        :param topics: The user streams to follow, out of `USER_TOPICS`
+        :param testnet: Use testnet instead of mainnet
+        :param keepalive: Send a `keepAlive` message every 30 minutes
+        :param loop: The event loop to use
+        :param url: An optional WebSocket URL to connect to
+        :param reconnect: Automatically reconnect each connection
+        """
+        self.url = url or (TESTNET_URL if testnet else MAINNET_URL)
+        self.per_connection = per_connection
+        self.topics = set(topics)
+        unknown = self.topics - set(USER_TOPICS)
+        if unknown:
+            raise ValueError(f"Unknown user streams: {sorted(unknown)}")
+        self._keepalive = keepalive
+        self._reconnect = reconnect
+        self._loop = loop or asyncio.get_event_loop()
+        self._session = aiohttp.ClientSession()
+        self._handlers = DispatchTable(on_error=self._on_handler_error)
+        self._routers: Dict[str, Callable[[dict], None]] = {
+            "orders": self._route_orders,
+            "transfers": self._route_transfers,
+        }
+        # Shared connections, and the addresses on each of them
+        self.connections: List[WebSocket] = []
+        self._members: List[Set[str]] = []
+        self._connection_of: Dict[str, int] = {}
+        # Dedicated `accounts` connections, per address
+        self.accounts: Dict[str, WebSocket] = {}
+        self._prefixes: Dict[str, str] = {}
+        self._routed: Set[int] = set()
+        self._tasks: List[asyncio.Future] = []
+        self._started = False
+        for address in addresses:
+            self.add(address)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._connection_of
+
+    @property
+    def addresses(self) -> List[str]:
+        return list(self._connection_of)
+
+    def connection_for(self, address: str) -> WebSocket:
+        """The shared connection that `address` is packed onto"""
+        return self.connections[self._connection_of[address]]
+
+    def add(self, address: str) -> None:
+        """Start following an address"""
+        if address in self._connection_of:
+            return
+        shared = self.topics.intersection(SHARED_TOPICS)
+        if shared:
+            index = next(
+                (
+                    i
+                    for i, members in enumerate(self._members)
+                    if len(members) < self.per_connection
+                ),
+                None,
+            )
+            if index is None:
+                index = len(self.connections)
+                self._members.append(set())
+                self.connections.append(self._connect())
+            self._members[index].add(address)
+            self._connection_of[address] = index
+            self._prefixes[order_prefix(address)] = address
+            for topic in sorted(shared):
+                self.connections[index].subscribe(topic, address=address)
+            if index not in self._routed:
+                self._attach_routers(index)
+        else:
+            self._connection_of[address] = -1
+        if "accounts" in self.topics:
+            websocket = self.accounts[address] = self._connect(address)
+            websocket.subscribe_user_accounts(self._account_router(address))
+
+    def remove(self, address: str) -> None:
+        """Stop following an address"""
+        index = self._connection_of.pop(address, None)
+        if index is None:
+            return
+        if index >= 0:
+            self._members[index].discard(address)
+            self._prefixes.pop(order_prefix(address), None)
+            for topic in self.topics.intersection(SHARED_TOPICS):
+                self.connections[index].unsubscribe(topic, address=address)
+            if not self._members[index]:
+                # Releasing the last address removed our routers too
+                self._routed.discard(index)
+        websocket = self.accounts.pop(address, None)
+        if websocket:
+            websocket.close()
+
+    def _connect(self, address: Optional[str] = None) -> WebSocket:
+        websocket = WebSocket(
+            address=address,
+            url=self.url,
+            keepalive=self._keepalive,
+            loop=self._loop,
+            reconnect=self._reconnect,
+            session=self._session,
+        )
+        if self._started:
+            self._tasks.append(asyncio.ensure_future(websocket.start_async()))
+        return websocket
+
+    def _attach_routers(self, index: int) -> None:
+        """Handle the shared topics of a connection, for every address"""
+        self._routed.add(index)
+        for topic in self.topics.intersection(SHARED_TOPICS):
+            self.connections[index].add_handler(topic, self._routers[topic])
+
+    def _route_orders(self, msg: dict) -> None:
+        groups: Dict[str, list] = {}
+        for report in msg["data"]:
+            address = self._prefixes.get(report["i"].partition("-")[0])
+            if address is not None:
+                groups.setdefault(address, []).append(report)
+        for address, reports in groups.items():
+            self._handlers.dispatch(dict(msg, data=reports, address=address), address)
+
+    def _route_transfers(self, msg: dict) -> None:
+        data = msg["data"]
+        owners = [data.get("f")] + [to.get("o") for to in data.get("t", ())]
+        for address in dict.fromkeys(owners):
+            if address in self._connection_of:
+                self._handlers.dispatch(dict(msg, address=address), address)
+
+    def _account_router(self, address: str) -> Callable[[dict], None]:
+        def route(msg: dict) -> None:
+            self._handlers.dispatch(dict(msg, address=address), address)
+
+        return route
+
+    def _on_handler_error(self, error: Exception) -> None:
+        log.error(f"Error in user data handler: {error!r}")
+
+    def subscribe(
+        self,
+        topic: str,
+        callback: Callable[[dict], None],
+        address: Optional[str] = None,
+    ) -> None:
+        """Handle the messages of a user stream, of one or every address"""
+        if topic not in self.topics:
+            raise ValueError(f"Not following {topic}, see `topics`")
+        self._handlers.add(topic, callback, address=address)
+
+    def unsubscribe(
+        self,
+        topic: str,
+        callback: Optional[Callable[[dict], None]] = None,
+        address: Optional[str] = None,
+    ) -> None:
+        """Remove the handlers of a user stream"""
+        self._handlers.remove(topic, handler=callback, address=address)
+
+    def subscribe_user_orders(
+        self, callback: Callable[[dict], None], address: Optional[str] = None
+    ) -> None:
+        """Subscribe to individual order updates."""
+        self.subscribe("orders", callback, address)
+
+    def subscribe_user_accounts(
+        self, callback: Callable[[dict], None], address: Optional[str] = None
+    ) -> None:
+        """Subscribe to account updates."""
+        self.subscribe("accounts", callback, address)
+
+    def subscribe_user_transfers(
+        self, callback: Callable[[dict], None], address: Optional[str] = None
+    ) -> None:
+        """Subscribe to the transfers that an address sends or receives."""
+        self.subscribe("transfers", callback, address)
+
+    def start(self, loop: asyncio.AbstractEventLoop = None) -> None:
+        """The main blocking call to start all of the connections."""
+        loop = loop or asyncio.get_event_loop()
+        return loop.run_until_complete(self.start_async())
+
+    async def start_async(self) -> None:
+        """Process the messages of every connection, including the ones
+        opened for addresses added later, until closed"""
+        self._started = True
+        for websocket in self.connections + list(self.accounts.values()):
+            self._tasks.append(asyncio.ensure_future(websocket.start_async()))
+        while True:
+            tasks = [task for task in self._tasks if not task.done()]
+            if not tasks:
+                break
+            await asyncio.wait(tasks)
+        for task in self._tasks:
+            task.result()
+
+    def close(self) -> None:
+        """Close every connection, and our session"""
+        for websocket in self.connections + list(self.accounts.values()):
+            websocket.close()
+        asyncio.ensure_future(self._session.close())
@@ -7,17 +7,262 @@ https://docs.binance.org/api-reference/dex-api/ws-streams.html#websocket-streams
 """
 import asyncio
 import logging
-from typing import Any, Callable, Dict, List, Optional, Tuple
+import random
+import time
+from concurrent.futures import Executor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import aiohttp
 import orjson
 from pyee import AsyncIOEventEmitter
 
+from .dispatch import DispatchTable, symbol_of
+from .enums import Execution, Overflow
+from .execution import MODES, QueuedHandler
+from .health import MAX_MISSED_PONGS, ConnectionHealth
+from .subscriptions import NO_SYMBOL, SubscriptionRegistry
+
+if TYPE_CHECKING:
+    from .latency import LatencyMonitor
+
 log = logging.getLogger(__name__)
 
 MAINNET_URL = "wss://dex.binance.org/api/ws"
 TESTNET_URL = "wss://testnet-dex.binance.org/api/ws"
 
+# The number of frames per stream that may be waiting to be decoded
+DECODE_BACKLOG = 1000
+
+# Events emitted by the WebSocket itself, rather than subscribable streams
+LIFECYCLE_EVENTS = (
+    "open",
+    "error",
+    "new_listener",
+    "disconnect",
+    "reconnect",
+    "gap",
+    "stale",
+)
+
+
+def peek_stream(raw: str) -> Optional[str]:
+    """Cheaply extract the stream name of a raw frame, without decoding it"""
+    start = raw.find('"stream":"')
+    if start == -1:
+        return None
+    start += 10
+    end = raw.find('"', start)
+    return raw[start:end] if end != -1 else None
+
+
+def peek_symbols(raw: str) -> Set[str]:
+    """Cheaply extract the symbols mentioned in a raw frame, without decoding it"""
+    symbols = set()
+    for key in ('"s":"', '"symbol":"'):
+        start = raw.find(key)
+        while start != -1:
+            start += len(key)
+            end = raw.find('"', start)
+            if end == -1:
+                break
+            symbols.add(raw[start:end])
+            start = raw.find(key, end)
+    return symbols
+
+
+class Stream:
+    """An async iterator over the messages of a WebSocket stream.
+
+    Messages are buffered in a bounded queue, and the `overflow` policy
+    decides what happens once it is full: `BLOCK` stops reading from the
+    socket until the consumer catches up, while `DROP_OLDEST` and
+    `DROP_NEWEST` discard messages and count them in `dropped`.
+    """
+
+    def __init__(
+        self,
+        websocket: "WebSocket",
+        stream: str,
+        symbols: Optional[List[str]] = None,
+        maxsize: int = 1000,
+        overflow: Overflow = Overflow.BLOCK,
+        address: Optional[str] = None,
+    ) -> None:
+        self.websocket = websocket
+        self.stream = stream
+        self.address = address
+        self.subscribed = symbols
+        self.symbols = set(symbols or ()) - {"$all"} or None
+        self.overflow = overflow
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._closed = False
+
+    def __aiter__(self) -> "Stream":
+        return self
+
+    async def __anext__(self) -> dict:
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        msg = await self._queue.get()
+        if msg is None:
+            raise StopAsyncIteration
+        if not self._space.is_set():
+            self._space.set()
+        return msg
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def wants(self, msg: dict) -> bool:
+        if self.symbols is None:
+            return True
+        data = msg["data"]
+        if isinstance(data, list):
+            return any(
+                isinstance(payload, dict) and payload.get("s") in self.symbols
+                for payload in data
+            )
+        return symbol_of(msg) in self.symbols
+
+    def put_nowait(self, msg: dict) -> bool:
+        """Queue a message, returning False if we need to block for it"""
+        if self._closed:
+            return True
+        if self._queue.qsize() >= self.maxsize:
+            if self.overflow is Overflow.BLOCK:
+                self._space.clear()
+                return False
+            self.dropped += 1
+            if self.overflow is Overflow.DROP_NEWEST:
+                return True
+            self._queue.get_nowait()
+        self._queue.put_nowait(msg)
+        return True
+
+    async def put(self, msg: dict) -> None:
+        while not self.put_nowait(msg):
+            await self._space.wait()
+
+    def close(self) -> None:
+        """Stop consuming this stream, discarding any buffered messages"""
+        if self._closed:
+            return
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._finish()
+        self.websocket._release(self)
+
+    def _finish(self) -> None:
+        """End the stream once the consumer has read what is buffered"""
+        if self._closed:
+            return
+        self._closed = True
+        self.websocket._detach(self)
+        # Wake up both the consumer and a blocked reader
+        self._queue.put_nowait(None)
+        self._space.set()
+
+
+class ConflatedStream:
+    """The latest message of each symbol of a WebSocket stream.
+
+    Intended for streams where only the newest state matters, like tickers,
+    depth snapshots and klines. The reader only ever overwrites the latest
+    payload of each symbol, so a slow consumer never builds up a backlog.
+    List payloads, like `allTickers`, are split up by symbol.
+
+        async for updates in ws.conflate("allMiniTickers"):
+            for symbol, ticker in updates.items():
+                ...
+    """
+
+    def __init__(
+        self,
+        websocket: "WebSocket",
+        stream: str,
+        symbols: Optional[List[str]] = None,
+        address: Optional[str] = None,
+    ) -> None:
+        self.websocket = websocket
+        self.stream = stream
+        self.address = address
+        self.subscribed = symbols
+        self.symbols = set(symbols or ()) - {"$all"} or None
+        self.latest: Dict[Optional[str], dict] = {}
+        # Updates that were overwritten before the consumer saw them
+        self.conflated = 0
+        self._updated: Dict[Optional[str], None] = {}
+        self._event = asyncio.Event()
+        self._closed = False
+
+    def __aiter__(self) -> "ConflatedStream":
+        return self
+
+    async def __anext__(self) -> Dict[Optional[str], dict]:
+        updates = await self.get()
+        if not updates and self._closed:
+            raise StopAsyncIteration
+        return updates
+
+    async def get(self) -> Dict[Optional[str], dict]:
+        """Wait for, and return, the latest payloads that changed since last time"""
+        if not self._updated and not self._closed:
+            self._event.clear()
+            await self._event.wait()
+        updated, self._updated = self._updated, {}
+        return {symbol: self.latest[symbol] for symbol in updated}
+
+    def snapshot(self) -> Dict[Optional[str], dict]:
+        """The latest payload of every symbol"""
+        return dict(self.latest)
+
+    def wants(self, msg: dict) -> bool:
+        return True
+
+    def put_nowait(self, msg: dict) -> bool:
+        data = msg["data"]
+        for payload in data if isinstance(data, list) else (data,):
+            symbol = payload.get("s") or payload.get("symbol")
+            if self.symbols is not None and symbol not in self.symbols:
+                continue
+            if symbol in self._updated:
+                self.conflated += 1
+            else:
+                self._updated[symbol] = None
+            self.latest[symbol] = payload
+        if self._updated:
+            self._event.set()
+        return True
+
+    def close(self) -> None:
+        """Stop consuming this stream"""
+        if self._closed:
+            return
+        self._finish()
+        self.websocket._release(self)
+
+    def _finish(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.websocket._detach(self)
+        self._event.set()
+
 
 class WebSocket:
     """The Binance DEX WebSocket Manager."""
@@ -29,21 +274,83 @@ class WebSocket:
         keepalive: bool = True,
         loop: asyncio.AbstractEventLoop = None,
         url: str = None,
+        reconnect: bool = False,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 60.0,
+        decoder: Optional[Executor] = None,
+        decode_streams: Optional[Iterable[str]] = None,
+        selective: bool = True,
+        heartbeat: Optional[float] = None,
+        stale_reconnect: bool = False,
+        cadences: Optional[Dict[str, float]] = None,
+        session: Optional[aiohttp.ClientSession] = None,
     ) -> None:
+        """
+        :param address: The address to follow user streams for
+        :param testnet: Use testnet instead of mainnet
+        :param keepalive: Send a `keepAlive` message every 30 minutes
+        :param loop: The event loop to use
+        :param url: An optional WebSocket URL to connect to
+        :param reconnect: Automatically reconnect and resubscribe when the
+            connection drops, emitting `disconnect`, `reconnect` and `gap` events
+        :param reconnect_delay: The base delay of the reconnect backoff
+        :param max_reconnect_delay: The maximum delay of the reconnect backoff
+        :param decoder: An executor to decode JSON frames in, keeping the event
+            loop free for I/O. Note that only a `ProcessPoolExecutor` decodes
+            in parallel, since orjson holds the GIL.
+        :param decode_streams: The streams to decode in `decoder`, like
+            `allTickers` or `marketDiff`. Defaults to all of them.
+        :param selective: Peek at the stream and symbols of each frame, and
+            skip decoding the ones that no handler or stream wants.
+        :param heartbeat: Ping the server this often, in seconds, measuring the
+            round trip time and checking that streams with a regular cadence,
+            like tickers, klines and blockheight, are still pushing. Emits a
+            `stale` event when a stream or the connection goes silent.
+        :param stale_reconnect: Drop the connection when it goes stale, which
+            reconnects if `reconnect` is enabled
+        :param cadences: Extra or overridden stream cadences in seconds, see
+            `binancechain.health.CADENCES`
+        :param session: An aiohttp session to connect with, which is left open
+            when we close. Defaults to a session of our own.
+        """
         if not url:
             self.url = TESTNET_URL if testnet else MAINNET_URL
         else:
             self.url = url
         self.address = address
-        self._session = aiohttp.ClientSession()
+        self._owns_session = session is None
+        self._session = session or aiohttp.ClientSession()
         self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
         self._loop = loop or asyncio.get_event_loop()
         self._events = AsyncIOEventEmitter(loop=self._loop)
-        self._sub_queue: List[Tuple[str, dict]] = []
+        self._handlers = DispatchTable(on_error=self._on_handler_error)
         self._keepalive = keepalive
         self._keepalive_task: Optional[asyncio.Future] = None
         self._open = False
         self._testnet = testnet
+        self._reconnect = reconnect
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._closing = False
+        # Active subscriptions, replayed upon reconnect
+        self._subscriptions = SubscriptionRegistry()
+        self._flush_scheduled = False
+        self._streams: Dict[str, List[Union[Stream, ConflatedStream]]] = {}
+        self._selective = selective
+        self._frame_listeners: List[Callable[[str, float], None]] = []
+        self._monitor: Optional["LatencyMonitor"] = None
+        self._heartbeat = heartbeat
+        self._stale_reconnect = stale_reconnect
+        self.health = ConnectionHealth(cadences=cadences) if heartbeat else None
+        # Frames skipped without decoding, per stream
+        self.skipped: Dict[str, int] = {}
+        self._decoder = decoder
+        self._decode_streams = set(decode_streams) if decode_streams else None
+        # Frames being decoded, in arrival order, per stream
+        self._decode_queues: Dict[str, asyncio.Queue] = {}
+        self._decode_tasks: List[asyncio.Future] = []
+        # Handlers that don't run inline, per stream and original handler
+        self._queued: Dict[Tuple[str, Callable], QueuedHandler] = {}
 
     def on(self, event: str, func: Optional[Callable] = None, **kwargs):
         """Register an event, and optional handler.
@@ -51,14 +358,43 @@ class WebSocket:
         This can be used as a decorator or as a normal method.
         See `examples/websockets_decorator.py` for usage.
         """
-        # Queue up most events from startup-time decorators until after we are open
-        if not self._open and event not in ("open", "error", "new_listener"):
-            self._sub_queue.append((event, kwargs))
+        if event in LIFECYCLE_EVENTS:
+            if func:
+                self._events.on(event, func)
+                return None
+            return self._events.on(event)
+
+        address = kwargs.get("address") or self.address
+        # Subscribe to the streams of startup-time decorators once we are open
+        if not self._open:
+            self._subscriptions.add(event, kwargs.get("symbols"), address)
+
+        def register(func: Callable) -> Callable:
+            self.add_handler(event, func, kwargs.get("symbols"), address)
+            return func
+
         if func:
-            self._events.on(event, func)
+            register(func)
             return None
-        else:
-            return self._events.on(event)
+        return register
+
+    def add_handler(
+        self,
+        stream: str,
+        callback: Callable[[dict], None],
+        symbols: Optional[List[str]] = None,
+        address: Optional[str] = None,
+    ) -> None:
+        """Handle the messages of a stream, without subscribing to it.
+
+        The handler is removed with the stream's last subscription.
+        """
+        self._handlers.add(stream, callback, symbols, address)
+
+    def remove_listener(self, event: str, func: Callable) -> None:
+        """Remove a handler of a lifecycle event, like `open` or `gap`"""
+        if func in self._events.listeners(event):
+            self._events.remove_listener(event, func)
 
     def start(
         self,
@@ -75,55 +411,306 @@ class WebSocket:
         on_open: Optional[Callable[[], None]] = None,
         on_error: Optional[Callable[[dict], None]] = None,
     ) -> None:
-        """Processes all websocket messages."""
+        """Processes all websocket messages.
+
+        If reconnecting is enabled, this only returns once `close` is called.
+        """
         if self.address:  # address-specific socket
             url = f"{self.url}/{self.address}"
         else:
             url = self.url
 
-        async with self._session.ws_connect(url) as ws:
-            self._ws = ws
-            self._events.emit("open")
-            while self._sub_queue:
-                event, kwargs = self._sub_queue.pop()
-                self.subscribe(event, **kwargs)
-            if on_open:
-                on_open()
-
-            # Schedule keepalive calls every 30 minutes
-            if self._keepalive:
-                self._keepalive_task = asyncio.ensure_future(self._auto_keepalive())
-
-            async for msg in ws:
-                if msg.type == aiohttp.WSMsgType.TEXT:
+        attempt = 0
+        # Whether we have connected yet, as opposed to reconnected
+        opened = False
+        disconnected_at: Optional[float] = None
+        while True:
+            try:
+                # Handle pings ourselves when measuring their round trips
+                async with self._session.ws_connect(
+                    url, autoping=not self._heartbeat
+                ) as ws:
+                    self._ws = ws
+                    attempt = 0
+                    if self.health:
+                        self.health.reset()
+                    if not opened:
+                        opened = self._open = True
+                        self._events.emit("open")
+                        if on_open:
+                            on_open()
+                        self._flush_subscriptions()
+                    else:
+                        assert disconnected_at is not None
+                        self._resubscribe()
+                        now = time.time()
+                        gap = {
+                            "start": disconnected_at,
+                            "end": now,
+                            "downtime": now - disconnected_at,
+                        }
+                        self._events.emit("reconnect", gap)
+                        self._events.emit(
+                            "gap", dict(gap, streams=self.subscribed_streams)
+                        )
+                        disconnected_at = None
+
+                    # Schedule keepalive calls every 30 minutes
+                    if self._keepalive:
+                        if self._keepalive_task:
+                            self._keepalive_task.cancel()
+                        self._keepalive_task = asyncio.ensure_future(
+                            self._auto_keepalive()
+                        )
+
+                    watchdog = None
+                    if self._heartbeat:
+                        watchdog = asyncio.ensure_future(self._watch(ws))
                     try:
-                        data = msg.json(loads=orjson.loads)
-                    except Exception as e:
-                        log.error(f"Unable to decode msg: {msg}")
-                        continue
-                    if not data:
-                        log.error(f"Got empty msg: {msg}")
-                        continue
-                    if "error" in data:
-                        self._events.emit("error", data)
-                        if on_error:
-                            on_error(data)
-                        else:
-                            log.error(f"Unhandled error msg: {data}")
-                        continue
-                    if "stream" not in data:
-                        log.error(f"Got msg without stream: {data}")
-                        continue
-                    if "data" not in data:
-                        log.error(f"Got msg without data: {data}")
-                        continue
-
-                    self._events.emit(data["stream"], data)
-
-                elif msg.type == aiohttp.WSMsgType.ERROR:
-                    log.error(msg)
-                    self._events.emit("error", msg)
-                    break
+                        await self._read(ws, on_error)
+                    finally:
+                        if watchdog:
+                            watchdog.cancel()
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                if self._closing or not self._reconnect:
+                    raise
+                log.error(f"WebSocket connection error: {e!r}")
+                self._emit_error(e)
+            finally:
+                self._ws = None
+
+            if self._closing or not self._reconnect:
+                break
+            # Failing to connect in the first place isn't a disconnection
+            if opened and disconnected_at is None:
+                disconnected_at = time.time()
+                self._events.emit("disconnect", {"time": disconnected_at})
+            delay = min(
+                self._max_reconnect_delay, self._reconnect_delay * 2 ** attempt
+            )
+            attempt += 1
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            if self._closing:
+                break
+
+        await self._stop_decoders()
+        for streams in list(self._streams.values()):
+            for stream in list(streams):
+                stream._finish()
+
+    async def _read(
+        self,
+        ws: aiohttp.ClientWebSocketResponse,
+        on_error: Optional[Callable[[dict], None]] = None,
+    ) -> None:
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                await self._receive(msg.data, time.time(), on_error)
+
+            elif msg.type == aiohttp.WSMsgType.PING:
+                await ws.pong(msg.data)
+
+            elif msg.type == aiohttp.WSMsgType.PONG:
+                if self.health:
+                    self.health.pong()
+
+            elif msg.type == aiohttp.WSMsgType.ERROR:
+                log.error(msg)
+                self._events.emit("error", msg)
+                break
+
+    async def _receive(
+        self,
+        raw: str,
+        received: float,
+        on_error: Optional[Callable[[dict], None]] = None,
+    ) -> None:
+        """Decode and dispatch a raw text frame"""
+        started = time.perf_counter() if self._monitor else None
+        for listener in self._frame_listeners:
+            listener(raw, received)
+        stream = None
+        if self._selective or self._decoder or self.health:
+            stream = peek_stream(raw)
+            if self.health and stream is not None:
+                self.health.seen(stream)
+        if stream is not None:
+            if self._selective and not self._wants(stream, raw):
+                self.skipped[stream] = self.skipped.get(stream, 0) + 1
+                return
+            if self._decoder and (
+                self._decode_streams is None or stream in self._decode_streams
+            ):
+                await self._decode_later(stream, raw, on_error, received, started)
+                return
+        try:
+            data = orjson.loads(raw)
+        except Exception as e:
+            log.error(f"Unable to decode msg: {raw}")
+            return
+        await self._handle(data, on_error, received, started)
+
+    def add_frame_listener(self, func: Callable[[str, float], None]) -> None:
+        """Call `func` with every raw text frame and the time it was received,
+        before it is decoded or filtered."""
+        self._frame_listeners.append(func)
+
+    def instrument(self, monitor: "LatencyMonitor") -> None:
+        """Report the latency of every message and handler to `monitor`"""
+        self._monitor = monitor
+        self._handlers.on_timing = monitor.observe_handler
+
+    def _wants(self, stream: str, raw: str) -> bool:
+        """Does any handler or stream consumer want this raw frame?"""
+        route = self._handlers.route(stream)
+        streams = self._streams.get(stream)
+        if not route and not streams:
+            return False
+        if (route and route.any) or any(it.symbols is None for it in streams or ()):
+            return True
+        symbols = peek_symbols(raw)
+        if not symbols:
+            return True
+        if route and not symbols.isdisjoint(route.symbols):
+            return True
+        return any(not symbols.isdisjoint(it.symbols) for it in streams or ())
+
+    async def _handle(
+        self,
+        data: Any,
+        on_error: Optional[Callable[[dict], None]] = None,
+        received: Optional[float] = None,
+        started: Optional[float] = None,
+    ) -> None:
+        """Dispatch a decoded message.
+
+        :param received: When the frame was received, in `time.time` seconds
+        :param started: When we started processing it, in `time.perf_counter`
+            seconds, to measure processing time when monitored
+        """
+        if not data:
+            log.error(f"Got empty msg: {data}")
+            return
+        if "error" in data:
+            self._events.emit("error", data)
+            if on_error:
+                on_error(data)
+            else:
+                log.error(f"Unhandled error msg: {data}")
+            return
+        if "stream" not in data:
+            log.error(f"Got msg without stream: {data}")
+            return
+        if "data" not in data:
+            log.error(f"Got msg without data: {data}")
+            return
+
+        self._handlers.dispatch(data, self.address)
+        streams = self._streams.get(data["stream"])
+        if streams:
+            for stream in tuple(streams):
+                if stream.wants(data) and not stream.put_nowait(data):
+                    await stream.put(data)
+        if self._monitor and started is not None:
+            self._monitor.observe(data, received, time.perf_counter() - started)
+
+    async def _decode_later(
+        self,
+        stream: str,
+        raw: str,
+        on_error: Optional[Callable[[dict], None]],
+        received: Optional[float] = None,
+        started: Optional[float] = None,
+    ) -> None:
+        """Decode a frame in our decoder pool, keeping each stream in order"""
+        queue = self._decode_queues.get(stream)
+        if queue is None:
+            queue = self._decode_queues[stream] = asyncio.Queue(DECODE_BACKLOG)
+            self._decode_tasks.append(
+                asyncio.ensure_future(self._dispatch_decoded(queue, on_error))
+            )
+        future = self._loop.run_in_executor(self._decoder, orjson.loads, raw)
+        await queue.put((future, received, started))
+
+    async def _dispatch_decoded(
+        self, queue: asyncio.Queue, on_error: Optional[Callable[[dict], None]]
+    ) -> None:
+        while True:
+            future, received, started = await queue.get()
+            try:
+                data = await future
+            except Exception as e:
+                log.error(f"Unable to decode msg: {e!r}")
+            else:
+                await self._handle(data, on_error, received, started)
+            finally:
+                queue.task_done()
+
+    async def _stop_decoders(self) -> None:
+        """Stop our dispatchers, after the frames still being decoded unless
+        we are closing."""
+        if not self._closing:
+            for queue in self._decode_queues.values():
+                await queue.join()
+        for task in self._decode_tasks:
+            task.cancel()
+        self._decode_tasks = []
+        self._decode_queues = {}
+
+    def _on_handler_error(self, error: Exception) -> None:
+        log.error(f"Error in WebSocket handler: {error!r}")
+        self._emit_error(error)
+
+    def _emit_error(self, error: Any) -> None:
+        # pyee raises errors that nobody is listening for
+        if self._events.listeners("error"):
+            self._events.emit("error", error)
+
+    @property
+    def subscribed_streams(self) -> List[dict]:
+        """The currently active subscriptions"""
+        return [
+            {
+                "topic": topic,
+                "symbols": [symbol for symbol in symbols if symbol != NO_SYMBOL],
+                "address": address,
+            }
+            for (topic, address), symbols in self._subscriptions.active().items()
+        ]
+
+    def _subscribe_payload(
+        self, stream: str, symbols: Optional[List[str]], address: Optional[str]
+    ) -> Dict[Any, Any]:
+        payload: Dict[Any, Any] = {"method": "subscribe", "topic": stream}
+        symbols = [symbol for symbol in symbols or () if symbol != NO_SYMBOL]
+        if symbols:
+            payload["symbols"] = symbols
+        if address:
+            payload["address"] = address
+        return payload
+
+    def _schedule_flush(self) -> None:
+        """Send new subscriptions on the next iteration of the event loop, so
+        that the ones made together are batched"""
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.call_soon(self._flush_subscriptions)
+
+    def _flush_subscriptions(self) -> None:
+        """Subscribe to the new symbols of each topic, one message per topic."""
+        self._flush_scheduled = False
+        if not self._ws:
+            return  # They will be sent once we are open
+        for (topic, address), symbols in self._subscriptions.pending().items():
+            payload = self._subscribe_payload(topic, symbols, address)
+            asyncio.ensure_future(self.send(payload))
+
+    def _resubscribe(self) -> None:
+        """Replay our subscriptions, one message per topic."""
+        self._subscriptions.pending()  # Included below
+        for (topic, address), symbols in self._subscriptions.active().items():
+            payload = self._subscribe_payload(topic, symbols, address)
+            asyncio.ensure_future(self.send(payload))
 
     async def send(self, data: dict) -> None:
         """Send data to the WebSocket"""
@@ -132,33 +719,153 @@ class WebSocket:
             return
         await self._ws.send_bytes(orjson.dumps(data))
 
+    def stream(
+        self,
+        stream: str,
+        symbols: Optional[List[str]] = None,
+        address: Optional[str] = None,
+        maxsize: int = 1000,
+        overflow: Union[Overflow, str] = Overflow.BLOCK,
+    ) -> Stream:
+        """Subscribe to a stream, returning an async iterator over its messages.
+
+            async for msg in ws.stream("trades", symbols=["NNB-0AD_BNB"]):
+                ...
+
+        :param stream: The stream to subscribe to
+        :param symbols: Only yield messages about these symbols
+        :param address: The address of user streams
+        :param maxsize: The number of messages to buffer
+        :param overflow: What to do when the buffer is full, see `Overflow`
+        """
+        address = address or self.address
+        it = Stream(self, stream, symbols, maxsize, Overflow(overflow), address)
+        self._attach(it)
+        return it
+
+    def conflate(
+        self,
+        stream: str,
+        symbols: Optional[List[str]] = None,
+        address: Optional[str] = None,
+    ) -> ConflatedStream:
+        """Subscribe to a stream, only keeping the latest message per symbol.
+
+        :param stream: The stream to subscribe to, like `ticker` or `kline_1m`
+        :param symbols: Only keep messages about these symbols
+        :param address: The address of user streams
+        """
+        address = address or self.address
+        it = ConflatedStream(self, stream, symbols, address)
+        self._attach(it)
+        return it
+
+    def _attach(self, it: Union[Stream, ConflatedStream]) -> None:
+        self._streams.setdefault(it.stream, []).append(it)
+        self.subscribe(it.stream, symbols=it.subscribed, address=it.address)
+
+    def _release(self, it: Union[Stream, ConflatedStream]) -> None:
+        """Drop the subscription of a closed stream"""
+        self.unsubscribe(it.stream, symbols=it.subscribed, address=it.address)
+
+    def _detach(self, stream: Union[Stream, ConflatedStream]) -> None:
+        streams = self._streams.get(stream.stream)
+        if streams and stream in streams:
+            streams.remove(stream)
+            if not streams:
+                del self._streams[stream.stream]
+
     def subscribe(
         self,
         stream: str,
         symbols: Optional[List[str]] = None,
         address: Optional[str] = None,
         callback: Optional[Callable[[dict], None]] = None,
-    ):
+        mode: Union[Execution, str, None] = None,
+    ) -> Optional[Callable[[dict], Any]]:
         """Subscribe to a WebSocket stream.
 
+        Subscriptions are reference counted per symbol, and the symbols that
+        aren't subscribed to yet are sent on the next iteration of the event
+        loop, batched into a single message per topic.
+
         See the documentation for more details on the available streams
         https://docs.binance.org/api-reference/dex-api/ws-streams.html
+
+        :param mode: How to run `callback`, see `Execution`. Handlers run
+            inline in the read loop by default. For other options, like the
+            concurrency limit, pass a `binancechain.execution` wrapper as the
+            callback instead.
+        :returns: The registered handler, which is a wrapper of `callback`
+            with a `snapshot` of its queue depth in modes other than inline
         """
-        payload: Dict[Any, Any] = {"method": "subscribe", "topic": stream}
-        if symbols:
-            payload["symbols"] = symbols
-        if address:
-            payload["address"] = address
-        elif self.address:
-            payload["address"] = self.address
-        self._events.on(stream, callback)
-        asyncio.ensure_future(self.send(payload))
+        address = address or self.address
+        if callback:
+            if isinstance(callback, QueuedHandler):
+                self._queued[(stream, callback)] = callback
+            elif mode is not None and Execution(mode) is not Execution.INLINE:
+                key = (stream, callback)
+                if key not in self._queued:
+                    self._queued[key] = MODES[Execution(mode)](callback)
+                callback = self._queued[key]
+            if isinstance(callback, QueuedHandler):
+                callback.on_error = self._on_handler_error
+            self._handlers.add(stream, callback, symbols, address)
+        if self._subscriptions.add(stream, symbols, address):
+            self._schedule_flush()
+        return callback
+
+    def unsubscribe(
+        self,
+        stream: str,
+        symbols: Optional[List[str]] = None,
+        callback: Optional[Callable[[dict], None]] = None,
+        address: Optional[str] = None,
+    ) -> None:
+        """Release a subscription to a WebSocket stream.
 
-    def unsubscribe(self, stream, symbols=None) -> None:
-        payload = {"method": "unsubscribe", "topic": stream}
-        if symbols:
-            payload["symbols"] = symbols
-        asyncio.ensure_future(self.send(payload))
+        Symbols are only unsubscribed from once their last user releases
+        them, at which point their handlers are removed too. Without
+        `symbols`, this releases a subscription made without symbols or to
+        `$all`, or else drops the whole stream.
+
+        :param symbols: Only release these symbols
+        :param callback: Remove this handler, and no others
+        :param address: Only release the subscriptions of this address
+        """
+        released: List[str] = []
+        for key in list(self._subscriptions):
+            if key[0] != stream or (address is not None and key[1] != address):
+                continue
+            symbols_released = self._subscriptions.remove(stream, symbols, key[1])
+            if not symbols_released:
+                continue
+            released.extend(symbols_released)
+            payload: Dict[str, Any] = {"method": "unsubscribe", "topic": stream}
+            symbols_released = [s for s in symbols_released if s != NO_SYMBOL]
+            if symbols_released:
+                payload["symbols"] = symbols_released
+            if self._ws:
+                asyncio.ensure_future(self.send(payload))
+        if callback:
+            queued = self._queued.get((stream, callback))
+            self._handlers.remove(stream, symbols, queued or callback)
+            if queued and not symbols:
+                del self._queued[(stream, callback)]
+                queued.close()
+        elif not any(key[0] == stream for key in self._subscriptions):
+            self._handlers.remove(stream)
+            for key in [key for key in self._queued if key[0] == stream]:
+                self._queued.pop(key).close()
+        elif released:
+            self._handlers.remove(stream, released)
+
+    def handler_queues(self) -> List[dict]:
+        """The queue depth and timings of the handlers that don't run inline"""
+        return [
+            {"stream": stream, "handler": repr(queued), **queued.snapshot()}
+            for (stream, _), queued in self._queued.items()
+        ]
 
     def subscribe_user_orders(
         self, callback: Callable[[dict], None], address: Optional[str] = None
@@ -236,6 +943,41 @@ class WebSocket:
         """Streams the latest block height."""
         self.subscribe("blockheight", symbols=["$all"], callback=callback)
 
+    async def _watch(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        """Ping the server and look for stale streams every heartbeat"""
+        health = self.health
+        assert health and self._heartbeat
+        while not ws.closed:
+            await asyncio.sleep(self._heartbeat)
+            health.ping()
+            try:
+                await ws.ping()
+            except Exception as e:
+                log.error(f"Unable to ping WebSocket: {e!r}")
+            events = health.check(topic for topic, _ in self._subscriptions)
+            # Report a dead connection once, when it crosses the threshold
+            if health.missed_pongs == MAX_MISSED_PONGS:
+                events.append(
+                    {
+                        "stream": None,
+                        "silence": health.missed_pongs * self._heartbeat,
+                        "expected": self._heartbeat,
+                    }
+                )
+            for event in events:
+                log.warning(f"Stale WebSocket: {event}")
+                self._events.emit("stale", event)
+            if events and self._stale_reconnect:
+                await ws.close()
+                return
+
+    def health_check(self) -> Optional[dict]:
+        """The health score, round trip time and stale streams of our
+        connection, if `heartbeat` is enabled"""
+        if not self.health:
+            return None
+        return self.health.snapshot(topic for topic, _ in self._subscriptions)
+
     def keepalive(self) -> None:
         """Extend the connection time by another 30 minutes"""
         asyncio.ensure_future(self.send({"method": "keepAlive"}))
@@ -247,8 +989,14 @@ class WebSocket:
 
     def close(self) -> None:
         """Close the websocket session"""
+        self._closing = True
         asyncio.ensure_future(self.send({"method": "close"}))
-        if self._session:
+        if self._session and self._owns_session:
             asyncio.ensure_future(self._session.close())
+        elif self._ws:
+            asyncio.ensure_future(self._ws.close())
         if self._keepalive_task:
             self._keepalive_task.cancel()
+        for queued in self._queued.values():
+            queued.close()
+        self._queued.clear()
@@ -34,4 +34,5 @@ setup(
         "protobuf",
         "orjson",
     ],
+    extras_require={"numpy": ["numpy"]},
 )
@@ -0,0 +1,64 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+A local WebSocket server for the test suites
+"""
+import asyncio
+
+import aiohttp.web
+import orjson
+
+
+class LocalServer:
+    """A local WebSocket server that records the messages it receives"""
+
+    def __init__(self, handler=None):
+        self.received = []
+        self.connections = 0
+        self.sockets = []
+        self.handler = handler
+        self.runner = None
+
+    async def websocket(self, request):
+        ws = aiohttp.web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self.sockets.append(ws)
+        try:
+            if self.handler:
+                await self.handler(self, ws)
+            else:
+                async for msg in ws:
+                    self.received.append(orjson.loads(msg.data))
+        finally:
+            self.sockets.remove(ws)
+        return ws
+
+    async def push(self, msg):
+        """Send a message to every connected client"""
+        for ws in self.sockets:
+            await ws.send_str(orjson.dumps(msg).decode())
+
+    async def start(self, port=0):
+        app = aiohttp.web.Application()
+        app.router.add_get("/api/ws", self.websocket)
+        app.router.add_get("/api/ws/{address}", self.websocket)
+        self.runner = aiohttp.web.AppRunner(app)
+        await self.runner.setup()
+        site = aiohttp.web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/api/ws"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def until(predicate, timeout=5):
+    """Wait for `predicate()` to hold"""
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        if loop.time() > deadline:
+            raise asyncio.TimeoutError
+        await asyncio.sleep(0.005)
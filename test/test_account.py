@@ -0,0 +1,156 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Account State Test Suite
+"""
+import asyncio
+
+import pytest
+
+from binancechain import WebSocket
+from binancechain.account import AccountState, Balance
+from binancechain.orderbook import to_fixed
+from localserver import LocalServer, until
+
+ADDRESS = "tbnb1address"
+
+
+class FakeClient:
+    def __init__(self, *balances):
+        self.balances = list(balances)
+        self.calls = 0
+        self.release = None
+
+    async def get_account(self, address):
+        self.calls += 1
+        balances = self.balances
+        if self.release is not None:
+            await self.release.wait()
+        await asyncio.sleep(0)
+        return {
+            "account_number": 1,
+            "address": address,
+            "balances": [
+                {"symbol": asset, "free": free, "frozen": "0", "locked": locked}
+                for asset, free, locked in balances
+            ],
+            "sequence": 7,
+        }
+
+
+def update(*balances):
+    return {
+        "stream": "accounts",
+        "data": {
+            "e": "outboundAccountInfo",
+            "E": 1,
+            "B": [
+                {"a": asset, "f": free, "r": "0", "l": locked}
+                for asset, free, locked in balances
+            ],
+        },
+    }
+
+
+async def connect(server, account):
+    """Start `account` on a WebSocket of no address in particular"""
+    ws = WebSocket(url=await server.start())
+    task = asyncio.ensure_future(ws.start_async(on_open=account(ws).start))
+    await until(lambda: server.received)
+    return ws, task
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_and_updates():
+    server = LocalServer()
+    client = FakeClient(("BNB", "10.5", "1"), ("NNB-0AD", "100", "0"))
+    changes = []
+    accounts = []
+
+    def account(ws):
+        accounts.append(
+            AccountState(
+                client,
+                ws,
+                ADDRESS,
+                reconcile_interval=None,
+                on_update=lambda asset, balance: changes.append(asset),
+            )
+        )
+        return accounts[0]
+
+    ws, task = await connect(server, account)
+    [account] = accounts
+    await until(lambda: account.synced)
+    assert server.received == [
+        {"method": "subscribe", "topic": "accounts", "address": ADDRESS}
+    ]
+    assert account.sequence == 7
+    assert account["BNB"] == Balance(to_fixed("10.5"), 0, to_fixed("1"))
+    assert account["BNB"].total == to_fixed("11.5")
+    assert account.free("NNB-0AD") == to_fixed("100")
+    assert account.free("XYZ") == 0
+
+    await server.push(update(("BNB", "9.5", "2"), ("NNB-0AD", "0", "0")))
+    await until(lambda: "NNB-0AD" not in account)
+    assert account.free("BNB") == to_fixed("9.5")
+    assert account.locked("BNB") == to_fixed("2")
+    assert changes == ["BNB", "NNB-0AD", "BNB", "NNB-0AD"]
+
+    account.close()
+    await until(lambda: len(server.received) == 2)
+    assert server.received[1] == {"method": "unsubscribe", "topic": "accounts"}
+    # Closed accounts stop resyncing after gaps
+    calls = client.calls
+    ws._events.emit("gap", {"downtime": 1})
+    await asyncio.sleep(0.01)
+    assert client.calls == calls
+    ws.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_reconcile():
+    server = LocalServer()
+    client = FakeClient(("BNB", "10", "0"))
+    accounts = []
+
+    def account(ws):
+        accounts.append(AccountState(client, ws, ADDRESS, reconcile_interval=0.01))
+        return accounts[0]
+
+    ws, task = await connect(server, account)
+    [account] = accounts
+    await until(lambda: account.synced)
+    assert account.free("BNB") == to_fixed("10")
+
+    # Updates received while the account is being fetched are replayed on
+    # top of a possibly older snapshot
+    client.release = asyncio.Event()
+    resync = account.resync()
+    await asyncio.sleep(0)
+    await server.push(update(("BNB", "8", "0")))
+    await until(lambda: account.free("BNB") == to_fixed("8"))
+    client.release.set()
+    await resync
+    assert account.free("BNB") == to_fixed("8")
+    assert account.drift == 0
+    client.release = None
+
+    # Balances that changed without an update are corrected
+    client.balances = [("BNB", "7", "0")]
+    await until(lambda: account.free("BNB") == to_fixed("7"))
+    assert account.drift == 1
+    assert client.calls >= 3
+
+    account.reconcile_interval = None
+    ws._events.emit("gap", {"downtime": 1})
+    calls = client.calls
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert client.calls > calls
+    account.close()
+    ws.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
@@ -0,0 +1,62 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Trade Analytics Test Suite
+"""
+import pytest
+
+from binancechain.analytics import BUY, SELL, TradeAnalytics
+from binancechain.orderbook import to_fixed
+
+T = 1559742300000
+
+
+def test_rolling_windows():
+    analytics = TradeAnalytics(windows=(1, 10))
+    analytics.on_trades(
+        {
+            "stream": "trades",
+            "data": [
+                {"s": "A_BNB", "T": T * 10 ** 6, "p": "1", "q": "3", "tt": 2},
+                {"s": "A_BNB", "T": (T + 500) * 10 ** 6, "p": "2", "q": "1", "tt": 1},
+            ],
+        }
+    )
+    stats = analytics.stats("A_BNB", 10)
+    assert stats.trades == 2
+    assert stats.volume == to_fixed("4")
+    assert stats.buy_volume == to_fixed("3")
+    assert stats.sell_volume == to_fixed("1")
+    assert stats.vwap == to_fixed("1.25")
+
+    analytics.add("A_BNB", T + 1200, to_fixed("4"), to_fixed("1"), SELL)
+    stats = analytics.stats("A_BNB", 1)
+    assert (stats.trades, stats.vwap) == (2, to_fixed("3"))
+    assert analytics.stats("A_BNB", 10).trades == 3
+
+    stats = analytics.stats("A_BNB", 10, now=T + 10600)
+    assert (stats.trades, stats.volume, stats.vwap) == (1, to_fixed("1"), to_fixed("4"))
+    assert analytics.stats("A_BNB", 1).vwap is None
+    assert analytics.stats("B_BNB", 1) is None
+
+
+def test_buffer_grows():
+    analytics = TradeAnalytics(windows=(1, 3600))
+    for i in range(5000):
+        analytics.add("A_BNB", T + i, to_fixed("1"), to_fixed("1"), BUY)
+    rolling = analytics.symbols["A_BNB"]
+    assert len(rolling.times) == 8192
+    assert analytics.stats("A_BNB", 1).trades == 1000
+    assert analytics.stats("A_BNB", 3600).buy_volume == to_fixed("5000")
+
+
+def test_batch():
+    np = pytest.importorskip("numpy")
+    analytics = TradeAnalytics(windows=(60,))
+    analytics.add("A_BNB", T, to_fixed("2"), to_fixed("1"))
+    analytics.add("B_BNB", T, to_fixed("1"), to_fixed("1"))
+    batch = analytics.batch(60, now=T + 30000)
+    assert batch["symbols"] == ["A_BNB", "B_BNB"]
+    assert list(batch["vwap"]) == [2.0, 1.0]
+    batch = analytics.batch(60, now=T + 60000)
+    assert np.isnan(batch["vwap"]).all()
@@ -0,0 +1,86 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+WebSocket Dispatch Test Suite
+"""
+import asyncio
+
+import pytest
+
+from binancechain.dispatch import DispatchTable
+
+
+def trades(*symbols):
+    return {"stream": "trades", "data": [{"s": symbol} for symbol in symbols]}
+
+
+def test_symbol_routing():
+    table = DispatchTable()
+    a, b, every = [], [], []
+    table.add("trades", a.append, symbols=["A_BNB"])
+    table.add("trades", b.append, symbols=["B_BNB"])
+    table.add("trades", every.append, symbols=["$all"])
+
+    table.dispatch(trades("A_BNB"))
+    table.dispatch(trades("C_BNB"))
+    assert a == [trades("A_BNB")]
+    assert b == []
+    assert len(every) == 2
+
+    # Messages about several symbols are split up
+    table.dispatch(trades("A_BNB", "B_BNB", "A_BNB"))
+    assert a[-1] == trades("A_BNB", "A_BNB")
+    assert b == [trades("B_BNB")]
+    assert every[-1] == trades("A_BNB", "B_BNB", "A_BNB")
+
+
+def test_address_routing():
+    table = DispatchTable()
+    mine, anyone = [], []
+    table.add("accounts", mine.append, address="tbnb1")
+    table.add("accounts", anyone.append)
+    msg = {"stream": "accounts", "data": {}}
+    table.dispatch(msg, "tbnb1")
+    table.dispatch(msg, "tbnb2")
+    assert len(mine) == 1
+    assert len(anyone) == 2
+    # Without an address, there is no telling whose message it is
+    table.dispatch(msg)
+    assert len(mine) == 2
+    assert len(anyone) == 3
+
+
+def test_remove():
+    table = DispatchTable()
+    a, b = [], []
+    table.add("trades", a.append, symbols=["A_BNB", "B_BNB"])
+    table.add("trades", b.append, symbols=["B_BNB"])
+
+    table.remove("trades", symbols=["B_BNB"], handler=a.append)
+    table.dispatch(trades("B_BNB"))
+    assert a == [] and len(b) == 1
+
+    table.remove("trades")
+    assert "trades" not in table
+
+
+@pytest.mark.asyncio
+async def test_errors_and_coroutines():
+    errors, results = [], []
+    table = DispatchTable(on_error=errors.append)
+
+    def broken(msg):
+        raise ValueError(msg)
+
+    async def handler(msg):
+        results.append(msg)
+
+    async def broken_async(msg):
+        raise KeyError(msg)
+
+    for func in (broken, handler, broken_async):
+        table.add("trades", func)
+    table.dispatch(trades("A_BNB"))
+    await asyncio.sleep(0.01)
+    assert results == [trades("A_BNB")]
+    assert [type(e) for e in errors] == [ValueError, KeyError]
@@ -0,0 +1,126 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Handler Execution Test Suite
+"""
+import asyncio
+import threading
+
+import pytest
+
+from binancechain import WebSocket
+from binancechain.execution import (
+    ConcurrentHandler,
+    ShardedHandler,
+    ThreadedHandler,
+    execute,
+)
+
+
+def trade(symbol, n):
+    return {"stream": "trades", "data": [{"s": symbol, "t": n}]}
+
+
+@pytest.mark.asyncio
+async def test_sharded_handler_orders_each_symbol():
+    seen = {}
+    running = set()
+    overlapped = []
+
+    async def handler(msg):
+        symbol = msg["data"][0]["s"]
+        running.add(symbol)
+        if len(running) > 1:
+            overlapped.append(True)
+        await asyncio.sleep(0.001 * (msg["data"][0]["t"] % 3))
+        running.discard(symbol)
+        seen.setdefault(symbol, []).extend(p["t"] for p in msg["data"])
+
+    sharded = ShardedHandler(handler, workers=4)
+    symbols = ["NNB-0AD_BNB", "BTC.B-918_BNB", "ETH.B-261_BNB", "XRP.B-585_BNB"]
+    assert len({sharded.shard_for(symbol) for symbol in symbols}) > 1
+    for n in range(10):
+        # One message with a trade of every symbol, split up by symbol
+        sharded({"stream": "trades", "data": [{"s": s, "t": n} for s in symbols]})
+    assert sharded.depth == 40
+    assert sharded.max_depth == 40
+    while sharded.processed < 40:
+        await asyncio.sleep(0.01)
+    assert seen == {symbol: list(range(10)) for symbol in symbols}
+    assert overlapped
+    assert sharded.snapshot()["wait"]["count"] == 40
+    sharded.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_handler_limit():
+    running = []
+    peak = []
+
+    async def handler(msg):
+        running.append(msg)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(msg)
+
+    concurrent = ConcurrentHandler(handler, limit=3, maxsize=8, overflow="drop_newest")
+    for n in range(10):
+        concurrent(trade("A_BNB", n))
+    assert concurrent.dropped == 2
+    while concurrent.processed < 8:
+        await asyncio.sleep(0.01)
+    assert max(peak) == 3
+    concurrent.close()
+
+    with pytest.raises(ValueError):
+        ConcurrentHandler(handler, overflow="block")
+
+
+@pytest.mark.asyncio
+async def test_threaded_handler():
+    threads = []
+    errors = []
+
+    def handler(msg):
+        threads.append(threading.current_thread())
+        if msg["data"][0]["t"] == 1:
+            raise ValueError("boom")
+
+    threaded = execute(handler, "thread")
+    assert isinstance(threaded, ThreadedHandler)
+    threaded.on_error = errors.append
+    threaded(trade("A_BNB", 0))
+    threaded(trade("A_BNB", 1))
+    while threaded.processed < 2:
+        await asyncio.sleep(0.01)
+    assert threading.main_thread() not in threads
+    assert threaded.errors == 1
+    assert isinstance(errors[0], ValueError)
+    threaded.close()
+
+
+@pytest.mark.asyncio
+async def test_websocket_modes():
+    ws = WebSocket(testnet=True)
+    seen = []
+    queued = ws.subscribe("trades", ["A_BNB"], callback=seen.append, mode="sharded")
+    assert isinstance(queued, ShardedHandler)
+    # Subscribing the same handler again reuses its workers
+    assert (
+        ws.subscribe("trades", ["B_BNB"], callback=seen.append, mode="sharded")
+        is queued
+    )
+    await ws._handle(trade("A_BNB", 1))
+    assert seen == []
+    await asyncio.sleep(0.01)
+    assert seen == [trade("A_BNB", 1)]
+    queues = ws.handler_queues()
+    assert queues[0]["stream"] == "trades"
+    assert queues[0]["processed"] == 1
+
+    ws.unsubscribe("trades", callback=seen.append)
+    assert ws.handler_queues() == []
+    await ws._handle(trade("A_BNB", 2))
+    await asyncio.sleep(0.01)
+    assert len(seen) == 1
+    ws.close()
@@ -0,0 +1,113 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Shared Memory Fanout Test Suite
+"""
+import asyncio
+import multiprocessing
+
+import orjson
+import pytest
+
+from binancechain.fanout import FanoutPublisher, FanoutSubscriber
+
+
+def trades(*symbols, t=0):
+    return {"stream": "trades", "data": [{"s": symbol, "t": t} for symbol in symbols]}
+
+
+def test_filter_and_split(tmp_path):
+    path = str(tmp_path / "ring")
+    publisher = FanoutPublisher(path, capacity=4096)
+    everything = FanoutSubscriber(path)
+    filtered = FanoutSubscriber(path, streams=["trades"], symbols=["A_BNB"])
+
+    publisher.publish(trades("A_BNB", "B_BNB", "A_BNB"))
+    publisher.publish({"stream": "ticker", "data": {"s": "A_BNB", "c": "1"}})
+
+    assert [(stream, symbol) for stream, symbol, _ in everything.read()] == [
+        ("trades", "A_BNB"),
+        ("trades", "B_BNB"),
+        ("ticker", "A_BNB"),
+    ]
+    assert list(filtered.messages()) == [
+        {"stream": "trades", "data": [{"s": "A_BNB", "t": 0}, {"s": "A_BNB", "t": 0}]}
+    ]
+    assert list(filtered.read()) == []
+    assert [reader["lag"] for reader in publisher.readers()] == [0, 0]
+    everything.close()
+    filtered.close()
+    assert publisher.readers() == []
+    publisher.close()
+
+
+def test_wrap_and_slow_reader(tmp_path):
+    path = str(tmp_path / "ring")
+    publisher = FanoutPublisher(path, capacity=2048)
+    subscriber = FanoutSubscriber(path)
+
+    for t in range(20):
+        publisher.publish(trades("A_BNB", t=t))
+    assert [msg["data"][0]["t"] for msg in subscriber.messages()] == list(range(20))
+
+    for t in range(20, 80):
+        publisher.publish(trades("A_BNB", t=t))
+    [reader] = publisher.slow_readers()
+    assert reader["lapped"]
+
+    received = [msg["data"][0]["t"] for msg in subscriber.messages()]
+    assert subscriber.overruns == 1
+    assert subscriber.lost + len(received) == 60
+    assert received == list(range(80 - len(received), 80))
+    subscriber.close()
+    publisher.close()
+
+
+def test_position_while_reading(tmp_path):
+    path = str(tmp_path / "ring")
+    publisher = FanoutPublisher(path, capacity=4096)
+    subscriber = FanoutSubscriber(path)
+    for t in range(4):
+        publisher.publish(trades("A_BNB", t=t))
+    total = publisher.readers()[0]["lag"]
+
+    # The publisher sees how far we got, even before we stop reading
+    messages = subscriber.messages()
+    next(messages)
+    [reader] = publisher.readers()
+    assert reader["lag"] == total * 3 // 4
+    next(messages)
+    messages.close()
+    [reader] = publisher.readers()
+    assert reader["lag"] == total // 2
+    assert subscriber.lag == total // 2
+    subscriber.close()
+    publisher.close()
+
+
+def subscribe(path, ready, results):
+    async def main():
+        subscriber = FanoutSubscriber(path, symbols=["B_BNB"])
+        ready.set()
+        async for msg in subscriber:
+            results.put(msg["data"][0]["t"])
+            if msg["data"][0]["t"] == 9:
+                break
+        subscriber.close()
+
+    asyncio.new_event_loop().run_until_complete(main())
+
+
+def test_subscriber_process(tmp_path):
+    path = str(tmp_path / "ring")
+    publisher = FanoutPublisher(path)
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Event(), context.Queue()
+    process = context.Process(target=subscribe, args=(path, ready, results))
+    process.start()
+    assert ready.wait(30)
+    for t in range(10):
+        publisher.publish(trades("A_BNB", "B_BNB", t=t))
+    process.join(30)
+    assert [results.get() for _ in range(10)] == list(range(10))
+    publisher.close()
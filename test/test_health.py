@@ -0,0 +1,36 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Connection Health Test Suite
+"""
+import time
+
+from binancechain.health import ConnectionHealth
+
+
+def test_health_score():
+    health = ConnectionHealth(tolerance=1, max_rtt=0.5, cadences={"ticker": 0.01})
+    assert health.cadence("kline_1h") == 1.0
+    assert health.cadence("trades") is None
+    streams = ["ticker", "kline_1m", "trades"]
+    assert health.score(streams) == 1
+
+    time.sleep(0.02)
+    assert [event["stream"] for event in health.check(streams)] == ["ticker"]
+    assert health.check(streams) == []
+    assert health.score(streams) == 0.5
+
+    health.seen("ticker")
+    health.check(streams)
+    assert health.stale == set()
+
+    health.ping()
+    health._ping_sent -= 1  # a slow round trip
+    health.pong()
+    assert health.score(streams) == 0.5 / health.rtt
+
+    health.ping()
+    health.ping()
+    health.ping()
+    assert health.dead
+    assert health.score(streams) == 0
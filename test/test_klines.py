@@ -0,0 +1,120 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Kline Aggregator Test Suite
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from binancechain.klines import MINUTE, KlineAggregator, bucket, to_millis
+from binancechain.orderbook import to_fixed
+
+
+def ms(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp()) * 1000
+
+
+def trade(symbol, time, price, quantity):
+    return {"s": symbol, "T": time * 1000000, "p": price, "q": quantity}
+
+
+def test_bucket():
+    t = ms(2019, 6, 5, 13, 47, 12)
+    assert bucket("1m", t) == (ms(2019, 6, 5, 13, 47), ms(2019, 6, 5, 13, 48) - 1)
+    assert bucket("15m", t)[0] == ms(2019, 6, 5, 13, 45)
+    assert bucket("4h", t)[0] == ms(2019, 6, 5, 12)
+    assert bucket("1w", t) == (ms(2019, 6, 3), ms(2019, 6, 10) - 1)
+    assert bucket("1M", t) == (ms(2019, 6, 1), ms(2019, 7, 1) - 1)
+    assert bucket("1M", ms(2019, 12, 31)) == (ms(2019, 12, 1), ms(2020, 1, 1) - 1)
+
+
+def test_to_millis():
+    t = ms(2019, 6, 5)
+    assert to_millis(t // 1000) == t
+    assert to_millis(t) == t
+    assert to_millis(t * 1000) == t
+    assert to_millis(t * 1000000) == t
+
+
+def test_aggregate_trades():
+    closed = []
+    klines = KlineAggregator(["1m", "5m"], on_close=closed.append)
+    t = ms(2019, 6, 5, 13, 47)
+    klines.on_trades(
+        {
+            "stream": "trades",
+            "data": [
+                trade("A_BNB", t + 1000, "1.5", "2"),
+                trade("A_BNB", t + 2000, "2.0", "1"),
+                trade("A_BNB", t + 3000, "1.0", "1"),
+            ],
+        }
+    )
+    bar = klines.bar("A_BNB", "1m")
+    assert bar.open_time == t
+    assert (bar.open, bar.high, bar.low, bar.close) == tuple(
+        map(to_fixed, ("1.5", "2", "1", "1"))
+    )
+    assert bar.volume == to_fixed("4")
+    assert bar.quote_volume == to_fixed("6")
+    assert bar.trades == 3
+    assert not closed
+
+    klines.on_trades(
+        {"stream": "trades", "data": [trade("A_BNB", t + MINUTE, "3", "1")]}
+    )
+    assert [(k.interval, k.closed, k.trades) for k in closed] == [("1m", True, 3)]
+    assert klines.bar("A_BNB", "5m").trades == 4
+
+    klines.on_trades({"stream": "trades", "data": [trade("A_BNB", t, "9", "1")]})
+    assert klines.late == 1
+    # Out of order trades still count towards bars they belong to
+    bar = klines.bar("A_BNB", "5m")
+    assert bar.high == to_fixed("9")
+    assert bar.close == to_fixed("3")
+
+    expired = klines.close_expired(t + 10 * MINUTE)
+    assert [k.interval for k in expired] == ["1m", "5m"]
+    assert klines.bar("A_BNB", "5m") is None
+
+
+def test_aggregate_klines():
+    closed = []
+    klines = KlineAggregator(["5m"], on_close=closed.append)
+    t = ms(2019, 6, 5, 13, 45)
+
+    def kline(start, close, closed=False):
+        k = {"s": "A_BNB", "t": start, "o": "1", "h": close, "l": "1", "c": close}
+        k.update(v="1", q="1", n=1, x=closed)
+        return {"stream": "kline_1m", "data": {"k": k}}
+
+    klines.on_kline(kline(t, "2"))
+    assert klines.bar("A_BNB", "5m") is None
+    klines.on_kline(kline(t, "3", closed=True))
+    klines.on_kline(kline(t + MINUTE, "4"))
+    # The next bar starting stands in for a missed close
+    klines.on_kline(kline(t + 5 * MINUTE, "5"))
+    assert klines.bar("A_BNB", "5m").high == to_fixed("4")
+    klines.on_kline(kline(t + 5 * MINUTE, "5", closed=True))
+    assert len(closed) == 1
+    assert closed[0].trades == 2
+    assert closed[0].close == to_fixed("4")
+
+
+def test_unknown_interval():
+    with pytest.raises(ValueError):
+        KlineAggregator(["2m"])
+
+
+def test_large_volumes():
+    klines = KlineAggregator(["1m", "1M"])
+    start = ms(2019, 6, 1)
+    data = [trade("BTC.B-918_BNB", start + i, "90000000", "1000000") for i in range(3)]
+    klines.on_trades({"stream": "trades", "data": data})
+
+    bar = klines.bar("BTC.B-918_BNB", "1M")
+    # Quote volumes outgrow 64-bit integers
+    assert bar.quote_volume == 3 * to_fixed("90000000000000")
+    assert bar.quote_volume > 2 ** 63
+    assert bar.volume == to_fixed("3000000")
@@ -0,0 +1,87 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Latency Instrumentation Test Suite
+"""
+import asyncio
+import time
+
+import orjson
+import pytest
+
+from binancechain.latency import LatencyMonitor, event_time, parse_time
+from binancechain.recorder import Recorder
+from binancechain.replay import ReplayWebSocket
+
+T = 1559742300
+
+
+def test_parse_time():
+    assert parse_time("2019-06-05T13:45:00Z") == T
+    assert parse_time("2019-06-05T13:45:00.250000000Z") == T + 0.25
+
+
+def test_event_time():
+    def msg(**data):
+        return {"stream": "x", "data": data}
+
+    assert event_time(msg(T=T * 10 ** 9)) == T
+    assert event_time(msg(E=T)) == T
+    assert event_time(msg(E=T * 1000)) == T
+    assert event_time({"stream": "trades", "data": [{"E": 1234, "T": T}]}) == T
+    assert event_time(msg(E=1234)) is None
+    assert event_time(msg(h=1234)) is None
+
+
+class FakeClient:
+    def __init__(self, offset):
+        self.offset = offset
+
+    async def get_time(self):
+        await asyncio.sleep(0.001)
+        now = time.gmtime(time.time() + self.offset)
+        return {"ap_time": time.strftime("%Y-%m-%dT%H:%M:%S.500Z", now)}
+
+
+@pytest.mark.asyncio
+async def test_sync_clock():
+    monitor = LatencyMonitor()
+    offset = await monitor.sync_clock(FakeClient(-100))
+    assert -101 < offset < -99
+    assert monitor.offset_rtt < 0.5
+
+
+@pytest.mark.asyncio
+async def test_monitor_replay(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    for i in range(10):
+        trade = {"s": "A_BNB", "E": 1234, "T": (T + i) * 10 ** 9}
+        frame = orjson.dumps({"stream": "trades", "data": [trade]}).decode()
+        recorder.record_frame(frame, received=T + i + 0.2)
+    recorder.close()
+
+    ws = ReplayWebSocket(str(tmp_path))
+    monitor = LatencyMonitor()
+    monitor.attach(ws)
+
+    def fast(msg):
+        pass
+
+    async def slow(msg):
+        await asyncio.sleep(0.01)
+
+    ws.subscribe_trades(["A_BNB"], callback=fast)
+    ws.subscribe_trades(["A_BNB"], callback=slow)
+    await ws.start_async()
+    await asyncio.sleep(0.05)
+
+    stats = monitor.streams["trades"]
+    assert stats.messages == 10
+    assert stats.lag.count == 10
+    assert 0.19 < stats.lag.mean < 0.21
+    assert stats.processing.count == 10
+    slowest = monitor.slowest_handlers()
+    assert [h["handler"] for h in slowest][0].endswith("slow")
+    assert slowest[0]["count"] == 10
+    assert 'binancechain_ws_lag_seconds_count{stream="trades"} 10' in monitor.export()
+    assert 'binancechain_ws_messages_total{stream="trades"} 10' in monitor.export()
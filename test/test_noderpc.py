@@ -3,10 +3,16 @@
 """
 Binance Chain Node RPC Test Suite
 """
-import pytest
+import asyncio
+import random
+
 import aiohttp
+import aiohttp.web
+import orjson
+import pytest
 
 from binancechain import NodeRPC, BinanceChainException
+from binancechain.rpccache import RPCCache
 
 
 @pytest.fixture
@@ -269,3 +275,223 @@ async def test_ws_unsubscribe_all(noderpc):
     assert result_ids == ['0', '1']
     for result in results:
         assert result['result'] == {}
+
+
+class LocalNode:
+    """A local JSON-RPC server that answers `block` calls with their height,
+    and records the calls of each request it receives"""
+
+    def __init__(self, failures=None, delay=0, latest=10 ** 6):
+        self.requests = []
+        self.statuses = 0
+        self.latest = latest
+        self.runner = None
+        # The number of times to fail each height
+        self.failures = dict(failures or {})
+        self.delay = delay
+
+    def respond(self, call):
+        height = call["params"][0]
+        response = {"jsonrpc": "2.0", "id": call["id"]}
+        if self.failures.get(height):
+            self.failures[height] -= 1
+            response["error"] = {"code": -32603, "message": "Internal error"}
+        elif call["method"] == "block_results":
+            response["result"] = {"height": str(height), "results": {}}
+        elif call["method"] == "commit":
+            canonical = height is not None and int(height) < self.latest
+            response["result"] = {"signed_header": {}, "canonical": canonical}
+        elif call["method"] == "block_by_hash":
+            header = {"height": "5"}
+            response["result"] = {"block": {"header": header}}
+        else:
+            response["result"] = {"block": {"header": {"height": str(height)}}}
+        return response
+
+    async def handle(self, request):
+        payload = orjson.loads(await request.read())
+        calls = payload if isinstance(payload, list) else [payload]
+        self.requests.append(calls)
+        if self.delay:
+            await asyncio.sleep(random.random() * self.delay)
+        responses = [self.respond(call) for call in calls]
+        if not isinstance(payload, list):
+            return aiohttp.web.json_response(responses[0], dumps=orjson_dumps)
+        # Responses to a batch may come back in any order
+        return aiohttp.web.json_response(responses[::-1], dumps=orjson_dumps)
+
+    async def status(self, request):
+        self.statuses += 1
+        sync_info = {"latest_block_height": str(self.latest)}
+        return aiohttp.web.json_response(
+            {"jsonrpc": "2.0", "id": "", "result": {"sync_info": sync_info}}
+        )
+
+    async def start(self):
+        app = aiohttp.web.Application()
+        app.router.add_post("/", self.handle)
+        app.router.add_get("/status", self.status)
+        self.runner = aiohttp.web.AppRunner(app)
+        await self.runner.setup()
+        site = aiohttp.web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def orjson_dumps(data):
+    return orjson.dumps(data).decode()
+
+
+@pytest.mark.asyncio
+async def test_batched_requests():
+    node = LocalNode()
+    url = await node.start()
+    rpc = NodeRPC(url=url, batch_size=40)
+    blocks = await asyncio.gather(*(rpc.block(height) for height in range(100)))
+    heights = [int(block["result"]["block"]["header"]["height"]) for block in blocks]
+    assert heights == list(range(100))
+    # Calls made together are sent in batches of up to 40
+    assert [len(calls) for calls in node.requests] == [40, 40, 20]
+    rpc.close()
+
+    # Without an interval, partial batches wait for a flush
+    rpc = NodeRPC(url=url, batch_size=40, batch_interval=None)
+    pending = asyncio.ensure_future(
+        asyncio.gather(rpc.block(1), rpc.commit(1), rpc.block_results(1))
+    )
+    await asyncio.sleep(0.01)
+    assert not pending.done()
+    await rpc.flush()
+    block, commit, results = await pending
+    assert block["id"] != commit["id"] != results["id"]
+    assert len(node.requests[-1]) == 3
+    await node.stop()
+    rpc.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_failure():
+    node = LocalNode()
+    url = await node.start()
+    rpc = NodeRPC(url=url + "missing", batch_size=10)
+    with pytest.raises(BinanceChainException) as error:
+        await asyncio.gather(rpc.block(1), rpc.block(2))
+    assert error.value.response.status == 404
+    await node.stop()
+    rpc.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_error():
+    async def parse_error(request):
+        error = {"code": -32700, "message": "Parse error"}
+        return aiohttp.web.json_response({"jsonrpc": "2.0", "id": "", "error": error})
+
+    app = aiohttp.web.Application()
+    app.router.add_post("/", parse_error)
+    runner = aiohttp.web.AppRunner(app)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    rpc = NodeRPC(url=f"http://127.0.0.1:{port}/", batch_size=10)
+
+    results = await asyncio.gather(rpc.block(1), rpc.block(2), return_exceptions=True)
+    assert all(isinstance(result, BinanceChainException) for result in results)
+    assert results[0].response["error"]["code"] == -32700
+    await runner.cleanup()
+    rpc.close()
+
+
+@pytest.mark.asyncio
+async def test_iter_blocks():
+    nodes = [LocalNode(failures={5: 2, 9: 1}, delay=0.005) for _ in range(2)]
+    urls = [await node.start() for node in nodes]
+    rpcs = [NodeRPC(url=url) for url in urls]
+
+    heights = []
+    async for height, block, results in rpcs[0].iter_blocks(
+        1,
+        60,
+        concurrency=4,
+        block_results=True,
+        nodes=rpcs,
+        retry_delay=0.001,
+        window=8,
+    ):
+        assert block["result"]["block"]["header"]["height"] == str(height)
+        assert results["result"]["height"] == str(height)
+        fetched = [
+            call["params"][0]
+            for node in nodes
+            for calls in node.requests
+            for call in calls
+        ]
+        # Nothing more than `window` heights ahead was fetched
+        assert max(fetched) < height + 8
+        heights.append(height)
+        await asyncio.sleep(0.001)
+    assert heights == list(range(1, 61))
+    # Requests were spread across both nodes
+    assert all(node.requests for node in nodes)
+
+    # Heights that keep failing are raised, after the ones before them
+    nodes[0].failures = {3: 10}
+    nodes[1].failures = {3: 10}
+    heights = []
+    with pytest.raises(BinanceChainException):
+        async for height, _, _ in rpcs[0].iter_blocks(
+            1, 10, nodes=rpcs, retries=2, retry_delay=0.001
+        ):
+            heights.append(height)
+    assert heights == [1, 2]
+
+    for node, rpc in zip(nodes, rpcs):
+        await node.stop()
+        rpc.close()
+
+
+@pytest.mark.asyncio
+async def test_cached_requests(tmp_path):
+    path = str(tmp_path / "blocks.cache")
+    node = LocalNode(latest=20)
+    url = await node.start()
+    noderpc = NodeRPC(url=url, cache=RPCCache(path))
+
+    for height in range(1, 21):
+        await noderpc.block(height)
+        await noderpc.commit(str(height))
+    await noderpc.validators(10)
+    await noderpc.block_by_hash("abcd")
+    await noderpc.block()
+    await noderpc.block_results(5)
+    await noderpc.block_results(5)
+    # The latest height was fetched for the first height, and again for the
+    # tip, which wasn't cached
+    assert node.statuses == 2
+    assert len(noderpc.cache) == 19 * 2 + 3
+    assert ("block:20" in noderpc.cache) is False
+    noderpc.cache.close()
+    noderpc.close()
+
+    # Running over the same range again costs no calls for final heights
+    node.requests.clear()
+    noderpc = NodeRPC(url=url, cache=RPCCache(path))
+    for height in range(1, 20):
+        block = await noderpc.block(str(height))
+        assert block["result"]["block"]["header"]["height"] == str(height)
+        commit = await noderpc.commit(height)
+        assert commit["result"]["canonical"]
+    await noderpc.validators("10")
+    await noderpc.block_by_hash("ABCD")
+    assert node.requests == []
+    await noderpc.block(20)
+    await noderpc.block(None)
+    assert len(node.requests) == 2
+    noderpc.cache.close()
+    noderpc.close()
+    await node.stop()
@@ -0,0 +1,172 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Local Order Book Test Suite
+"""
+import asyncio
+import random
+
+import pytest
+
+from binancechain.orderbook import (
+    BookSide,
+    OrderBook,
+    OrderBookManager,
+    from_fixed,
+    to_fixed,
+)
+
+
+class FakeClient:
+    def __init__(self, depth):
+        self.depth = depth
+        self.calls = 0
+        self.failures = 0
+
+    async def get_depth(self, symbol, limit=100):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError
+        return self.depth
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, func):
+        self.handlers[event] = func
+
+    def subscribe_market_diff(self, symbols, callback):
+        self.handlers["marketDiff"] = callback
+
+
+def diff(E, bids=(), asks=(), symbol="NNB-0AD_BNB", **extra):
+    return {
+        "stream": "marketDiff",
+        "data": dict(
+            e="depthUpdate", E=E, s=symbol, b=list(bids), a=list(asks), **extra
+        ),
+    }
+
+
+def test_fixed_point():
+    assert to_fixed("0.00012345") == 12345
+    assert to_fixed("12") == 12 * 10**8
+    assert to_fixed("1.50000000") == 150000000
+    assert from_fixed(150000000) == "1.50000000"
+    with pytest.raises(ValueError):
+        to_fixed("0.000000001")
+
+
+def test_book_updates():
+    book = OrderBook("NNB-0AD_BNB")
+    book.apply_snapshot(
+        {
+            "bids": [["0.0024", "10"], ["0.0023", "5"]],
+            "asks": [["0.0026", "100"], ["0.0027", "1"]],
+            "height": 100,
+        }
+    )
+    assert book.best_bid == (to_fixed("0.0024"), to_fixed("10"))
+    assert book.best_ask == (to_fixed("0.0026"), to_fixed("100"))
+
+    assert book.apply_diff(
+        diff(1, bids=[["0.0025", "1"]], asks=[["0.0026", "0"]])["data"]
+    )
+    assert book.best_bid == (to_fixed("0.0025"), to_fixed("1"))
+    assert book.best_ask == (to_fixed("0.0027"), to_fixed("1"))
+    assert book.depth(2)["bids"] == [
+        (to_fixed("0.0025"), to_fixed("1")),
+        (to_fixed("0.0024"), to_fixed("10")),
+    ]
+
+    # Out of order events are reported
+    assert not book.apply_diff(diff(0)["data"])
+    # So are crossed books
+    assert not book.apply_diff(diff(2, bids=[["0.0028", "1"]])["data"])
+
+
+def test_update_id_gaps():
+    book = OrderBook("NNB-0AD_BNB")
+    book.apply_snapshot({"bids": [], "asks": [], "lastUpdateId": 10})
+    assert book.apply_diff(diff(1, U=5, u=10)["data"])
+    assert book.apply_diff(diff(2, U=9, u=12, bids=[["1", "1"]])["data"])
+    assert book.best_bid == (to_fixed("1"), to_fixed("1"))
+    assert not book.apply_diff(diff(3, U=14, u=15)["data"])
+
+
+@pytest.mark.asyncio
+async def test_manager_buffers_and_resyncs():
+    client = FakeClient({"bids": [["0.0024", "10"]], "asks": [["0.0026", "1"]]})
+    ws = FakeWebSocket()
+    updates = []
+    manager = OrderBookManager(client, ws, ["NNB-0AD_BNB"], on_update=updates.append)
+    manager.start()
+
+    # Diffs that arrive before the snapshot are buffered, then applied
+    ws.handlers["marketDiff"](diff(1, bids=[["0.0025", "2"]]))
+    await asyncio.sleep(0.01)
+    book = manager["NNB-0AD_BNB"]
+    assert book.synced
+    assert book.best_bid == (to_fixed("0.0025"), to_fixed("2"))
+    assert client.calls == 1
+
+    # An out-of-order update triggers a fresh snapshot
+    ws.handlers["marketDiff"](diff(3))
+    ws.handlers["marketDiff"](diff(2))
+    await asyncio.sleep(0.01)
+    assert client.calls == 2
+
+    ws.handlers["gap"]({"downtime": 1})
+    await asyncio.sleep(0.01)
+    assert client.calls == 3
+    assert manager.resyncs == 3
+    assert updates
+
+
+@pytest.mark.asyncio
+async def test_manager_drops_full_buffers():
+    client = FakeClient({"bids": [["0.0024", "10"]], "asks": [["0.0026", "1"]]})
+    client.failures = 2
+    ws = FakeWebSocket()
+    manager = OrderBookManager(
+        client, ws, ["NNB-0AD_BNB"], retry_delay=0.01, max_buffer=3
+    )
+    manager.start()
+
+    # Diffs pile up while snapshots keep failing, up to a point
+    for n in range(1, 6):
+        ws.handlers["marketDiff"](diff(n, bids=[[f"0.002{n}", "1"]]))
+    assert len(manager._buffers["NNB-0AD_BNB"]) == 1
+    await asyncio.sleep(0.1)
+    book = manager["NNB-0AD_BNB"]
+    assert book.synced
+    assert client.calls == 3
+    # Only the diffs buffered since the drop were applied
+    assert book.depth(5)["bids"] == [
+        (to_fixed("0.0025"), to_fixed("1")),
+        (to_fixed("0.0024"), to_fixed("10")),
+    ]
+
+
+def test_book_side_churn():
+    rng = random.Random(0)
+    for descending in (True, False):
+        side = BookSide(descending)
+        expected = {}
+        for i in range(5000):
+            price, quantity = rng.randint(1, 300), rng.choice([0, 0, 1, 2])
+            side.update(price, quantity)
+            if quantity:
+                expected[price] = quantity
+            else:
+                expected.pop(price, None)
+            levels = sorted(expected.items(), reverse=descending)
+            assert side.best() == (levels[0] if levels else None)
+            if i % 100 == 0:
+                assert side.top(10) == levels[:10]
+        # Removed levels don't pile up in the heap
+        assert len(side.heap) <= 2 * len(side) + 64
@@ -0,0 +1,160 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Order Index Test Suite
+"""
+
+import asyncio
+
+import pytest
+
+from binancechain import WebSocket
+from binancechain.orderbook import to_fixed
+from binancechain.orders import OrderIndex
+from localserver import LocalServer, until
+
+ADDRESS = "tbnb1address"
+SYMBOL = "NNB-0AD_BNB"
+
+
+def rest_order(id, side=1, quantity="10", filled="0", status="Ack"):
+    return {
+        "orderId": id,
+        "symbol": SYMBOL,
+        "side": side,
+        "price": "0.0025",
+        "quantity": quantity,
+        "cumulateQuantity": filled,
+        "status": status,
+    }
+
+
+def report(id, status, filled, side=1, quantity="10"):
+    return {
+        "e": "executionReport",
+        "E": 100,
+        "s": SYMBOL,
+        "S": side,
+        "o": 2,
+        "f": 1,
+        "q": quantity,
+        "p": "0.0025",
+        "x": "TRADE" if filled != "0" else "NEW",
+        "X": status,
+        "i": id,
+        "l": "1",
+        "z": filled,
+        "L": "0.0025",
+        "n": "",
+        "T": 1,
+        "t": "",
+        "O": 1,
+    }
+
+
+class FakeClient:
+    def __init__(self, orders, closed=()):
+        self.orders = orders
+        self.closed = {order["orderId"]: order for order in closed}
+        self.pages = 0
+
+    async def get_open_orders(self, address, limit=None, offset=0, total=None):
+        self.pages += 1
+        await asyncio.sleep(0)
+        return {
+            "order": self.orders[offset : offset + limit],
+            "total": len(self.orders),
+        }
+
+    async def get_order(self, id):
+        return self.closed[id]
+
+
+def orders_msg(*reports):
+    return {"stream": "orders", "data": list(reports)}
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_and_fills():
+    client = FakeClient(
+        [rest_order(f"A-{n}") for n in range(5)] + [rest_order("B-1", 2)]
+    )
+    server = LocalServer()
+    ws = WebSocket(url=await server.start())
+    index = OrderIndex(client, ws, ADDRESS, reconcile_interval=None, page_size=2)
+    task = asyncio.ensure_future(ws.start_async(on_open=index.start))
+    await until(lambda: index.synced and server.received)
+    assert server.received == [
+        {"method": "subscribe", "topic": "orders", "address": ADDRESS}
+    ]
+    assert client.pages == 3
+    assert len(index) == 6
+    assert len(index.open_orders(SYMBOL, side=1)) == 5
+    assert [order.id for order in index.open_orders(side=2)] == ["B-1"]
+    assert index.open_orders("XYZ_BNB") == []
+
+    filled = index.wait("A-0")
+    partial = index.wait("A-0", statuses=["PartialFill"])
+    await server.push(orders_msg(report("A-0", "PartialFill", "4")))
+    order = await asyncio.wait_for(partial, 5)
+    assert order.filled == to_fixed("4")
+    assert order.remaining == to_fixed("6")
+    assert not filled.done()
+
+    # Stale reports don't roll back fills
+    await server.push(orders_msg(report("A-0", "Ack", "0")))
+    await server.push(orders_msg(report("A-0", "FullyFill", "10")))
+    order = await asyncio.wait_for(filled, 5)
+    assert order.status == "FullyFill"
+    assert "A-0" not in index
+    assert index.get("A-0") is order
+    assert len(index.open_orders(SYMBOL, side=1)) == 4
+
+    # Waiting on a closed order resolves immediately
+    assert (await index.wait("A-0")) is order
+
+    # New orders are picked up from the stream
+    await server.push(orders_msg(report("C-1", "Ack", "0", side=2)))
+    await until(lambda: len(index.open_orders(side=2)) == 2)
+
+    index.close()
+    await until(lambda: len(server.received) == 2)
+    assert server.received[1] == {"method": "unsubscribe", "topic": "orders"}
+    # Closed indexes stop refetching after gaps
+    pages = client.pages
+    ws._events.emit("gap", {"downtime": 1})
+    await asyncio.sleep(0.01)
+    assert client.pages == pages
+    ws.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_resync_finds_vanished_orders():
+    client = FakeClient(
+        [rest_order("A-1"), rest_order("A-2")],
+        closed=[rest_order("A-2", filled="3", status="Canceled")],
+    )
+    server = LocalServer()
+    ws = WebSocket(url=await server.start())
+    updates = []
+    index = OrderIndex(
+        client, ws, ADDRESS, reconcile_interval=None, on_update=updates.append
+    )
+    task = asyncio.ensure_future(ws.start_async(on_open=index.start))
+    await until(lambda: index.synced)
+    assert [order.id for order in updates] == ["A-1", "A-2"]
+
+    cancelled = index.wait("A-2")
+    client.orders = [rest_order("A-1", filled="1", status="PartialFill")]
+    ws._events.emit("gap", {"downtime": 1})
+    order = await asyncio.wait_for(cancelled, 1)
+    assert order.status == "Canceled"
+    assert order.filled == to_fixed("3")
+    assert index.get("A-1").status == "PartialFill"
+    assert [order.id for order in index.open_orders()] == ["A-1"]
+    index.close()
+    ws.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
@@ -2,6 +2,8 @@ import asyncio
 import pytest
 
 from binancechain import HTTPClient
+from binancechain.httpclient import is_rate_limited
+from binancechain.ratelimit import RateLimiter
 
 
 @pytest.mark.asyncio
@@ -24,3 +26,62 @@ async def test_ratelimiter():
         assert 'block_time' in result
 
     await client.close()
+
+
+@pytest.mark.asyncio
+async def test_adaptive_backoff_and_probe():
+    limiter = RateLimiter(adaptive=True, max_scale=2.0)
+    await limiter.limit("depth", 10)
+    assert limiter.rate("depth") == 10
+
+    limiter.feedback("depth", True)
+    assert limiter.rate("depth") == 5
+    assert limiter.backoffs[-1].namespace == "depth"
+    assert limiter.backoffs[-1].old_rate == 10
+
+    # Further limited responses within the same period don't cascade
+    limiter.feedback("depth", True)
+    assert limiter.rate("depth") == 5
+    assert len(limiter.backoffs) == 1
+    assert limiter.metrics()["depth"]["backoffs"] == 1
+
+    for _ in range(100):
+        limiter.feedback("depth", False)
+    assert 5 < limiter.rate("depth") <= 20
+    for _ in range(10000):
+        limiter.feedback("depth", False)
+    assert limiter.rates == {"depth": 20}
+    limiter.close()
+
+
+def test_is_rate_limited():
+    assert is_rate_limited(429, None)
+    assert is_rate_limited(200, {"message": "API rate limit exceeded"})
+    assert not is_rate_limited(200, {"block_time": "..."})
+    assert not is_rate_limited(200, [])
+
+
+@pytest.mark.asyncio
+async def test_metrics():
+    limiter = RateLimiter(period=0.05)
+    for _ in range(3):
+        await limiter.limit("time", 2)
+    metrics = limiter.metrics()["time"]
+    assert metrics["tokens_granted"] == 3
+    assert metrics["waiters"] == 0
+    assert metrics["wait_seconds"].count == 3
+    # The third token had to wait for a refill
+    assert metrics["wait_seconds"].max > 0.01
+
+    # Refilling a full bucket wastes tokens
+    bucket = limiter.buckets["time"]
+    for _ in range(100):
+        limiter._refill(bucket)
+    assert limiter.metrics()["time"]["tokens_wasted"] > 0
+    assert limiter.snapshot()["time"]["wait_seconds"]["count"] == 3
+    exported = limiter.export()
+    assert 'binancechain_ratelimit_tokens_granted_total{namespace="time"} 3' in exported
+    assert "# TYPE binancechain_ratelimit_tokens_wasted_total counter" in exported
+    assert "# TYPE binancechain_ratelimit_rate gauge" in exported
+    assert 'binancechain_ratelimit_wait_seconds_count{namespace="time"} 3' in exported
+    limiter.close()
@@ -0,0 +1,49 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Market Data Recorder Test Suite
+"""
+import os
+
+import orjson
+import pytest
+
+from binancechain.recorder import Recorder, read_index, read_segment, segments
+
+
+def frame(i):
+    return orjson.dumps({"stream": "trades", "data": [{"s": "A_BNB", "t": i}]}).decode()
+
+
+def test_record_and_read(tmp_path):
+    recorder = Recorder(str(tmp_path), chunk_size=1024)
+    for i in range(100):
+        recorder.record_frame(frame(i), received=1000 + i)
+    recorder.record("depth:A_BNB", orjson.dumps({"bids": [], "asks": []}), 2000)
+    recorder.close()
+
+    [path] = segments(str(tmp_path))
+    index = read_index(path)
+    assert len(index) > 1
+    assert index[0].first == 1000 * 10 ** 9
+    assert index[-1].last == 2000 * 10 ** 9
+    assert sum(entry.count for entry in index) == 101
+
+    records = list(read_segment(path))
+    assert [r.payload.decode() for r in records[:100]] == [frame(i) for i in range(100)]
+    assert records[-1].kind == "depth:A_BNB"
+    assert recorder.bytes_written < sum(len(frame(i)) for i in range(100))
+
+    # The index can be rebuilt from the segment itself
+    os.remove(path + ".idx")
+    assert read_index(path) == index
+
+
+def test_rotation(tmp_path):
+    recorder = Recorder(str(tmp_path), chunk_size=1, max_bytes=1)
+    recorder.record_frame(frame(0))
+    recorder.record_frame(frame(1))
+    recorder.close()
+    paths = segments(str(tmp_path))
+    assert len(paths) == 2
+    assert [len(list(read_segment(path))) for path in paths] == [1, 1]
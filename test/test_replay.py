@@ -0,0 +1,64 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Market Data Replay Test Suite
+"""
+import time
+
+import orjson
+import pytest
+
+from binancechain.recorder import Recorder
+from binancechain.replay import ReplayWebSocket, replay_records
+
+
+def record(directory):
+    recorder = Recorder(str(directory), chunk_size=512)
+    for i in range(200):
+        symbol = "A_BNB" if i % 2 else "B_BNB"
+        frame = {"stream": "trades", "data": [{"s": symbol, "t": i}]}
+        recorder.record_frame(orjson.dumps(frame).decode(), received=1000 + i / 100)
+    recorder.record("depth:A_BNB", orjson.dumps({"height": 1}), 1002)
+    recorder.close()
+
+
+def test_replay_records_seeks(tmp_path):
+    record(tmp_path)
+    records = list(replay_records(str(tmp_path), start=1001, end=1001.5))
+    assert len(records) == 51
+    assert records[0].time == 1001 * 10 ** 9
+    assert list(replay_records(str(tmp_path), start=2000)) == []
+
+
+@pytest.mark.asyncio
+async def test_replay_websocket(tmp_path):
+    record(tmp_path)
+    ws = ReplayWebSocket(str(tmp_path), start=1000.5)
+    trades = []
+    all_trades = []
+
+    @ws.on("trades", symbols=["A_BNB"])
+    def on_trade(msg):
+        trades.append(msg["data"][0]["t"])
+
+    stream = ws.stream("trades")
+    task = ws._loop.create_task(ws.start_async())
+    async for msg in stream:
+        all_trades.append(msg["data"][0]["t"])
+    await task
+
+    assert trades == list(range(51, 200, 2))
+    assert all_trades == list(range(50, 200))
+    assert ws.replayed == 150
+    assert ws.snapshots == {"A_BNB": {"height": 1}}
+    assert ws.time == 1002
+
+
+@pytest.mark.asyncio
+async def test_replay_speed(tmp_path):
+    record(tmp_path)
+    ws = ReplayWebSocket(str(tmp_path), end=1000.5, speed=10)
+    started = time.monotonic()
+    await ws.start_async()
+    assert ws.replayed == 51
+    assert 0.04 < time.monotonic() - started < 0.5
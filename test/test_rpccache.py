@@ -0,0 +1,82 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+NodeRPC Cache Test Suite
+"""
+import os
+
+import pytest
+
+from binancechain.rpccache import RPCCache
+
+
+def block(height):
+    return {"jsonrpc": "2.0", "id": "0", "result": {"height": str(height)}}
+
+
+def test_put_and_get(tmp_path):
+    cache = RPCCache(str(tmp_path / "cache"))
+    assert cache.get("block", 1) is None
+    cache.put("block", 1, block(1))
+    cache.put("block_by_hash", "abcd", block(2))
+    assert cache.get("block", "1") == block(1)
+    assert cache.get("block_by_hash", "ABCD") == block(2)
+    assert cache.get("commit", 1) is None
+    assert (cache.hits, cache.misses) == (2, 2)
+    cache.close()
+
+
+def test_keys_and_copies(tmp_path):
+    cache = RPCCache(str(tmp_path / "cache"))
+    cache.put("block", 12, block(12))
+    # Hashes are never mistaken for heights
+    cache.put("block_by_hash", "0012", block(0))
+    assert cache.get("block_by_hash", "12") is None
+    assert cache.get("block_by_hash", "0012") == block(0)
+
+    # Modifying a response doesn't affect later hits
+    cache.get("block", 12)["result"]["height"] = "13"
+    assert cache.get("block", 12) == block(12)
+    cache.close()
+
+
+def test_reopen(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = RPCCache(path, memory=10)
+    for height in range(100):
+        cache.put("block", height, block(height))
+    # Storing a height twice keeps the first response
+    cache.put("block", 1, block(-1))
+    assert len(cache._lru) == 10
+    assert cache.get("block", 1) == block(1)
+    cache.close()
+
+    cache = RPCCache(path)
+    assert len(cache) == 100
+    assert all(cache.get("block", height) == block(height) for height in range(100))
+    cache.close()
+
+
+def test_truncated_record(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = RPCCache(path)
+    cache.put("block", 1, block(1))
+    cache.put("block", 2, block(2))
+    cache.close()
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    cache = RPCCache(path)
+    assert len(cache) == 1
+    cache.put("block", 2, block(2))
+    cache.close()
+    cache = RPCCache(path)
+    assert cache.get("block", 2) == block(2)
+    cache.close()
+
+
+def test_not_a_cache(tmp_path):
+    path = tmp_path / "cache"
+    path.write_bytes(b"something else")
+    with pytest.raises(ValueError):
+        RPCCache(str(path))
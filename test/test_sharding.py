@@ -0,0 +1,51 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Sharded WebSocket Test Suite
+"""
+import asyncio
+
+import orjson
+import pytest
+
+from binancechain.sharding import ShardedWebSocket
+from localserver import LocalServer
+
+
+async def echo_trades(server, ws):
+    """Reply to each trades subscription with a trade for every symbol"""
+    async for msg in ws:
+        data = orjson.loads(msg.data)
+        server.received.append(data)
+        for symbol in data.get("symbols", ()):
+            trade = {"stream": "trades", "data": [{"s": symbol}]}
+            await ws.send_str(orjson.dumps(trade).decode())
+
+
+@pytest.mark.asyncio
+async def test_sharded_subscriptions():
+    server = LocalServer(echo_trades)
+    url = await server.start()
+    sharded = ShardedWebSocket(shards=3, url=url)
+    symbols = [f"SYM{i}_BNB" for i in range(30)]
+    results = []
+
+    def on_trade(msg):
+        results.append(msg["data"][0]["s"])
+        if len(results) == len(symbols):
+            sharded.close()
+
+    sharded.subscribe_trades(symbols=symbols, callback=on_trade)
+    await asyncio.wait_for(sharded.start_async(), 5)
+    await server.stop()
+
+    assert sorted(results) == sorted(symbols)
+    assert server.connections == 3
+    # Each shard was sent a single subscription for its own symbols
+    subscriptions = [msg for msg in server.received if msg["method"] == "subscribe"]
+    assert len(subscriptions) == 3
+    for msg in subscriptions:
+        assert len({sharded.shard_for(symbol) for symbol in msg["symbols"]}) == 1
+    health = sharded.health()
+    assert sum(shard["messages"] for shard in health) == len(symbols)
+    assert all(shard["connected"] for shard in health)
@@ -0,0 +1,49 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+Subscription Registry Test Suite
+"""
+from binancechain.subscriptions import ALL_SYMBOLS, NO_SYMBOL, SubscriptionRegistry
+
+
+def test_refcounts():
+    registry = SubscriptionRegistry()
+    assert registry.add("trades", ["A_BNB", "B_BNB"]) == ["A_BNB", "B_BNB"]
+    assert registry.add("trades", ["B_BNB", "C_BNB"]) == ["C_BNB"]
+    assert registry.add("orders", address="bnb1") == [NO_SYMBOL]
+    assert registry.pending() == {
+        ("trades", None): ["A_BNB", "B_BNB", "C_BNB"],
+        ("orders", "bnb1"): [NO_SYMBOL],
+    }
+    assert registry.pending() == {}
+
+    assert registry.remove("trades", ["B_BNB", "C_BNB"]) == ["C_BNB"]
+    assert registry.refcount("trades", "B_BNB") == 1
+    assert registry.remove("trades", ["A_BNB", "B_BNB"]) == ["A_BNB", "B_BNB"]
+    assert ("trades", None) not in registry
+
+    registry.add("orders", address="bnb1")
+    assert registry.remove("orders", address="bnb1") == []
+    assert registry.remove("orders", address="bnb1") == [NO_SYMBOL]
+    assert list(registry) == []
+
+
+def test_unsent_subscriptions_are_not_unsubscribed():
+    registry = SubscriptionRegistry()
+    registry.add("trades", ["A_BNB"])
+    registry.pending()
+    registry.add("trades", ["B_BNB"])
+    assert registry.remove("trades") == ["A_BNB"]
+    assert registry.pending() == {}
+    assert registry.active() == {}
+
+
+def test_all_symbols_are_refcounted():
+    registry = SubscriptionRegistry()
+    registry.add("blockheight", [ALL_SYMBOLS])
+    registry.add("blockheight", [ALL_SYMBOLS])
+    registry.pending()
+    assert registry.remove("blockheight") == []
+    assert registry.refcount("blockheight", ALL_SYMBOLS) == 1
+    assert registry.remove("blockheight") == [ALL_SYMBOLS]
+    assert list(registry) == []
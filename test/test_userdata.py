@@ -0,0 +1,122 @@
+# Copyright 2019, Luke Macken, Kim Bui, and the binance-chain-python contributors
+# SPDX-License-Identifier: MIT
+"""
+User Data Manager Test Suite
+"""
+import asyncio
+
+import bech32
+import orjson
+import pytest
+from bitcoinlib import encoding
+
+from binancechain.userdata import UserDataManager, order_prefix
+from localserver import LocalServer, until
+
+ADDRESSES = [
+    bech32.bech32_encode("tbnb", encoding.convertbits(bytes([n] * 20), 8, 5))
+    for n in range(1, 4)
+]
+
+
+async def echo_user_streams(server, ws):
+    """Reply to each user stream subscription with a message about it"""
+    ws_address = server.paths[-1].rpartition("/")[2]
+    async for msg in ws:
+        data = orjson.loads(msg.data)
+        server.received.append(data)
+        if data.get("method") != "subscribe":
+            continue
+        address = data.get("address", ws_address)
+        if data["topic"] == "orders":
+            report = {"i": f"{order_prefix(address)}-1", "s": "NNB-0AD_BNB"}
+            reply = {"stream": "orders", "data": [report]}
+        elif data["topic"] == "transfers":
+            to = [{"o": ADDRESSES[0], "c": [{"a": "BNB", "A": "1"}]}]
+            reply = {"stream": "transfers", "data": {"f": address, "t": to}}
+        else:
+            reply = {"stream": "accounts", "data": {"B": []}}
+        await ws.send_str(orjson.dumps(reply).decode())
+
+
+@pytest.mark.asyncio
+async def test_packs_and_routes_addresses():
+    server = LocalServer(echo_user_streams)
+    server.paths = []
+    websocket = server.websocket
+
+    async def record_path(request):
+        server.paths.append(request.path)
+        return await websocket(request)
+
+    server.websocket = record_path
+    url = await server.start()
+    users = UserDataManager(
+        ADDRESSES,
+        per_connection=2,
+        topics=["orders", "accounts", "transfers"],
+        url=url,
+        reconnect=False,
+    )
+    assert len(users.connections) == 2
+    assert users.connection_for(ADDRESSES[0]) is users.connection_for(ADDRESSES[1])
+
+    received = []
+    mine = []
+
+    def on_message(msg):
+        received.append((msg["stream"], msg["address"]))
+        if len(received) == 11:
+            users.close()
+
+    for topic in ("orders", "accounts", "transfers"):
+        users.subscribe(topic, on_message)
+    users.subscribe_user_transfers(mine.append, address=ADDRESSES[0])
+    await asyncio.wait_for(users.start_async(), 5)
+    await server.stop()
+
+    # Two shared connections, plus one per address for accounts
+    assert server.connections == 5
+    assert sorted(received) == sorted(
+        [("orders", address) for address in ADDRESSES]
+        + [("accounts", address) for address in ADDRESSES]
+        # Every transfer is to the first address
+        + [("transfers", address) for address in ADDRESSES]
+        + [("transfers", ADDRESSES[0])] * 2
+    )
+    # The first address sends one transfer and receives all three
+    assert len(mine) == 3
+    assert all(msg["address"] == ADDRESSES[0] for msg in mine)
+
+
+@pytest.mark.asyncio
+async def test_remove():
+    users = UserDataManager(ADDRESSES[:2], per_connection=1)
+    assert len(users.connections) == 2
+    users.remove(ADDRESSES[0])
+    assert ADDRESSES[0] not in users
+    users.add(ADDRESSES[2])
+    # The freed slot is reused
+    assert len(users.connections) == 2
+    assert users.connection_for(ADDRESSES[2]) is users.connections[0]
+    users.close()
+
+
+@pytest.mark.asyncio
+async def test_late_server():
+    server = LocalServer(echo_user_streams)
+    server.paths = [""]
+    url = await server.start()
+    await server.stop()
+    users = UserDataManager(ADDRESSES[:2], topics=["orders"], url=url)
+    received = []
+    users.subscribe("orders", received.append)
+    task = asyncio.ensure_future(users.start_async())
+    await asyncio.sleep(0.1)
+    # The first attempt to connect failed, so the socket never opened
+    await server.start(port=int(url.split(":")[2].split("/")[0]))
+    await until(lambda: len(received) == 2)
+    users.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
+    assert sorted(msg["address"] for msg in received) == sorted(ADDRESSES[:2])
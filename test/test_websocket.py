@@ -4,10 +4,14 @@
 Binance DEX WebSocket Test Suite
 """
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
+import orjson
 import pytest
 
 from binancechain import HTTPClient, WebSocket
+from binancechain.websocket import peek_stream, peek_symbols
+from localserver import LocalServer
 
 
 def on_error(msg):
@@ -251,3 +255,341 @@ async def test_decorator_sub_queue(client):
 
     await client.start_async()
     assert results
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resubscribes():
+    async def drop_first_connection(server, ws):
+        if server.connections == 1:
+            msg = await ws.receive()
+            server.received.append(orjson.loads(msg.data))
+            await ws.close()
+            return
+        async for msg in ws:
+            server.received.append(orjson.loads(msg.data))
+
+    server = LocalServer(drop_first_connection)
+    url = await server.start()
+    client = WebSocket(url=url, reconnect=True, reconnect_delay=0.01)
+    events = []
+    trades = []
+
+    def on_open():
+        client.subscribe_trades(symbols=["A_BNB"], callback=trades.append)
+        client.subscribe_trades(symbols=["B_BNB"], callback=trades.append)
+
+    @client.on("reconnect")
+    def on_reconnect(gap):
+        events.append(gap)
+        asyncio.get_event_loop().call_later(0.05, client.close)
+
+    await asyncio.wait_for(client.start_async(on_open=on_open), 5)
+    await server.stop()
+
+    assert server.connections == 2
+    assert events[0]["downtime"] >= 0
+    # The two subscriptions were batched, and replayed, as a single message
+    assert server.received == [
+        {"method": "subscribe", "topic": "trades", "symbols": ["A_BNB", "B_BNB"]},
+        {"method": "subscribe", "topic": "trades", "symbols": ["A_BNB", "B_BNB"]},
+        {"method": "close"},
+    ]
+    # The server never sent any trades
+    assert trades == []
+
+
+@pytest.mark.asyncio
+async def test_shared_blockheight():
+    server = LocalServer()
+    url = await server.start()
+    client = WebSocket(url=url)
+    first, second = [], []
+    client.subscribe_blockheight(callback=first.append)
+    client.subscribe_blockheight(callback=second.append)
+    task = asyncio.ensure_future(client.start_async())
+    while not server.received:
+        await asyncio.sleep(0.01)
+
+    # The second user keeps the subscription, and its handler
+    client.unsubscribe("blockheight", callback=first.append)
+    msg = {"stream": "blockheight", "data": {"h": 1}}
+    await client._handle(msg)
+    assert client._subscriptions.active() == {("blockheight", None): ["$all"]}
+    assert (first, second) == ([], [msg])
+
+    client.unsubscribe("blockheight")
+    await asyncio.sleep(0.05)
+    await client._handle(msg)
+    assert second == [msg]
+    client.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
+
+    assert server.received == [
+        {"method": "subscribe", "topic": "blockheight", "symbols": ["$all"]},
+        {"method": "unsubscribe", "topic": "blockheight", "symbols": ["$all"]},
+        {"method": "close"},
+    ]
+
+
+async def send_orders(server, ws):
+    """Reply to a subscription with an execution report"""
+    async for msg in ws:
+        data = orjson.loads(msg.data)
+        server.received.append(data)
+        if data["method"] == "subscribe":
+            report = {"stream": "orders", "data": [{"i": "1-1", "X": "Ack"}]}
+            await ws.send_str(orjson.dumps(report).decode())
+
+
+@pytest.mark.asyncio
+async def test_user_stream_of_another_address():
+    server = LocalServer(send_orders)
+    url = await server.start()
+    client = WebSocket(url=url)
+    reports = []
+
+    def on_order(msg):
+        reports.append(msg["data"])
+        client.close()
+
+    client.subscribe_user_orders(on_order, address="bnb1xyz")
+    await asyncio.wait_for(client.start_async(), 5)
+    await server.stop()
+
+    assert server.received[0] == {
+        "method": "subscribe",
+        "topic": "orders",
+        "address": "bnb1xyz",
+    }
+    assert reports == [[{"i": "1-1", "X": "Ack"}]]
+
+
+@pytest.mark.asyncio
+async def test_late_server():
+    server = LocalServer()
+    url = await server.start()
+    await server.stop()
+    client = WebSocket(url=url, reconnect=True, reconnect_delay=0.01)
+    events = []
+    opened = []
+    heights = []
+    for event in ("open", "disconnect", "reconnect"):
+        client.on(event, lambda *args, event=event: events.append(event))
+
+    def on_open():
+        opened.append(True)
+        client.subscribe_blockheight(callback=heights.append)
+
+    task = asyncio.ensure_future(client.start_async(on_open=on_open))
+    await asyncio.sleep(0.1)
+    assert events == []
+    # Start the server again on the port the client keeps trying
+    await server.start(port=int(url.split(":")[2].split("/")[0]))
+    while not server.received:
+        await asyncio.sleep(0.01)
+    client.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
+
+    assert events == ["open"]
+    assert opened == [True]
+    assert client._open
+    assert server.received[0]["topic"] == "blockheight"
+    assert heights == []
+
+
+async def send_trades(server, ws):
+    """Reply to a subscription with a trade for each symbol, repeatedly"""
+    async for msg in ws:
+        data = orjson.loads(msg.data)
+        server.received.append(data)
+        if data["method"] != "subscribe":
+            continue
+        for i in range(10):
+            for symbol in data["symbols"]:
+                trade = {"stream": "trades", "data": [{"s": symbol, "t": i}]}
+                await ws.send_str(orjson.dumps(trade).decode())
+
+
+@pytest.mark.asyncio
+async def test_stream_iterator():
+    server = LocalServer(send_trades)
+    url = await server.start()
+    client = WebSocket(url=url)
+    stream = client.stream("trades", symbols=["A_BNB"])
+    dropping = client.stream(
+        "trades", symbols=["A_BNB", "B_BNB"], maxsize=2, overflow="drop_oldest"
+    )
+    task = asyncio.ensure_future(client.start_async())
+
+    trades = []
+    async for msg in stream:
+        trades.append(msg["data"][0])
+        if len(trades) == 10:
+            break
+    client.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
+
+    # Both streams were subscribed to with a single message
+    assert server.received[0] == {
+        "method": "subscribe",
+        "topic": "trades",
+        "symbols": ["A_BNB", "B_BNB"],
+    }
+    assert [trade["t"] for trade in trades] == list(range(10))
+    assert dropping.dropped > 0
+    assert [msg async for msg in dropping]
+
+
+async def send_mini_tickers(server, ws):
+    """Reply to a subscription with a burst of allMiniTickers updates"""
+    async for msg in ws:
+        server.received.append(orjson.loads(msg.data))
+        for i in range(10):
+            tickers = [{"s": "A_BNB", "c": str(i)}, {"s": "B_BNB", "c": str(i)}]
+            msg = {"stream": "allMiniTickers", "data": tickers}
+            await ws.send_str(orjson.dumps(msg).decode())
+
+
+@pytest.mark.asyncio
+async def test_conflate():
+    server = LocalServer(send_mini_tickers)
+    url = await server.start()
+    client = WebSocket(url=url)
+    tickers = client.conflate("allMiniTickers", symbols=["A_BNB"])
+    task = asyncio.ensure_future(client.start_async())
+
+    # Let the whole burst arrive before consuming it
+    while tickers.latest.get("A_BNB", {}).get("c") != "9":
+        await asyncio.sleep(0.01)
+    updates = await tickers.get()
+    client.close()
+    await asyncio.wait_for(task, 5)
+    await server.stop()
+
+    assert updates == {"A_BNB": {"s": "A_BNB", "c": "9"}}
+    assert tickers.conflated == 9
+    assert list(tickers.snapshot()) == ["A_BNB"]
+    assert [updates async for updates in tickers] == []
+
+
+@pytest.mark.asyncio
+async def test_decoder_pool_keeps_order():
+    server = LocalServer(send_trades)
+    url = await server.start()
+    with ThreadPoolExecutor(4) as decoder:
+        client = WebSocket(url=url, decoder=decoder, decode_streams=["trades"])
+        trades = []
+
+        def on_trade(msg):
+            trades.append((msg["data"][0]["s"], msg["data"][0]["t"]))
+            if len(trades) == 20:
+                client.close()
+
+        def on_open():
+            client.subscribe_trades(symbols=["A_BNB", "B_BNB"], callback=on_trade)
+
+        await asyncio.wait_for(client.start_async(on_open=on_open), 5)
+    await server.stop()
+
+    for symbol in ("A_BNB", "B_BNB"):
+        assert [t for s, t in trades if s == symbol] == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_remove_listener():
+    client = WebSocket(url="http://127.0.0.1:1/api/ws")
+    gaps = []
+    client.on("gap", gaps.append)
+    client._events.emit("gap", {"downtime": 1})
+    client.remove_listener("gap", gaps.append)
+    client.remove_listener("gap", gaps.append)
+    client._events.emit("gap", {"downtime": 2})
+    assert gaps == [{"downtime": 1}]
+    client.close()
+    await asyncio.sleep(0)
+
+
+def test_peek_stream():
+    assert peek_stream('{"stream":"trades","data":[]}') == "trades"
+    assert peek_stream('{"error":{"code":1}}') is None
+
+
+@pytest.mark.asyncio
+async def test_selective_decoding():
+    server = LocalServer(send_trades)
+    url = await server.start()
+    client = WebSocket(url=url)
+    trades = []
+
+    def on_trade(msg):
+        trades.append(msg["data"][0]["s"])
+        if len(trades) == 10:
+            client.close()
+
+    def on_open():
+        client.subscribe_trades(symbols=["A_BNB", "B_BNB"], callback=None)
+        client.on("trades", on_trade, symbols=["B_BNB"])
+
+    await asyncio.wait_for(client.start_async(on_open=on_open), 5)
+    await server.stop()
+
+    assert set(trades) == {"B_BNB"}
+    # The A_BNB trades were never decoded
+    assert client.skipped["trades"] >= 9
+
+
+def test_peek_symbols():
+    trades = '{"stream":"trades","data":[{"s":"A"},{"s":"B"}]}'
+    assert peek_symbols(trades) == {"A", "B"}
+    assert peek_symbols('{"stream":"marketDepth","data":{"symbol":"C"}}') == {"C"}
+    assert peek_symbols('{"stream":"accounts","data":{}}') == set()
+
+
+@pytest.mark.asyncio
+async def test_stale_reconnect():
+    async def tick_once(server, ws):
+        async for msg in ws:
+            data = orjson.loads(msg.data)
+            server.received.append(data)
+            if data["method"] == "subscribe" and server.connections == 1:
+                ticker = {"stream": "ticker", "data": {"s": "A_BNB"}}
+                await ws.send_str(orjson.dumps(ticker).decode())
+
+    server = LocalServer(tick_once)
+    url = await server.start()
+    client = WebSocket(
+        url=url,
+        reconnect=True,
+        reconnect_delay=0.01,
+        heartbeat=0.02,
+        stale_reconnect=True,
+        cadences={"ticker": 0.02},
+    )
+    events = []
+
+    @client.on("stale")
+    def on_stale(event):
+        events.append(event)
+        if len(events) == 2:
+            client.close()
+
+    tickers = []
+
+    def on_open():
+        client.subscribe_ticker(symbols=["A_BNB"], callback=tickers.append)
+
+    await asyncio.wait_for(client.start_async(on_open=on_open), 5)
+    await server.stop()
+
+    assert server.connections == 2
+    assert [event["stream"] for event in events] == ["ticker", "ticker"]
+    # The ticker sent before the first connection went quiet
+    assert tickers == [{"stream": "ticker", "data": {"s": "A_BNB"}}]
+    assert events[0]["silence"] >= 0.06
+    assert client.health.rtt is not None
+    health = client.health_check()
+    assert health["stale"] == ["ticker"]
+    assert health["score"] == 0